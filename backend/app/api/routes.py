@@ -2,10 +2,20 @@ import os
 from typing import Optional
 import traceback
 import uuid
-from fastapi import APIRouter,Depends, File, Form, HTTPException,UploadFile
-from app.models.schema import AppResponse,Generate2DResponse, Edit2DResponse, Generate3DResponse
+import json
+from fastapi import APIRouter,Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import RedirectResponse, StreamingResponse
+from app.models.schema import AppResponse,Generate2DResponse, Edit2DResponse, Generate3DResponse, JobResponse
 from app.services.workflow import workflow
 from app.services.file_manager import FileManager
+from app.services.cache_service import image_cache, model_cache
+from app.services.relief_store import relief_store
+from app.core.locks import SessionBusyError
+from app.core.executor import executor
+from app.services.job_queue import job_queue
+from app.services.events import event_bus
+from app.services.uploads import UploadError, spool_upload
+from app.services.storage import OBJECT_KEY, storage
 
 router = APIRouter()
 
@@ -13,6 +23,18 @@ router = APIRouter()
 async def home():
     return {"message": "API is running."}
 
+@router.get('/cache/stats', summary="result cache statistics", description="hit/miss counters and size of the analysis/silhouette cache, plus the 3D result cache under 'models'")
+async def cache_stats():
+    return {**image_cache.stats(), "models": model_cache.stats()}
+
+@router.get('/relief/stats', summary="relief store statistics", description="sessions, memory use and hit/miss counters of the in-memory heightmap/topology store")
+async def relief_stats():
+    return relief_store.stats()
+
+@router.get('/locks/stats', summary="session lock statistics", description="active session locks and lock wait-time metrics")
+async def lock_stats():
+    return workflow.session_locks.stats()
+
 @router.post('/generate2d', response_model=Generate2DResponse, summary="generate 2d sketch", description="upload image and generate silhouette, and analyze proprotions")
 async def generate_2d(file: UploadFile= File(..., description="uploaded file(png/jpg/jpeg/webp)"), session_id: Optional[str]=Form(None, description="session id(optional)")):
     """
@@ -22,6 +44,10 @@ async def generate_2d(file: UploadFile= File(..., description="uploaded file(png
         raise HTTPException(status_code=400, detail="Invalid file type. Only png, jpg, jpeg, webp are allowed.")
     try:
         result=await workflow.generate_2d_from_upload(image_file=file, session_id_in=session_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         error_msg = traceback.format_exc()
         print("---------------- CRITICAL ERROR ----------------")
@@ -41,21 +67,20 @@ async def edit_endpoint(
     version: int=Form(2, description="version number of the silhouette to edit, default is 2")
 ):
     try:
-        content=await image.read()
-        print(f"Image size: {len(content)} bytes")
-
-        temp_filenam=f"{session_id}_user_edited_{uuid.uuid4().hex[:8]}.png"
-        temp_path=os.path.join("static","uploads",temp_filenam)
-
-        os.makedirs(os.path.join("static", "uploads"), exist_ok=True)
-        with open(temp_path, "wb") as f:
-            f.write(content)
-        print(f"Saved uploaded image to {temp_path}")
+        upload=await spool_upload(image, os.path.join("static","uploads"), f"{session_id}_user_edited_{uuid.uuid4().hex[:8]}")
+        temp_path=upload['file_path']
+        print(f"Saved uploaded image to {temp_path} ({upload['size']} bytes)")
 
         result = await workflow.edit_silhouette(session_id=session_id, prompt=prompt, image_path=temp_path, version=version)
         if not result.success:  
             raise HTTPException(status_code=500, detail=result.error or "Failed to edit 2D silhouette.")
         return result
+    except HTTPException:
+        raise
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         error_msg = traceback.format_exc()
         print("---------------- EDIT ERROR ----------------")
@@ -65,11 +90,90 @@ async def edit_endpoint(
     
 
 @router.post('/generate3D', response_model=Generate3DResponse, summary="generate 3d model based on 2d sketch and user instructions", description="generate 3d model(stl and render) based on previously generated 2d sketch and user instructions")
-async def generate3D_endpoint(session_id: str=Form(..., description="session id"), depth_div_width: float=Form(..., description="depth divided by width ratio"), aspect_ratio: float=Form(1.0, description="aspect ratio")):
+async def generate3D_endpoint(session_id: str=Form(..., description="session id"), depth_div_width: float=Form(..., description="depth divided by width ratio"), aspect_ratio: float=Form(1.0, description="aspect ratio"), max_error: Optional[float]=Form(None, ge=0, description="adaptive mesh height tolerance in model units (0=lossless)"), target_triangles: Optional[int]=Form(None, gt=0, description="triangle budget; overrides max_error"), format: str=Form("stl", pattern="^(stl|ply|glb|3mf)$", description="output mesh format: stl, ply, glb or 3mf"), adjust_depth: bool=Form(False, description="rescale the stored relief to the new depth, keeping its triangles"), quality: str=Form("final", pattern="^(preview|final)$", description="preview: fast low-resolution mesh and render, final: full resolution"), prefetch_final: bool=Form(False, description="with quality=preview, also queue the final model in the background")):
     """
     generate 3D model based on 2D sketch and user instructions
     """
-    result=await workflow.generate_3d_model(session_id=session_id, depth_div_width=depth_div_width, aspect_ratio=aspect_ratio)
+    try:
+        result=await workflow.generate_3d_model(session_id=session_id, depth_div_width=depth_div_width, aspect_ratio=aspect_ratio, max_error=max_error, target_triangles=target_triangles, fmt=format, adjust_depth=adjust_depth, quality=quality, prefetch_final=prefetch_final)
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not result.success:
         raise HTTPException(status_code=500, detail=result.error or "Failed to generate 3D model.")
     return result
+
+@router.get('/download3D', summary="download the full-resolution 3d model", description="build the final-quality model on first request (or reuse the cached one) and redirect to its file; /generate3D with quality=preview returns this url")
+async def download3D_endpoint(session_id: str=Query(..., description="session id"), depth_div_width: float=Query(..., description="depth divided by width ratio"), aspect_ratio: float=Query(1.0, description="aspect ratio"), max_error: Optional[float]=Query(None, ge=0, description="adaptive mesh height tolerance in model units (0=lossless)"), target_triangles: Optional[int]=Query(None, gt=0, description="triangle budget; overrides max_error"), format: str=Query("stl", pattern="^(stl|ply|glb|3mf)$", description="output mesh format: stl, ply, glb or 3mf")):
+    try:
+        result=await workflow.generate_3d_model(session_id=session_id, depth_div_width=depth_div_width, aspect_ratio=aspect_ratio, max_error=max_error, target_triangles=target_triangles, fmt=format, quality="final")
+    except SessionBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not result.success:
+        raise HTTPException(status_code=500, detail=result.error or "Failed to generate 3D model.")
+    return RedirectResponse(result.data['model_file']['url_path'], status_code=303)
+
+@router.get('/objects/{key:path}', summary="download a stored artifact", description="redirect to a stored object: its /static path for local storage, a fresh presigned url for s3")
+async def object_endpoint(key: str):
+    if not OBJECT_KEY.match(key):
+        raise HTTPException(status_code=404, detail=f"Object not found: {key}")
+    return RedirectResponse(await executor.run_io(storage.download_url, key), status_code=307)
+
+
+def _job_response(job: dict) -> JobResponse:
+    return JobResponse(**{k: job[k] for k in JobResponse.__fields__})
+
+@router.post('/jobs/generate2d', response_model=JobResponse, status_code=202, summary="queue 2d generation", description="queue the /generate2d pipeline and return a job id to poll")
+async def submit_generate_2d(file: UploadFile= File(..., description="uploaded file(png/jpg/jpeg/webp)"), session_id: Optional[str]=Form(None, description="session id(optional)")):
+    if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
+        raise HTTPException(status_code=400, detail="Invalid file type. Only png, jpg, jpeg, webp are allowed.")
+    session_id=session_id or str(uuid.uuid4())
+    # spool the upload to disk so the job survives a restart
+    try:
+        upload=await spool_upload(file, os.path.join("static", "uploads"), f"{session_id}_job_{uuid.uuid4().hex[:8]}")
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    job_id=await job_queue.submit("generate2d", session_id, {"upload_path": upload['file_path']})
+    return _job_response(await job_queue.get(job_id))
+
+@router.post('/jobs/generate3D', response_model=JobResponse, status_code=202, summary="queue 3d generation", description="queue the /generate3D pipeline and return a job id to poll")
+async def submit_generate_3d(session_id: str=Form(..., description="session id"), depth_div_width: float=Form(..., description="depth divided by width ratio"), aspect_ratio: float=Form(1.0, description="aspect ratio"), max_error: Optional[float]=Form(None, ge=0, description="adaptive mesh height tolerance in model units (0=lossless)"), target_triangles: Optional[int]=Form(None, gt=0, description="triangle budget; overrides max_error"), format: str=Form("stl", pattern="^(stl|ply|glb|3mf)$", description="output mesh format: stl, ply, glb or 3mf"), adjust_depth: bool=Form(False, description="rescale the stored relief to the new depth, keeping its triangles"), quality: str=Form("final", pattern="^(preview|final)$", description="preview: fast low-resolution mesh and render, final: full resolution"), prefetch_final: bool=Form(False, description="with quality=preview, also queue the final model in the background")):
+    job_id=await job_queue.submit("generate3d", session_id, {"depth_div_width": depth_div_width, "aspect_ratio": aspect_ratio, "max_error": max_error, "target_triangles": target_triangles, "format": format, "adjust_depth": adjust_depth, "quality": quality, "prefetch_final": prefetch_final})
+    return _job_response(await job_queue.get(job_id))
+
+@router.get('/jobs/{job_id}', response_model=JobResponse, summary="job status", description="poll status, progress and result of a queued job")
+async def get_job(job_id: str):
+    job=await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return _job_response(job)
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def _final_event(job: dict) -> dict:
+    if job['status'] == "succeeded":
+        return {"type": "completed", "job_id": job['job_id'], "progress": 1.0, "result": job['result']}
+    return {"type": "failed", "job_id": job['job_id'], "error": job['error']}
+
+@router.get('/jobs/{job_id}/events', summary="job progress stream", description="server-sent events for each pipeline stage (upload_normalized, upload_saved, analysis_done, silhouette_saved, mesh_built, stl_written (any mesh format; see its format field), render_done) with timings and artifact urls, ending with completed or failed")
+async def stream_job_events(job_id: str):
+    job=await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    async def events():
+        if job['status'] in ("succeeded", "failed") and not event_bus.has_channel(job_id):
+            yield _sse(_final_event(job))
+            return
+        async for event in event_bus.subscribe(job_id):
+            if event is None:
+                # no local events: the job may be running in another worker process
+                current=await job_queue.get(job_id)
+                if current['status'] in ("succeeded", "failed"):
+                    yield _sse(_final_event(current))
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -9,4 +9,109 @@ class Settings:
     # 渲染器开关：True=返回假文件(开发用), False=调用真实OpenSCAD
     USE_MOCK_RENDERER = os.getenv("USE_MOCK_RENDERER", "True").lower() == "true"
 
+    # OpenSCAD：可执行文件、单次进程超时(秒)、同时运行的进程数上限
+    OPENSCAD_BIN = os.getenv("OPENSCAD_BIN", "openscad")
+    OPENSCAD_TIMEOUT = float(os.getenv("OPENSCAD_TIMEOUT", "120"))
+    OPENSCAD_CONCURRENCY = int(os.getenv("OPENSCAD_CONCURRENCY", "2"))
+
+    # 阻塞任务线程/进程池：IO_POOL_SIZE 用于 OpenAI/磁盘，CPU_POOL_SIZE 用于网格/渲染 (0=用线程池)
+    IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "16"))
+    CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(os.cpu_count() or 1)))
+
+    # OpenAI 异步客户端：连接池、超时(秒)、重试与全局并发上限
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+    OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "90"))
+    OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "180"))
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+    OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+    OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "20"))
+    OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+    # True=离线桩(不访问网络，开发/测试用)
+    OPENAI_USE_STUB = os.getenv("OPENAI_USE_STUB", "False").lower() == "true"
+
+    # 同一 session 正在处理时：True=立即返回 409，False=排队等待
+    REJECT_BUSY_SESSIONS = os.getenv("REJECT_BUSY_SESSIONS", "False").lower() == "true"
+
+    # 后台任务：并发 worker 数、心跳间隔/过期时间(秒)、最大尝试次数
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_HEARTBEAT = float(os.getenv("JOB_HEARTBEAT", "5"))
+    JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "30"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+    # 分析/轮廓结果缓存：目录、容量上限(字节)、过期时间(秒)
+    RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join("cache", "openai"))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # 上传：单个文件大小上限(字节)、流式写盘的块大小(字节)
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+    # 上传图片预处理：长边上限(像素，按模型实际使用的分辨率)、重编码格式 auto/png/jpeg/webp (auto=有透明用 PNG 否则 JPEG)、JPEG/WEBP 质量
+    INGEST_MAX_SIDE = int(os.getenv("INGEST_MAX_SIDE", "1536"))
+    INGEST_FORMAT = os.getenv("INGEST_FORMAT", "auto")
+    INGEST_JPEG_QUALITY = int(os.getenv("INGEST_JPEG_QUALITY", "90"))
+
+    # 3D 预览渲染：raster=NumPy 软件光栅化, matplotlib=旧版 Poly3DCollection；尺寸(像素)、相机角度(度)、着色 flat/lambert
+    PREVIEW_RENDERER = os.getenv("PREVIEW_RENDERER", "raster")
+    PREVIEW_SIZE = int(os.getenv("PREVIEW_SIZE", "800"))
+    PREVIEW_ELEVATION = float(os.getenv("PREVIEW_ELEVATION", "30"))
+    PREVIEW_AZIMUTH = float(os.getenv("PREVIEW_AZIMUTH", "-60"))
+    PREVIEW_SHADING = os.getenv("PREVIEW_SHADING", "lambert")
+    PREVIEW_SUPERSAMPLE = int(os.getenv("PREVIEW_SUPERSAMPLE", "1"))
+
+    # 质量档 quality=preview：轮廓先缩到长边 N 像素再建网格、小尺寸渲染；final 为全分辨率(下载时再生成)
+    QUALITY_PREVIEW_MAX_SIDE = int(os.getenv("QUALITY_PREVIEW_MAX_SIDE", "128"))
+    QUALITY_PREVIEW_RENDER_SIZE = int(os.getenv("QUALITY_PREVIEW_RENDER_SIZE", "400"))
+
+    # 浮雕网格：MESH_ADAPTIVE=True 时合并平坦区域 (四叉树)，MESH_MAX_ERROR 为默认高度误差上限(0=无损)
+    MESH_ADAPTIVE = os.getenv("MESH_ADAPTIVE", "True").lower() == "true"
+    MESH_MAX_ERROR = float(os.getenv("MESH_MAX_ERROR", "0"))
+
+    # 密集浮雕分行带并行建网格 (共享内存)：每个建网格进程的分带进程数(0=CPU 核数 / CPU_POOL_SIZE，嵌套进程总数不超过核数；1=关闭)、启用的最小像素数
+    # 只用于密集网格：需 MESH_ADAPTIVE=False (默认的自适应网格 max_error=0 不分带)，且默认 CPU_POOL_SIZE=核数时为 1 即关闭，需调小 CPU_POOL_SIZE 或显式设置
+    MESH_TILE_WORKERS = int(os.getenv("MESH_TILE_WORKERS", "0"))
+    MESH_TILE_MIN_PIXELS = int(os.getenv("MESH_TILE_MIN_PIXELS", str(1024 * 1024)))
+
+    # 轮廓挤出：Douglas-Peucker 简化容差(像素，0=不简化)
+    EXTRUDE_SIMPLIFY = float(os.getenv("EXTRUDE_SIMPLIFY", "1.0"))
+
+    # 轮廓预处理(建网格前)：开关、裁剪后保留的边距(像素)、去噪开/闭运算核大小(像素，0=关闭)、轮廓平滑高斯 sigma(像素，0=关闭)
+    SILHOUETTE_CONDITIONING = os.getenv("SILHOUETTE_CONDITIONING", "True").lower() == "true"
+    SILHOUETTE_PAD = int(os.getenv("SILHOUETTE_PAD", "8"))
+    SILHOUETTE_DESPECKLE = int(os.getenv("SILHOUETTE_DESPECKLE", "3"))
+    SILHOUETTE_SMOOTH = float(os.getenv("SILHOUETTE_SMOOTH", "0"))
+
+    # 产物存储(上传/轮廓等)：local=本地按内容哈希分片存储并去重，s3=S3 兼容对象存储(AWS/MinIO，需安装 boto3)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", os.path.join("static", "objects"))
+    STORAGE_LOCAL_URL = os.getenv("STORAGE_LOCAL_URL", "/static/objects")
+    # S3：桶、键前缀、endpoint(MinIO/moto 等，空=AWS)、区域、预签名 URL 有效期(秒)、分片上传阈值/分片大小(字节)、并行上传分片数
+    S3_BUCKET = os.getenv("S3_BUCKET", "")
+    S3_PREFIX = os.getenv("S3_PREFIX", "artifacts")
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")
+    S3_REGION = os.getenv("S3_REGION", "")
+    S3_PRESIGN_TTL = int(os.getenv("S3_PRESIGN_TTL", "3600"))
+    S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+    S3_MULTIPART_CHUNK = int(os.getenv("S3_MULTIPART_CHUNK", str(8 * 1024 * 1024)))
+    S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+
+    # 3D 结果缓存：按轮廓内容哈希+参数寻址，放在 static 下直接提供下载；容量上限(字节)、过期时间(秒)
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join("static", "models"))
+    MODEL_CACHE_URL = os.getenv("MODEL_CACHE_URL", "/static/models")
+    MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    MODEL_CACHE_TTL = float(os.getenv("MODEL_CACHE_TTL", str(7 * 24 * 3600)))
+
+    # /static 产物下载：预压缩(gzip/zstd 旁路文件)的扩展名(逗号分隔，空=关闭)、最小文件大小(字节)、压缩级别
+    ARTIFACT_PRECOMPRESS = [e.strip().lower() for e in os.getenv("ARTIFACT_PRECOMPRESS", "stl,ply,glb").split(",") if e.strip()]
+    ARTIFACT_PRECOMPRESS_MIN_BYTES = int(os.getenv("ARTIFACT_PRECOMPRESS_MIN_BYTES", str(16 * 1024)))
+    ARTIFACT_GZIP_LEVEL = int(os.getenv("ARTIFACT_GZIP_LEVEL", "6"))
+    ARTIFACT_ZSTD_LEVEL = int(os.getenv("ARTIFACT_ZSTD_LEVEL", "10"))
+
+    # 每个 session 在内存中保留解码后的高度图与三角拓扑，仅改深度时只缩放 Z；总容量上限(字节，0=关闭)
+    RELIEF_STORE_MAX_BYTES = int(os.getenv("RELIEF_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
 settings = Settings()
\ No newline at end of file
@@ -1,21 +1,99 @@
 import sqlite3
 import json
+import time
+import threading
 from typing import Optional, Dict
 from contextlib import contextmanager
 
 
+# Statement text is reused verbatim so sqlite3's per-connection statement
+# cache keeps them prepared.
+SAVE_FILE_SQL = """INSERT OR REPLACE INTO files (session_id, file_type, file_path, url_path)
+                   VALUES (?, ?, ?, ?)"""
+GET_FILE_SQL = "SELECT * FROM files WHERE session_id = ? AND file_type = ?"
+SAVE_ANALYSIS_SQL = """INSERT OR REPLACE INTO analysis
+                   (session_id, width, length, thickness, complexity, ratio_string)
+                   VALUES (?, ?, ?, ?, ?, ?)"""
+GET_ANALYSIS_SQL = "SELECT * FROM analysis WHERE session_id = ?"
+NEXT_REVISION_SQL = """SELECT COALESCE(MAX(revision), 0) + 1 FROM artifact_versions
+                   WHERE session_id = ? AND kind = ?"""
+RECORD_VERSION_SQL = """INSERT INTO artifact_versions
+                   (session_id, kind, revision, version, file_path, url_path, size, sha256)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+GET_LATEST_VERSION_SQL = """SELECT * FROM artifact_versions
+                   WHERE session_id = ? AND kind = ? ORDER BY revision DESC LIMIT 1"""
+GET_VERSION_SQL = """SELECT * FROM artifact_versions
+                   WHERE session_id = ? AND kind = ? AND version = ? ORDER BY revision DESC LIMIT 1"""
+CREATE_JOB_SQL = """INSERT INTO jobs
+                   (job_id, kind, session_id, params, status, progress, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, 'queued', 0, ?, ?)"""
+GET_JOB_SQL = "SELECT * FROM jobs WHERE job_id = ?"
+NEXT_QUEUED_JOB_SQL = """SELECT job_id FROM jobs WHERE status = 'queued'
+                   ORDER BY created_at LIMIT 1"""
+CLAIM_JOB_SQL = """UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1,
+                   heartbeat_at = ?, updated_at = ? WHERE job_id = ? AND status = 'queued'"""
+HEARTBEAT_JOB_SQL = "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'"
+REQUEUE_STALE_JOBS_SQL = """UPDATE jobs SET status = 'queued', stage = 'requeued', worker_id = NULL, updated_at = ?
+                   WHERE status = 'running' AND heartbeat_at < ? AND attempts < ?"""
+FAIL_STALE_JOBS_SQL = """UPDATE jobs SET status = 'failed', error = 'Job abandoned too many times', updated_at = ?
+                   WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?"""
+JOB_FIELDS = ("status", "progress", "stage", "result", "error")
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",      # WAL makes NORMAL crash-safe; fsync only at checkpoints
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",       # 16 MB page cache per connection
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _analysis_params(session_id: str, analysis_data: Dict) -> tuple:
+    return (
+        session_id,
+        analysis_data.get('width'),
+        analysis_data.get('length'),
+        analysis_data.get('thickness'),
+        analysis_data.get('complexity'),
+        analysis_data.get('ratio_string')
+    )
+
+
+class DatabaseBatch:
+    """Writes issued inside Database.transaction(); committed together."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def save_file(self, session_id: str, file_type: str, file_path: str, url_path: str):
+        self.conn.execute(SAVE_FILE_SQL, (session_id, file_type, file_path, url_path))
+
+    def save_analysis(self, session_id: str, analysis_data: Dict):
+        self.conn.execute(SAVE_ANALYSIS_SQL, _analysis_params(session_id, analysis_data))
+
+    def record_version(self, session_id: str, kind: str, version: int, file_path: str, url_path: str,
+                       size: int, sha256: str) -> int:
+        """Append a version row; returns its revision (1, 2, 3, ... per session and kind)."""
+        revision = self.conn.execute(NEXT_REVISION_SQL, (session_id, kind)).fetchone()[0]
+        self.conn.execute(RECORD_VERSION_SQL, (session_id, kind, revision, version, file_path, url_path, size, sha256))
+        return revision
+
+
 class Database:
     """Simple SQLite database for tracking files by session_id."""
-    
+
     def __init__(self, db_path: str = "keychain.db"):
         self.db_path = db_path
+        # One long-lived connection per thread instead of one per call
+        self._local = threading.local()
         self._init_database()
-    
+
     def _init_database(self):
         """Initialize database tables."""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
+        with self.transaction() as batch:
+            cursor = batch.conn.cursor()
+
             # Simple files table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS files (
@@ -27,7 +105,7 @@ class Database:
                     PRIMARY KEY (session_id, file_type)
                 )
             """)
-            
+
             # Analysis results table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS analysis (
@@ -39,71 +117,212 @@ class Database:
                     ratio_string TEXT
                 )
             """)
-            
-            conn.commit()
-    
+
+            # Version index of session artifacts (e.g. kind='2d' silhouettes).
+            # revision increases monotonically per (session_id, kind); version is
+            # the number the client asked for (v1, v2, ...). The primary key
+            # serves "latest", idx_artifact_versions_version serves "version N".
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS artifact_versions (
+                    session_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    revision INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    file_path TEXT NOT NULL,
+                    url_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (session_id, kind, revision)
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_artifact_versions_version
+                ON artifact_versions (session_id, kind, version, revision)
+            """)
+
+            # Background jobs (queued -> running -> succeeded/failed); params and
+            # result are JSON. heartbeat_at lets a restarted worker reclaim jobs.
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    stage TEXT,
+                    result TEXT,
+                    error TEXT,
+                    worker_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    heartbeat_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_status
+                ON jobs (status, created_at)
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit, transactions are opened explicitly
+        conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
     @contextmanager
     def _get_connection(self):
-        """Context manager for database connections."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
+        """Context manager yielding this thread's cached connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+        yield conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes into one transaction (one commit, one WAL sync).
+
+            with db.transaction() as batch:
+                batch.save_file(...)
+                batch.save_analysis(...)
+
+        Nested calls join the outer transaction.
+        """
+        with self._get_connection() as conn:
+            if self._local.depth:
+                self._local.depth += 1
+                try:
+                    yield DatabaseBatch(conn)
+                finally:
+                    self._local.depth -= 1
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.depth = 1
+            try:
+                yield DatabaseBatch(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                self._local.depth = 0
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
             conn.close()
-    
+            self._local.conn = None
+
     def save_file(self, session_id: str, file_type: str, file_path: str, url_path: str):
         """Save or update file path."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT OR REPLACE INTO files (session_id, file_type, file_path, url_path)
-                   VALUES (?, ?, ?, ?)""",
-                (session_id, file_type, file_path, url_path)
-            )
-            conn.commit()
-    
+            conn.execute(SAVE_FILE_SQL, (session_id, file_type, file_path, url_path))
+
     def get_file(self, session_id: str, file_type: str) -> Optional[Dict]:
         """Get file path by session_id and type."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM files WHERE session_id = ? AND file_type = ?",
-                (session_id, file_type)
-            )
-            row = cursor.fetchone()
+            row = conn.execute(GET_FILE_SQL, (session_id, file_type)).fetchone()
             if row:
                 return dict(row)
             return None
-    
+
     def save_analysis(self, session_id: str, analysis_data: Dict):
         """Save analysis results."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """INSERT OR REPLACE INTO analysis 
-                   (session_id, width, length, thickness, complexity, ratio_string)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (
-                    session_id,
-                    analysis_data.get('width'),
-                    analysis_data.get('length'),
-                    analysis_data.get('thickness'),
-                    analysis_data.get('complexity'),
-                    analysis_data.get('ratio_string')
-                )
-            )
-            conn.commit()
-    
+            conn.execute(SAVE_ANALYSIS_SQL, _analysis_params(session_id, analysis_data))
+
     def get_analysis(self, session_id: str) -> Optional[Dict]:
         """Get analysis results."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM analysis WHERE session_id = ?",
-                (session_id,)
-            )
-            row = cursor.fetchone()
+            row = conn.execute(GET_ANALYSIS_SQL, (session_id,)).fetchone()
             if row:
                 return dict(row)
-            return None
\ No newline at end of file
+            return None
+
+    def record_version(self, session_id: str, kind: str, version: int, file_path: str, url_path: str,
+                       size: int, sha256: str) -> int:
+        """Append an artifact version; returns its revision."""
+        with self.transaction() as batch:
+            return batch.record_version(session_id, kind, version, file_path, url_path, size, sha256)
+
+    def get_latest_version(self, session_id: str, kind: str) -> Optional[Dict]:
+        """Most recently recorded artifact version for the session."""
+        with self._get_connection() as conn:
+            row = conn.execute(GET_LATEST_VERSION_SQL, (session_id, kind)).fetchone()
+            return dict(row) if row else None
+
+    def get_version(self, session_id: str, kind: str, version: int) -> Optional[Dict]:
+        """Latest revision recorded for a specific version number."""
+        with self._get_connection() as conn:
+            row = conn.execute(GET_VERSION_SQL, (session_id, kind, version)).fetchone()
+            return dict(row) if row else None
+
+    def get_schema_version(self) -> int:
+        with self._get_connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def set_schema_version(self, version: int):
+        with self._get_connection() as conn:
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def create_job(self, job_id: str, kind: str, session_id: str, params: Dict):
+        now = time.time()
+        with self._get_connection() as conn:
+            conn.execute(CREATE_JOB_SQL, (job_id, kind, session_id, json.dumps(params), now, now))
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job row with params/result decoded from JSON."""
+        with self._get_connection() as conn:
+            row = conn.execute(GET_JOB_SQL, (job_id,)).fetchone()
+            if not row:
+                return None
+            job = dict(row)
+            job["params"] = json.loads(job["params"])
+            job["result"] = json.loads(job["result"]) if job["result"] else None
+            return job
+
+    def update_job(self, job_id: str, **fields):
+        """Update status/progress/stage/result/error of a job."""
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {unknown}")
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._get_connection() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {columns}, updated_at = ? WHERE job_id = ?",
+                (*fields.values(), time.time(), job_id)
+            )
+
+    def claim_next_job(self, worker_id: str) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running and return it."""
+        with self.transaction() as batch:
+            row = batch.conn.execute(NEXT_QUEUED_JOB_SQL).fetchone()
+            if not row:
+                return None
+            now = time.time()
+            batch.conn.execute(CLAIM_JOB_SQL, (worker_id, now, now, row["job_id"]))
+        return self.get_job(row["job_id"])
+
+    def heartbeat_job(self, job_id: str):
+        with self._get_connection() as conn:
+            conn.execute(HEARTBEAT_JOB_SQL, (time.time(), job_id))
+
+    def requeue_stale_jobs(self, stale_after: float, max_attempts: int) -> int:
+        """Requeue running jobs whose worker stopped heartbeating (e.g. after a restart)."""
+        now = time.time()
+        with self.transaction() as batch:
+            requeued = batch.conn.execute(REQUEUE_STALE_JOBS_SQL, (now, now - stale_after, max_attempts)).rowcount
+            batch.conn.execute(FAIL_STALE_JOBS_SQL, (now, now - stale_after, max_attempts))
+        return requeued
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+
+class ExecutionPools:
+    """
+    Bounded pools for blocking work awaited from async handlers.
+
+    run_io: network and disk bound calls (OpenAI client, file writes), on threads.
+    run_cpu: CPU bound stages (meshing, rendering), on worker processes. The
+    callable and its arguments must be picklable, i.e. module-level functions.
+    """
+
+    def __init__(self, io_workers: int, cpu_workers: int):
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(0, cpu_workers)
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io")
+            return self._io_pool
+
+    @property
+    def cpu_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu_pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                self._cpu_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._cpu_pool
+
+    async def run_io(self, func: Callable, *args, **kwargs):
+        """Run a blocking IO call on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, functools.partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable, *args, **kwargs):
+        """Run a CPU-heavy call on the process pool (or the thread pool if CPU_POOL_SIZE=0)."""
+        if self.cpu_workers == 0:
+            return await self.run_io(func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        pool = self.cpu_pool
+        try:
+            return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); drop the pool so the next call gets a fresh one
+            with self._lock:
+                if self._cpu_pool is pool:
+                    self._cpu_pool = None
+            pool.shutdown(wait=False)
+            raise
+
+    def shutdown(self):
+        """Stop both pools; called on application shutdown."""
+        with self._lock:
+            io_pool, cpu_pool = self._io_pool, self._cpu_pool
+            self._io_pool = self._cpu_pool = None
+        if io_pool is not None:
+            io_pool.shutdown(wait=False)
+        if cpu_pool is not None:
+            cpu_pool.shutdown(wait=False)
+
+
+executor = ExecutionPools(io_workers=settings.IO_POOL_SIZE, cpu_workers=settings.CPU_POOL_SIZE)
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def file_sha256(file_path: str, chunk_bytes: int = 1024 * 1024) -> str:
+    """Hex sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
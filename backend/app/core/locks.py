@@ -0,0 +1,91 @@
+import time
+import asyncio
+from typing import Dict
+
+
+class SessionBusyError(Exception):
+    """Raised in reject-if-busy mode when the session is already being processed."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Session {key} is busy, please retry when the current request finishes.")
+        self.key = key
+
+
+class _Entry:
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+
+class KeyedAsyncLock:
+    """
+    Per-key asyncio locks for serializing work on one session.
+
+    Waiting suspends only the calling coroutine. An entry lives only while a
+    coroutine holds or waits on it, so the table is bounded by the number of
+    active sessions. Wait times are recorded for contention metrics.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self.acquired = 0
+        self.contended = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def locked(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    async def acquire(self, key: str, reject_if_busy: bool = False) -> float:
+        """Acquire the lock for key and return the seconds spent waiting."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        if entry.lock.locked():
+            if reject_if_busy:
+                self.rejected += 1
+                self._discard_if_idle(key, entry)
+                raise SessionBusyError(key)
+            self.contended += 1
+
+        entry.refs += 1
+        start = time.monotonic()
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            entry.refs -= 1
+            self._discard_if_idle(key, entry)
+            raise
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or not entry.lock.locked():
+            return
+        entry.lock.release()
+        entry.refs -= 1
+        self._discard_if_idle(key, entry)
+
+    def _discard_if_idle(self, key: str, entry: _Entry):
+        if entry.refs == 0 and not entry.lock.locked() and self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "active_keys": len(self._entries),
+            "waiting": sum(max(0, e.refs - 1) for e in self._entries.values()),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
@@ -0,0 +1,54 @@
+import os
+import re
+
+from app.core.database import Database
+from app.core.hashing import file_sha256
+
+SILHOUETTE_NAME = re.compile(r"^(?P<session_id>.+)_2d_v(?P<version>\d+)\.png$")
+
+
+def backfill_artifact_versions(db: Database, processed_dir: str, url_prefix: str = "/static/processed") -> int:
+    """
+    Index silhouettes written before artifact_versions existed.
+
+    Files are recorded per session in creation-time order, matching the
+    old glob + getctime "latest" rule. Returns the number of rows added.
+    """
+    if not os.path.isdir(processed_dir):
+        return 0
+
+    by_session = {}
+    for filename in os.listdir(processed_dir):
+        match = SILHOUETTE_NAME.match(filename)
+        if match:
+            file_path = os.path.join(processed_dir, filename)
+            by_session.setdefault(match.group("session_id"), []).append(
+                (os.path.getctime(file_path), int(match.group("version")), filename, file_path)
+            )
+
+    added = 0
+    with db.transaction() as batch:
+        for session_id, entries in by_session.items():
+            if db.get_latest_version(session_id, "2d"):
+                continue
+            for _, version, filename, file_path in sorted(entries):
+                batch.record_version(
+                    session_id, "2d", version, file_path, f"{url_prefix}/{filename}",
+                    os.path.getsize(file_path), file_sha256(file_path),
+                )
+                added += 1
+    return added
+
+
+# Ordered schema migrations; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    backfill_artifact_versions,
+]
+
+
+def run_migrations(db: Database, processed_dir: str):
+    current = db.get_schema_version()
+    for number, migration in enumerate(MIGRATIONS[current:], start=current + 1):
+        result = migration(db, processed_dir)
+        db.set_schema_version(number)
+        print(f"Applied migration {number} ({migration.__name__}): {result}")
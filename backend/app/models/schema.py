@@ -42,6 +42,12 @@ class Generate3DRequest(BaseModel):
     prompt: Optional[str]=Field(None, description="additional instructions for 3D generation, e.g., 'make it thicker'")
     depth_div_width: Optional[float] = Field(None, description="depth to width ratio for 3D model scaling")
     aspect_ratio: Optional[float] = Field(1.0, description="aspect ratio for 3D model scaling, default is 1.0")
+    max_error: Optional[float] = Field(None, ge=0, description="adaptive mesh height tolerance in model units, 0 merges only exactly flat regions")
+    target_triangles: Optional[int] = Field(None, gt=0, description="triangle budget for the adaptive mesh, overrides max_error")
+    format: Optional[str] = Field("stl", description="output mesh format: stl, ply, glb or 3mf")
+    adjust_depth: Optional[bool] = Field(False, description="rescale the stored relief to the new depth, keeping its triangles")
+    quality: Optional[str] = Field("final", description="preview: fast low-resolution mesh and render, final: full resolution")
+    prefetch_final: Optional[bool] = Field(False, description="with quality=preview, also queue the final model in the background")
     class Config:
         schema_extra = {
             "example": {
@@ -147,3 +153,27 @@ class Generate3DResponse(BaseModel):
         }
 
 
+class JobResponse(BaseModel):
+    """后台任务状态"""
+    job_id: str
+    kind: str
+    session_id: str
+    status: str = Field(..., description="queued / running / succeeded / failed")
+    progress: float = Field(0.0, description="0.0 - 1.0")
+    stage: Optional[str] = Field(None, description="last completed pipeline stage")
+    result: Optional[Dict[str, Any]] = Field(None, description="the pipeline response once finished")
+    error: Optional[str] = None
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "job_id": "5f0c2e0a9b7d4a7e8f3c1d2b4a6e8c0f",
+                "kind": "generate3d",
+                "session_id": "abc-123-def",
+                "status": "running",
+                "progress": 0.5,
+                "stage": "mesh_built",
+                "result": None,
+                "error": None
+            }
+        }
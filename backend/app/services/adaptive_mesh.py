@@ -0,0 +1,187 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Bisection steps when searching max_error for a triangle budget
+_TARGET_SEARCH_STEPS = 24
+
+
+def _range_pyramid(scaled_mesh: np.ndarray) -> List[np.ndarray]:
+    """
+    Height range (max - min over all grid vertices) of every aligned 2^L x 2^L
+    block of cells, for L = 0 up to the largest level that still fits.
+    """
+    z = scaled_mesh
+    lo = np.minimum(np.minimum(z[:-1, :-1], z[:-1, 1:]), np.minimum(z[1:, :-1], z[1:, 1:]))
+    hi = np.maximum(np.maximum(z[:-1, :-1], z[:-1, 1:]), np.maximum(z[1:, :-1], z[1:, 1:]))
+    ranges = [hi - lo]
+    while lo.shape[0] >= 2 and lo.shape[1] >= 2:
+        r, c = lo.shape[0] // 2, lo.shape[1] // 2
+        # Children share their border vertices, so the parent range is exact
+        lo = lo[:2 * r, :2 * c].reshape(r, 2, c, 2).min(axis=(1, 3))
+        hi = hi[:2 * r, :2 * c].reshape(r, 2, c, 2).max(axis=(1, 3))
+        ranges.append(hi - lo)
+    return ranges
+
+
+def _upsample(mask: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    out = np.zeros(shape, dtype=bool)
+    up = mask.repeat(2, axis=0).repeat(2, axis=1)
+    out[:up.shape[0], :up.shape[1]] = up
+    return out
+
+
+def _plan(ranges: List[np.ndarray], max_error: float):
+    """
+    Pick quadtree leaves: the largest aligned blocks whose height range is
+    within max_error. Returns the mask of cells left at full resolution and
+    the (level, block rows, block cols) of every merged leaf.
+    """
+    top = len(ranges) - 1
+    covered = np.zeros(ranges[top].shape, dtype=bool)
+    leaves = []
+    for level in range(top, 0, -1):
+        flat = ranges[level] <= max_error
+        leaf = flat & ~covered
+        if leaf.any():
+            bi, bj = np.nonzero(leaf)
+            leaves.append((level, bi, bj))
+        covered = _upsample(covered | flat, ranges[level - 1].shape)
+    return ~covered, leaves
+
+
+def _used_vertices(shape: Tuple[int, int], dense: np.ndarray, leaves) -> np.ndarray:
+    """Grid vertices that are a corner of some leaf or full-resolution cell."""
+    used = np.zeros(shape, dtype=bool)
+    di, dj = np.nonzero(dense)
+    for oi in (0, 1):
+        for oj in (0, 1):
+            used[di + oi, dj + oj] = True
+    for level, bi, bj in leaves:
+        size = 1 << level
+        for oi in (0, size):
+            for oj in (0, size):
+                used[bi * size + oi, bj * size + oj] = True
+    return used
+
+
+def _boundary_offsets(size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(4, size + 1) grid offsets walking a block's edges counter-clockwise in (i, j)."""
+    k = np.arange(size + 1)
+    zero, full = np.zeros_like(k), np.full_like(k, size)
+    di = np.stack([k, full, size - k, zero])
+    dj = np.stack([zero, k, full, size - k])
+    return di, dj
+
+
+def _leaf_boundary(used: np.ndarray, level: int, bi: np.ndarray, bj: np.ndarray):
+    """Boundary points of each leaf and the used-vertex mask along them."""
+    size = 1 << level
+    di, dj = _boundary_offsets(size)
+    pi = (bi * size)[:, None, None] + di[None]
+    pj = (bj * size)[:, None, None] + dj[None]
+    return pi, pj, used[pi, pj]
+
+
+def _count(shape, dense, leaves) -> int:
+    used = _used_vertices(shape, dense, leaves)
+    total = 2 * int(dense.sum())
+    for level, bi, bj in leaves:
+        _, _, on_edge = _leaf_boundary(used, level, bi, bj)
+        # One fan triangle per used boundary point; the closing corner of each edge is the next edge's start
+        total += int(on_edge[..., :-1].sum())
+    return total
+
+
+def adaptive_triangle_count(scaled_mesh: np.ndarray, max_error: float = 0.0) -> int:
+    """Number of triangles build_adaptive_relief_vectors would emit."""
+    dense, leaves = _plan(_range_pyramid(scaled_mesh), max_error)
+    return _count(scaled_mesh.shape, dense, leaves)
+
+
+def max_error_for_target(scaled_mesh: np.ndarray, target_triangles: int) -> float:
+    """
+    Smallest max_error (to bisection precision) whose adaptive mesh has at
+    most target_triangles. Returns the full height range if even the
+    coarsest quadtree cannot meet the budget.
+    """
+    ranges = _range_pyramid(scaled_mesh)
+    shape = scaled_mesh.shape
+
+    def count(max_error: float) -> int:
+        return _count(shape, *_plan(ranges, max_error))
+
+    if count(0.0) <= target_triangles:
+        return 0.0
+    lo, hi = 0.0, float(scaled_mesh.max() - scaled_mesh.min())
+    if count(hi) > target_triangles:
+        return hi
+    for _ in range(_TARGET_SEARCH_STEPS):
+        mid = (lo + hi) / 2
+        if count(mid) <= target_triangles:
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def build_adaptive_relief_vectors(scaled_mesh: np.ndarray, aspect_ratio: float = 1.0,
+                                  max_error: float = 0.0, target_triangles: Optional[int] = None) -> np.ndarray:
+    """
+    Build an (N, 3, 3) relief whose flat regions are merged into quadtree blocks.
+
+    A 2^L block is merged when every grid height inside it is within
+    max_error of every other, so the merged surface never deviates from the
+    heightmap by more than max_error (max_error=0 merges only exactly flat
+    blocks and is lossless). Merged blocks are fanned from their centre
+    through every vertex on their border that a neighbour uses, so there are
+    no T-junctions or cracks. Cells left at full resolution keep the two
+    triangles of build_relief_vectors, and winding matches it.
+    If target_triangles is given, max_error is searched to meet that budget.
+    """
+    rows, cols = scaled_mesh.shape
+    if rows < 2 or cols < 2:
+        raise ValueError(f"Heightmap too small to mesh: {rows}x{cols}")
+    if max_error < 0:
+        raise ValueError(f"max_error must be non-negative, got {max_error}")
+    if target_triangles is not None:
+        max_error = max_error_for_target(scaled_mesh, target_triangles)
+
+    dense, leaves = _plan(_range_pyramid(scaled_mesh), max_error)
+    used = _used_vertices(scaled_mesh.shape, dense, leaves)
+
+    def vertices(i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        return np.stack([i * aspect_ratio, j.astype(np.float64), scaled_mesh[i, j]], axis=-1)
+
+    parts = []
+
+    # Full-resolution cells, same two triangles per cell as the dense mesher
+    ci, cj = np.nonzero(dense)
+    if len(ci):
+        cell = np.empty((len(ci), 2, 3, 3), dtype=np.float32)
+        cell[:, 0, 0] = vertices(ci + 1, cj)
+        cell[:, 0, 1] = vertices(ci, cj + 1)
+        cell[:, 0, 2] = vertices(ci, cj)
+        cell[:, 1, 0] = vertices(ci + 1, cj + 1)
+        cell[:, 1, 1] = vertices(ci, cj + 1)
+        cell[:, 1, 2] = vertices(ci + 1, cj)
+        parts.append(cell.reshape(-1, 3, 3))
+
+    for level, bi, bj in leaves:
+        size = 1 << level
+        pi, pj, on_edge = _leaf_boundary(used, level, bi, bj)
+        # Index of the next used point at or after each position along an edge
+        positions = np.where(on_edge, np.arange(size + 1), size)
+        next_used = np.minimum.accumulate(positions[..., ::-1], axis=-1)[..., ::-1]
+
+        leaf, edge, k = np.nonzero(on_edge[..., :-1])
+        nk = next_used[leaf, edge, k + 1]
+        fan = np.empty((len(leaf), 3, 3), dtype=np.float32)
+        fan[:, 0] = vertices(bi[leaf] * size + size // 2, bj[leaf] * size + size // 2)
+        fan[:, 1] = vertices(pi[leaf, edge, k], pj[leaf, edge, k])
+        fan[:, 2] = vertices(pi[leaf, edge, nk], pj[leaf, edge, nk])
+        parts.append(fan)
+
+    if not parts:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    return np.concatenate(parts)
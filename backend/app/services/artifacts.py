@@ -0,0 +1,312 @@
+import os
+import re
+import gzip
+import stat
+import asyncio
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import Response, StreamingResponse
+from starlette.staticfiles import StaticFiles
+
+from app.core.config import settings
+from app.core.executor import executor
+from app.services.cache_service import ResultCache, model_cache
+
+try:
+    import zstandard
+except ImportError:  # optional: without it only gzip variants are built
+    zstandard = None
+
+# Characters of the content hash used in ?v= and in ETags
+VERSION_CHARS = 16
+ETAG_CHARS = 32
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+CHUNK_BYTES = 256 * 1024
+
+# Content-Encoding -> sidecar suffix, most preferred first
+ENCODINGS = {"zstd": ".zst", "gzip": ".gz"}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("model/stl", ".stl")
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("model/3mf", ".3mf")
+mimetypes.add_type("application/x-ply", ".ply")
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.ARTIFACT_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=settings.ARTIFACT_GZIP_LEVEL, mtime=0)
+
+
+class ArtifactIndex:
+    """
+    Strong validators and precompressed variants of served files.
+
+    Digests are sha256 of the file content, memoized by (path, size, mtime),
+    so a file rewritten in place gets a new ETag. Compressed variants are
+    sidecars (model.stl.gz, model.stl.zst) whose mtime is set to the
+    original's; a sidecar with any other mtime is stale and rebuilt.
+    Sidecars written inside a ResultCache entry are accounted to it, so
+    eviction removes them together with the model.
+    """
+
+    def __init__(self, caches: List[ResultCache], max_entries: int = 4096):
+        self.caches = caches
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        # (path, mtime) of files whose compressed variant was not worth keeping
+        self._incompressible = set()
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def encodings(self) -> List[str]:
+        return [e for e in ENCODINGS if e != "zstd" or zstandard is not None]
+
+    def precompressible(self, path: str, size: int) -> bool:
+        extension = os.path.splitext(path)[1].lstrip(".").lower()
+        return extension in settings.ARTIFACT_PRECOMPRESS and size >= settings.ARTIFACT_PRECOMPRESS_MIN_BYTES
+
+    def digest(self, path: str, st: os.stat_result) -> str:
+        memo = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if memo in self._digests:
+                self._digests.move_to_end(memo)
+                return self._digests[memo]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._digests[memo] = digest.hexdigest()
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+        return digest.hexdigest()
+
+    def sidecar(self, path: str, st: os.stat_result, encoding: str) -> Optional[Tuple[str, os.stat_result]]:
+        """The up-to-date compressed variant of path, or None if it has not been built."""
+        sidecar_path = path + ENCODINGS[encoding]
+        try:
+            sidecar_st = os.stat(sidecar_path)
+        except OSError:
+            return None
+        if sidecar_st.st_mtime_ns != st.st_mtime_ns:
+            return None
+        return sidecar_path, sidecar_st
+
+    def compress(self, path: str):
+        """Write every missing compressed variant of path (blocking; run on the IO pool)."""
+        st = os.stat(path)
+        if (path, st.st_mtime_ns) in self._incompressible:
+            return
+        missing = [e for e in self.encodings() if self.sidecar(path, st, e) is None]
+        if not missing:
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        sizes = []
+        for encoding in missing:
+            compressed = _compress(data, encoding)
+            if len(compressed) > 0.9 * len(data):
+                self._incompressible.add((path, st.st_mtime_ns))
+                return
+            sizes.append(f"{encoding} {len(compressed)}")
+            sidecar_path = path + ENCODINGS[encoding]
+            tmp_path = f"{sidecar_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp_path, sidecar_path)
+        print(f"Precompressed {path} ({len(data)} bytes): {', '.join(sizes)}")
+        self._account(path)
+
+    def _account(self, path: str):
+        entry = os.path.dirname(os.path.abspath(path))
+        for cache in self.caches:
+            root = os.path.abspath(cache.root)
+            if os.path.commonpath([root, entry]) == root and entry != root:
+                cache.commit_files(os.path.basename(entry))
+
+    def precompress_later(self, path: str):
+        """Build the compressed variants of path in the background (no-op if one is already running)."""
+        path = os.path.abspath(path)
+        if path in self._pending or not settings.ARTIFACT_PRECOMPRESS:
+            return
+
+        async def run():
+            try:
+                await executor.run_io(self.compress, path)
+            except Exception as e:
+                print(f"Precompression failed for {path}: {e}")
+            finally:
+                self._pending.pop(path, None)
+
+        self._pending[path] = asyncio.ensure_future(run())
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    return accepted
+
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) of a single bytes range; None to ignore the header; (-1, -1) if unsatisfiable."""
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Malformed or multiple ranges: serve the whole representation
+        return None
+    first, last = match.groups()
+    if first == "":
+        if last == "":
+            return None
+        if int(last) == 0:
+            return (-1, -1)
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return (-1, -1)
+    return start, end
+
+
+async def _file_chunks(path: str, start: int, end: int):
+    f = await executor.run_io(open, path, "rb")
+    try:
+        await executor.run_io(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await executor.run_io(f.read, min(CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await executor.run_io(f.close)
+
+
+class ArtifactFiles(StaticFiles):
+    """
+    /static with HTTP caching for generated artifacts.
+
+    Every file gets a strong ETag (its content hash) and answers conditional
+    GETs with 304. A file requested with ?v= matching its content hash, or
+    living under one of the immutable directories (the content-addressed
+    model cache), is sent as Cache-Control: immutable; anything else must be
+    revalidated. Meshes are served as a gzip/zstd variant when the client
+    accepts one and it has been built (otherwise the plain file is sent and
+    the variant is built in the background). Single byte ranges, with
+    If-Range, let interrupted downloads resume.
+    """
+
+    def __init__(self, *args, index: ArtifactIndex, immutable: Tuple[str, ...] = (), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.index = index
+        self.immutable = tuple(d.strip("/") + "/" for d in immutable)
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405, headers={"Allow": "GET, HEAD"})
+        try:
+            full_path, stat_result = await executor.run_io(self.lookup_path, path)
+        except PermissionError:
+            raise HTTPException(status_code=401)
+        except (OSError, ValueError):
+            raise HTTPException(status_code=404)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        return await self.artifact_response(path.replace(os.sep, "/"), full_path, stat_result, scope)
+
+    async def artifact_response(self, path: str, full_path: str, st: os.stat_result, scope) -> Response:
+        request_headers = Headers(scope=scope)
+        digest = await executor.run_io(self.index.digest, full_path, st)
+
+        version = QueryParams(scope.get("query_string", b"")).get("v")
+        immutable = version == digest[:VERSION_CHARS] or path.startswith(self.immutable)
+
+        headers = {
+            "cache-control": IMMUTABLE if immutable else REVALIDATE,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+            "content-type": mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+        }
+
+        body_path, body_st, encoding = full_path, st, None
+        if self.index.precompressible(full_path, st.st_size):
+            headers["vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            wanted = [e for e in self.index.encodings() if accepted.get(e, 0) > 0]
+            for candidate in wanted:
+                variant = await executor.run_io(self.index.sidecar, full_path, st, candidate)
+                if variant is not None:
+                    (body_path, body_st), encoding = variant, candidate
+                    break
+            else:
+                if wanted:
+                    self.index.precompress_later(full_path)
+        if encoding:
+            headers["content-encoding"] = encoding
+        etag = f'"{digest[:ETAG_CHARS]}{"-" + encoding if encoding else ""}"'
+        headers["etag"] = etag
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]
+            if "*" in tags or etag in tags:
+                return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "content-type"})
+        elif "if-modified-since" in request_headers:
+            since = parsedate(request_headers["if-modified-since"])
+            modified = parsedate(headers["last-modified"])
+            if since is not None and modified is not None and since >= modified:
+                return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "content-type"})
+
+        size = body_st.st_size
+        start, end, status_code = 0, size - 1, 200
+        range_header = request_headers.get("range")
+        if range_header and scope["method"] == "GET" and self._if_range(request_headers.get("if-range"), etag, headers["last-modified"]):
+            byte_range = _byte_range(range_header, size)
+            if byte_range == (-1, -1):
+                return Response(status_code=416, headers={"content-range": f"bytes */{size}", "accept-ranges": "bytes", "etag": etag})
+            if byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        headers["content-length"] = str(end - start + 1)
+        if scope["method"] == "HEAD" or size == 0:
+            return Response(status_code=status_code, headers=headers)
+        return StreamingResponse(_file_chunks(body_path, start, end), status_code=status_code, headers=headers)
+
+    @staticmethod
+    def _if_range(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+        """Whether a Range header applies: no If-Range, or it names the current representation."""
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        return if_range == last_modified
+
+
+artifact_index = ArtifactIndex([model_cache.cache])
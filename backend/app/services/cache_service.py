@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.executor import executor
+from app.core.prompt import PROMPTS
+from app.services.image_service import ImageService
+from app.services.silhouette_conditioning import CONDITIONING_VERSION, condition_silhouette_png
+
+
+class ResultCache:
+    """
+    Disk-backed, content-addressed cache.
+
+    Each key owns a directory root/<key[:2]>/<key>/ holding one or more named
+    files. Entries expire after ttl seconds and the least recently used ones
+    are evicted once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int, ttl: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> {"size": bytes, "last_used": ts, "created": ts}; built lazily from disk
+        self._index: Optional[Dict[str, dict]] = None
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """sha256 over the given str/bytes parts, length-prefixed so boundaries matter."""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = part.encode("utf-8") if isinstance(part, str) else bytes(part)
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _load_index(self) -> Dict[str, dict]:
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.root):
+                for shard in os.listdir(self.root):
+                    shard_dir = os.path.join(self.root, shard)
+                    if not os.path.isdir(shard_dir):
+                        continue
+                    for key in os.listdir(shard_dir):
+                        entry = os.path.join(shard_dir, key)
+                        files = [os.path.join(entry, f) for f in os.listdir(entry) if not f.endswith(".tmp")]
+                        if not files:
+                            continue
+                        # Entry dir mtime is touched on every hit; file mtimes keep the write time
+                        self._index[key] = {
+                            "size": sum(os.path.getsize(f) for f in files),
+                            "last_used": os.path.getmtime(entry),
+                            "created": min(os.path.getmtime(f) for f in files),
+                        }
+        return self._index
+
+    def _remove(self, key: str):
+        entry = self.entry_dir(key)
+        if os.path.isdir(entry):
+            for name in os.listdir(entry):
+                # A writer may be staging a .tmp here; leave it and the dir alone
+                if not name.endswith(".tmp"):
+                    os.remove(os.path.join(entry, name))
+            try:
+                os.rmdir(entry)
+            except OSError:
+                pass
+        self._load_index().pop(key, None)
+
+    def _count(self, counter: Dict[str, int], name: str):
+        counter[name] = counter.get(name, 0) + 1
+
+    def get_path(self, key: str, name: str) -> Optional[str]:
+        """Return the cached file path for (key, name), or None on a miss."""
+        with self._lock:
+            index = self._load_index()
+            meta = index.get(key)
+            path = os.path.join(self.entry_dir(key), name)
+            if meta is None or not os.path.exists(path):
+                self._count(self.misses, name)
+                return None
+            now = time.time()
+            if self.ttl and now - meta["created"] > self.ttl:
+                self._remove(key)
+                self._count(self.misses, name)
+                return None
+            meta["last_used"] = now
+            os.utime(self.entry_dir(key), (now, now))
+            self._count(self.hits, name)
+            return path
+
+    def get_bytes(self, key: str, name: str) -> Optional[bytes]:
+        path = self.get_path(key, name)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted between the lookup and the read
+            return None
+
+    def put_bytes(self, key: str, name: str, data: bytes) -> str:
+        """Store data as (key, name), atomically, then evict down to max_bytes."""
+        entry = self.entry_dir(key)
+        path = os.path.join(entry, name)
+        with self._lock:
+            index = self._load_index()
+            os.makedirs(entry, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+
+            now = time.time()
+            meta = index.setdefault(key, {"size": 0, "last_used": now, "created": now})
+            meta["size"] += len(data) - old_size
+            meta["last_used"] = now
+            self._evict(protect=key)
+        return path
+
+    def commit_files(self, key: str) -> str:
+        """
+        Account for files written straight into entry_dir(key) by someone
+        else (e.g. a worker process), then evict down to max_bytes.
+        """
+        entry = self.entry_dir(key)
+        with self._lock:
+            index = self._load_index()
+            now = time.time()
+            files = [os.path.join(entry, f) for f in os.listdir(entry) if not f.endswith(".tmp")]
+            meta = index.setdefault(key, {"size": 0, "last_used": now, "created": now})
+            meta["size"] = sum(os.path.getsize(f) for f in files)
+            meta["last_used"] = now
+            self._evict(protect=key)
+        return entry
+
+    def _evict(self, protect: str = None):
+        index = self._load_index()
+        now = time.time()
+        if self.ttl:
+            for key in [k for k, m in index.items() if now - m["created"] > self.ttl and k != protect]:
+                self._remove(key)
+        total = sum(m["size"] for m in index.values())
+        if total <= self.max_bytes:
+            return
+        for key in sorted(index, key=lambda k: index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == protect:
+                continue
+            total -= index[key]["size"]
+            self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._load_index()
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "entries": len(index),
+                "bytes": sum(m["size"] for m in index.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+class ImageResultCache:
+    """
+    Cache in front of ImageService for the upload pipeline.
+
+    Keys combine a hash of the decoded upload pixels, the prompt text and
+    the model name, so a re-upload of the same picture, even re-encoded,
+    skips both the gpt-4o analysis and the gpt-image-1 edit. Callers that
+    already hold the normalized upload (ingest.normalize_image) pass it as
+    image and nothing is re-read from disk.
+    """
+
+    def __init__(self, cache: ResultCache):
+        self.cache = cache
+        self.image_service = ImageService
+
+    def image_digest(self, image_path: str) -> str:
+        """Hash of the normalized image pixels (RGBA, size-prefixed)."""
+        with Image.open(image_path) as img:
+            rgba = img.convert("RGBA")
+            return ResultCache.make_key(f"{rgba.width}x{rgba.height}", rgba.tobytes())
+
+    async def analyze_proportions(self, image_digest: str, image_path: str, model: str = "gpt-4o",
+                                  image: Optional[dict] = None) -> dict:
+        key = ResultCache.make_key(image_digest, PROMPTS.RATIO_ANALYSIS, model)
+        cached = await executor.run_io(self.cache.get_bytes, key, "analysis.json")
+        if cached is not None:
+            print(f"Proportion analysis cache hit: {key[:12]}")
+            return json.loads(cached)
+
+        if image is not None:
+            image_b64 = base64.b64encode(image['bytes']).decode("utf-8")
+            analysis = await self.image_service.analyze_proportions_async(image_b64=image_b64, model=model, mime=image['mime'])
+        else:
+            image_b64 = await executor.run_io(self.image_service.encode_image_to_base64, image_path)
+            analysis = await self.image_service.analyze_proportions_async(image_b64=image_b64, model=model)
+        # Failures are not cached so a retry goes back to the API
+        if analysis.get("success"):
+            await executor.run_io(self.cache.put_bytes, key, "analysis.json", json.dumps(analysis).encode("utf-8"))
+        return analysis
+
+    async def generate_2d_silhouette(self, image_digest: str, image_path: str, model: str = "gpt-image-1",
+                                     image: Optional[dict] = None) -> str:
+        key = ResultCache.make_key(image_digest, PROMPTS.SILHOUETTE_EXTRACTION, model)
+        cached = await executor.run_io(self.cache.get_bytes, key, "silhouette.png")
+        if cached is not None:
+            print(f"Silhouette cache hit: {key[:12]}")
+            return base64.b64encode(cached).decode("utf-8")
+
+        if image is not None:
+            silhouette_b64 = await self.image_service.generate_2d_silhouette_async(
+                image_path=image_path, model=model, image_bytes=image['bytes'], mime=image['mime'])
+        else:
+            silhouette_b64 = await self.image_service.generate_2d_silhouette_async(image_path=image_path, model=model)
+        await executor.run_io(self.cache.put_bytes, key, "silhouette.png", base64.b64decode(silhouette_b64))
+        return silhouette_b64
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class ModelResultCache:
+    """
+    Cache of finished 3D results (model file, preview and metadata).
+
+    Keys combine the silhouette's content hash with every parameter that
+    changes the output, so dragging a slider back to a previous value is a
+    lookup. Entries live under /static and are served directly from their
+    content-addressed paths, so parameter variants never overwrite each other.
+    """
+
+    # Bump when meshing/rendering changes so stale artifacts are not served
+    VERSION = "relief-1"
+    META = "meta.json"
+    PREVIEW = "preview.png"
+
+    def __init__(self, cache: ResultCache, url_prefix: str):
+        self.cache = cache
+        self.url_prefix = url_prefix
+
+    def make_key(self, silhouette_sha256: str, fmt: str, **params) -> str:
+        preview = (settings.PREVIEW_RENDERER, settings.PREVIEW_SIZE, settings.PREVIEW_ELEVATION,
+                   settings.PREVIEW_AZIMUTH, settings.PREVIEW_SHADING, settings.PREVIEW_SUPERSAMPLE)
+        return ResultCache.make_key(self.VERSION, silhouette_sha256, fmt,
+                                    json.dumps(params, sort_keys=True), json.dumps(preview))
+
+    def model_name(self, fmt: str) -> str:
+        return f"model.{fmt}"
+
+    def file_info(self, key: str, name: str) -> dict:
+        """Disk path and /static URL of a file inside an entry."""
+        file_path = os.path.join(self.cache.entry_dir(key), name)
+        rel = os.path.relpath(file_path, self.cache.root).replace(os.sep, "/")
+        return {"file_path": file_path, "url_path": f"{self.url_prefix}/{rel}"}
+
+    def prepare(self, key: str) -> str:
+        """Create the entry directory a worker writes into."""
+        entry = self.cache.entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        return entry
+
+    def get(self, key: str, fmt: str) -> Optional[dict]:
+        """Stored metadata if the entry is complete (metadata is written last), else None."""
+        data = self.cache.get_bytes(key, self.META)
+        if data is None:
+            return None
+        entry = self.cache.entry_dir(key)
+        if not all(os.path.exists(os.path.join(entry, name)) for name in (self.model_name(fmt), self.PREVIEW)):
+            return None
+        return json.loads(data)
+
+    def put(self, key: str, preview_png: bytes, meta: dict) -> None:
+        """Store the preview, then the metadata (it marks the entry complete), and account for the model file."""
+        self.cache.put_bytes(key, self.PREVIEW, preview_png)
+        self.cache.put_bytes(key, self.META, json.dumps(meta).encode("utf-8"))
+        self.cache.commit_files(key)
+
+    def put_meta(self, key: str, meta: dict) -> None:
+        """Rewrite the metadata of a complete entry."""
+        self.cache.put_bytes(key, self.META, json.dumps(meta).encode("utf-8"))
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class SilhouetteConditioner:
+    """
+    Conditioned silhouettes, computed once per saved version.
+
+    Keys combine the silhouette's content hash with the conditioning
+    settings, so every saved version is conditioned once and re-meshing it
+    (new depth, format, tolerance) starts from the cached cleaned PNG.
+    """
+
+    IMAGE = "conditioned.png"
+    INFO = "conditioning.json"
+
+    def __init__(self, cache: ResultCache):
+        self.cache = cache
+
+    def params(self) -> dict:
+        return {"pad": settings.SILHOUETTE_PAD, "despeckle": settings.SILHOUETTE_DESPECKLE,
+                "smooth": settings.SILHOUETTE_SMOOTH}
+
+    async def condition(self, silhouette_sha256: str, silhouette_bytes: bytes) -> Tuple[bytes, dict]:
+        params = self.params()
+        key = ResultCache.make_key(CONDITIONING_VERSION, silhouette_sha256, json.dumps(params, sort_keys=True))
+        info = await executor.run_io(self.cache.get_bytes, key, self.INFO)
+        data = await executor.run_io(self.cache.get_bytes, key, self.IMAGE) if info is not None else None
+        if data is not None:
+            return data, dict(json.loads(info), cached=True)
+
+        data, info = await executor.run_cpu(condition_silhouette_png, silhouette_bytes, **params)
+        await executor.run_io(self.cache.put_bytes, key, self.IMAGE, data)
+        await executor.run_io(self.cache.put_bytes, key, self.INFO, json.dumps(info).encode("utf-8"))
+        return data, dict(info, cached=False)
+
+
+image_cache = ImageResultCache(ResultCache(
+    root=settings.RESULT_CACHE_DIR,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl=settings.RESULT_CACHE_TTL,
+))
+
+model_cache = ModelResultCache(ResultCache(
+    root=settings.MODEL_CACHE_DIR,
+    max_bytes=settings.MODEL_CACHE_MAX_BYTES,
+    ttl=settings.MODEL_CACHE_TTL,
+), url_prefix=settings.MODEL_CACHE_URL)
+
+silhouette_conditioner = SilhouetteConditioner(image_cache.cache)
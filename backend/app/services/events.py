@@ -0,0 +1,94 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, List
+
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class _Channel:
+    __slots__ = ("history", "subscribers", "closed")
+
+    def __init__(self):
+        self.history: List[dict] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.closed = False
+
+
+class EventBus:
+    """
+    In-process pub/sub for pipeline stage events, keyed by job id.
+
+    Each channel keeps its history so a client that connects late still sees
+    earlier stages. Finished channels are kept for the max_finished most
+    recent jobs and then dropped. Channels that never finish here (e.g. a
+    job run by another worker process only shows "queued") are bounded by
+    max_channels, least recently published first, skipping any with
+    subscribers.
+    """
+
+    def __init__(self, max_finished: int = 256, max_channels: int = 1024):
+        self.max_finished = max_finished
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+    def _trim(self):
+        if len(self._channels) <= self.max_channels:
+            return
+        for key in [k for k, c in self._channels.items() if not c.subscribers]:
+            if len(self._channels) <= self.max_channels:
+                break
+            del self._channels[key]
+            self._finished.pop(key, None)
+
+    def publish(self, key: str, event_type: str, data: dict = None):
+        channel = self._channels.setdefault(key, _Channel())
+        if channel.closed:
+            return
+        self._channels.move_to_end(key)
+        event = {"type": event_type, "ts": time.time(), **(data or {})}
+        channel.history.append(event)
+        for queue in channel.subscribers:
+            queue.put_nowait(event)
+        if event_type in TERMINAL_EVENTS:
+            channel.closed = True
+            self._finished[key] = None
+            while len(self._finished) > self.max_finished:
+                old_key, _ = self._finished.popitem(last=False)
+                self._channels.pop(old_key, None)
+        self._trim()
+
+    def has_channel(self, key: str) -> bool:
+        return key in self._channels
+
+    async def subscribe(self, key: str, poll_interval: float = 1.0) -> AsyncIterator[dict]:
+        """
+        Yield past then live events for key until a terminal event.
+
+        Yields None every poll_interval seconds without events so the caller
+        can send keep-alives or check state stored elsewhere.
+        """
+        channel = self._channels.setdefault(key, _Channel())
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in channel.history:
+            queue.put_nowait(event)
+        channel.subscribers.append(queue)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            channel.subscribers.remove(queue)
+            # Nothing was ever published here (e.g. the job runs in another process)
+            if not channel.subscribers and not channel.history and self._channels.get(key) is channel:
+                del self._channels[key]
+
+
+event_bus = EventBus()
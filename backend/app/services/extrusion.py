@@ -0,0 +1,207 @@
+from typing import List, Tuple
+
+import cv2
+import mapbox_earcut as earcut
+import numpy as np
+
+Polygon = Tuple[np.ndarray, List[np.ndarray]]
+
+
+def _signed_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _clean_ring(ring: np.ndarray) -> np.ndarray:
+    """
+    Drop repeated and collinear points. earcut silently skips them, which
+    would leave wall vertices that the caps do not share (T-junctions).
+    """
+    while len(ring) >= 3:
+        prev, nxt = np.roll(ring, 1, axis=0), np.roll(ring, -1, axis=0)
+        cross = (ring[:, 0] - prev[:, 0]) * (nxt[:, 1] - prev[:, 1]) - (ring[:, 1] - prev[:, 1]) * (nxt[:, 0] - prev[:, 0])
+        keep = (cross != 0) & np.any(ring != prev, axis=1)
+        if keep.all():
+            break
+        ring = ring[keep]
+    return ring
+
+
+def _fill_diagonal_contacts(mask: np.ndarray) -> np.ndarray:
+    """
+    Fill one pixel of every 2x2 window whose only contact is diagonal, so
+    traced contours never pinch through a single point.
+    """
+    mask = mask.copy()
+    while True:
+        a, b = mask[:-1, :-1], mask[:-1, 1:]
+        c, d = mask[1:, :-1], mask[1:, 1:]
+        falling = (a & d & ~b & ~c).astype(bool)
+        rising = (b & c & ~a & ~d).astype(bool)
+        if not (falling.any() or rising.any()):
+            return mask
+        fi, fj = np.nonzero(falling)
+        mask[fi, fj + 1] = 1
+        ri, rj = np.nonzero(rising)
+        mask[ri, rj] = 1
+
+
+def silhouette_polygons(foreground: np.ndarray, simplify: float = 1.0, min_area: float = 4.0) -> List[Polygon]:
+    """
+    Trace a binary mask into polygons: (outer ring, [hole rings]) in pixel
+    coordinates (x=column, y=row). Rings are simplified with Douglas-Peucker
+    (simplify is the tolerance in pixels, 0 disables) and rings smaller than
+    min_area pixels are dropped. Islands inside holes come back as their own
+    polygons.
+
+    The mask is traced at twice its resolution with diagonal contacts filled,
+    so one-pixel necks and gaps keep a non-zero width and rings stay simple.
+    """
+    mask = (np.asarray(foreground) > 0).astype(np.uint8)
+    mask = _fill_diagonal_contacts(mask.repeat(2, axis=0).repeat(2, axis=1))
+    contours, hierarchy = cv2.findContours(mask, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+
+    rings = []
+    for contour in contours:
+        if simplify > 0:
+            contour = cv2.approxPolyDP(contour, 2 * simplify, True)
+        ring = _clean_ring(contour.reshape(-1, 2).astype(np.int64))
+        if len(ring) < 3 or abs(_signed_area(ring)) < 4 * min_area:
+            rings.append(None)
+            continue
+        # Back to source pixel coordinates (centres of the 2x pixels)
+        rings.append(ring / 2.0 - 0.25)
+
+    polygons = []
+    for index, (_, _, _, parent) in enumerate(hierarchy[0]):
+        if parent != -1 or rings[index] is None:
+            continue
+        holes = [rings[child] for child, entry in enumerate(hierarchy[0])
+                 if entry[3] == index and rings[child] is not None]
+        polygons.append((rings[index], holes))
+    return polygons
+
+
+def _split_pinched_vertices(xy: np.ndarray, caps: np.ndarray, outline: np.ndarray):
+    """
+    Give every fan of cap triangles around a pinched outline vertex (one that
+    starts more than one outline edge, e.g. where earcut bridged two holes
+    to the same point) its own copy of the vertex, so the walls raised there
+    do not share a vertical edge between four faces.
+    """
+    starts, counts = np.unique(outline[:, 0], return_counts=True)
+    pinched = starts[counts > 1]
+    if len(pinched) == 0:
+        return xy, caps, outline
+
+    xy, caps, outline = list(xy), caps.copy(), outline.copy()
+    for vertex in pinched:
+        rows, cols = np.nonzero(caps == vertex)
+        # For each triangle (v, a, b) in CCW order: the next triangle CCW around v starts at b
+        fan = {caps[r, (c + 1) % 3]: (r, caps[r, (c + 2) % 3]) for r, c in zip(rows, cols)}
+        outgoing = outline[outline[:, 0] == vertex, 1]
+        for k, first in enumerate(outgoing):
+            if k == 0:
+                continue
+            copy = len(xy)
+            xy.append(xy[vertex])
+            outline[(outline[:, 0] == vertex) & (outline[:, 1] == first), 0] = copy
+            target = first
+            while target in fan:
+                row, target = fan.pop(target)
+                caps[row][caps[row] == vertex] = copy
+            outline[(outline[:, 0] == target) & (outline[:, 1] == vertex), 1] = copy
+    return np.asarray(xy), caps, outline
+
+
+def extrude_polygons(polygons: List[Polygon], thickness: float, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extrude polygons into a closed solid between z=0 and z=thickness.
+
+    Returns (vertices (V, 3), faces (F, 3)). Image rows are flipped so the
+    picture reads upright from +Z; every face is wound counter-clockwise seen
+    from outside. Walls are raised along the boundary edges of the cap
+    triangulation itself rather than the input rings, so even where earcut
+    drops a point of a self-touching ring, every edge still belongs to
+    exactly two faces.
+    """
+    if thickness <= 0:
+        raise ValueError(f"Extrusion thickness must be positive, got {thickness}")
+
+    points, cap_faces = [], []
+    offset = 0
+    for outer, holes in polygons:
+        rings = [outer] + list(holes)
+        for k, ring in enumerate(rings):
+            ring = np.column_stack([ring[:, 0], height - 1 - ring[:, 1]]).astype(np.float64)
+            # Outer rings counter-clockwise, holes clockwise: walls then face outwards
+            if (_signed_area(ring) > 0) != (k == 0):
+                ring = ring[::-1]
+            rings[k] = ring
+
+        flat = np.concatenate(rings)
+        ends = np.cumsum([len(r) for r in rings]).astype(np.uint32)
+        tris = earcut.triangulate_float64(flat, ends).astype(np.int64).reshape(-1, 3)
+        # earcut does not promise a winding; make every cap triangle counter-clockwise
+        a, b, c = flat[tris[:, 0]], flat[tris[:, 1]], flat[tris[:, 2]]
+        clockwise = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]) < 0
+        tris[clockwise] = tris[clockwise][:, ::-1]
+        cap_faces.append(tris + offset)
+        points.append(flat)
+        offset += len(flat)
+
+    if not points:
+        raise ValueError("Silhouette has no closed contours to extrude")
+
+    xy = np.concatenate(points)
+    caps = np.concatenate(cap_faces)
+    # Directed cap edges with no reverse twin are the outline, interior on their left
+    n = len(xy)
+    edges = caps[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    outline = edges[~np.isin(edges[:, 0] * n + edges[:, 1], edges[:, 1] * n + edges[:, 0])]
+    xy, caps, outline = _split_pinched_vertices(xy, caps, outline)
+
+    n = len(xy)
+    vertices = np.vstack([
+        np.column_stack([xy, np.zeros(n)]),
+        np.column_stack([xy, np.full(n, float(thickness))]),
+    ])
+    p, q = outline[:, 0], outline[:, 1]
+    faces = np.concatenate([
+        caps + n,                                 # top, normals +Z
+        caps[:, ::-1],                            # bottom, normals -Z
+        np.column_stack([p, q, q + n]),           # walls, normals point outwards
+        np.column_stack([p, q + n, p + n]),
+    ])
+    return vertices, faces
+
+
+def is_closed_manifold(faces: np.ndarray) -> bool:
+    """True if every directed edge occurs once and its reverse occurs once."""
+    edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    n = int(faces.max()) + 1
+    keys = edges[:, 0] * n + edges[:, 1]
+    if len(np.unique(keys)) != len(keys):
+        return False
+    return bool(np.isin(edges[:, 1] * n + edges[:, 0], keys).all())
+
+
+def extrude_silhouette_mesh(foreground: np.ndarray, thickness: float, simplify: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Extrude a binary silhouette mask into (vertices, faces).
+
+    Douglas-Peucker can fold a ring onto itself on very thin features; if the
+    simplified solid is not closed the contours are extruded unsimplified.
+    """
+    vertices, faces = extrude_polygons(silhouette_polygons(foreground, simplify), thickness, foreground.shape[0])
+    if simplify > 0 and not is_closed_manifold(faces):
+        vertices, faces = extrude_polygons(silhouette_polygons(foreground, 0), thickness, foreground.shape[0])
+    return vertices, faces
+
+
+def extrude_silhouette(foreground: np.ndarray, thickness: float, simplify: float = 1.0) -> np.ndarray:
+    """Extrude a binary silhouette mask into an (N, 3, 3) float32 triangle array."""
+    vertices, faces = extrude_silhouette_mesh(foreground, thickness, simplify)
+    return vertices[faces].astype(np.float32)
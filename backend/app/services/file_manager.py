@@ -1,37 +1,40 @@
 import os
 import base64
-from PIL import Image
-import io
+from contextlib import nullcontext
+from typing import Optional
 from app.core.database import Database
+from app.core.migrations import run_migrations
+from app.services.storage import StorageBackend, storage
 
 
 class FileManager:
-    """Manages file operations with session_id based naming."""
+    """
+    Session artifacts: content goes to the storage backend (content-addressed,
+    local or S3), the database maps (session_id, file type) to it.
+    """
     
-    def __init__(self):
+    def __init__(self, storage: StorageBackend = storage):
         self.base_dir = "static"
+        # Scratch space for uploads being spooled; they are stored once normalized
         self.upload_dir = os.path.join(self.base_dir, "uploads")
+        # Silhouettes saved before the storage backend existed (indexed by migration 1)
         self.processed_dir = os.path.join(self.base_dir, "processed")
-        self.stl_dir = os.path.join(self.base_dir, "stl")
-        self.render_dir = os.path.join(self.base_dir, "renders")
+        self.storage = storage
         
         self.db = Database()
         self._ensure_directories()
+        run_migrations(self.db, self.processed_dir)
     
     def _ensure_directories(self):
         """Create necessary directories."""
-        for directory in [self.upload_dir, self.processed_dir, self.stl_dir, self.render_dir]:
+        for directory in [self.upload_dir, self.processed_dir]:
             os.makedirs(directory, exist_ok=True)
     
-    def save_uploaded_image(self, session_id: str, file_content: bytes) -> dict:
-        """Save uploaded image as {session_id}_original.png"""
+    def save_uploaded_image(self, session_id: str, file_content: bytes, extension: str = "png") -> dict:
+        """Store an already normalized upload (see ingest.normalize_image) as the session's "original" """
         try:
-            image = Image.open(io.BytesIO(file_content))
-            filename = f"{session_id}_original.png"
-            file_path = os.path.join(self.upload_dir, filename)
-            
-            image.convert('RGBA').save(file_path, 'PNG')
-            url_path = f"/static/uploads/{filename}"
+            stored = self.storage.put_bytes(file_content, extension)
+            file_path, url_path = stored['file_path'], stored['url_path']
             
             # Save to database
             self.db.save_file(session_id, "original", file_path, url_path)
@@ -40,45 +43,54 @@ class FileManager:
         except Exception as e:
             raise ValueError(f"Failed to save image: {str(e)}")
     
-    def save_2d_silhouette(self, session_id: str, image_b64: str, version: str = "v1") -> dict:
-        """Save 2D silhouette as {session_id}_2d_{version}.png"""
+    def save_2d_silhouette(self, session_id: str, image_b64: str, version: str = "v1", db=None) -> dict:
+        """Store a 2D silhouette as the session's 2d_{version} (db: optional transaction batch)"""
         try:
             print(f"Saving 2D silhouette for session: {session_id}, version: {version}")
             image_bytes = base64.b64decode(image_b64)
 
             print(f"Decoded image bytes length: {len(image_bytes)}")
-            filename = f"{session_id}_2d_{version}.png"
-
-            print(f"Generated filename: {filename}")
-            file_path = os.path.join(self.processed_dir, filename)
+            stored = self.storage.put_bytes(image_bytes, "png")
+            file_path, url_path = stored['file_path'], stored['url_path']
             
-
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
+            print(f"Saved silhouette to: {file_path}" + (" (already stored)" if stored['deduplicated'] else ""))
             
-            print(f"Saved silhouette to path: {file_path}")
-            url_path = f"/static/processed/{filename}"
+            # Save to database: the files row and the version row commit together
+            with (nullcontext(db) if db is not None else self.db.transaction()) as batch:
+                batch.save_file(session_id, f"2d_{version}", file_path, url_path)
+                revision = batch.record_version(
+                    session_id, "2d", int(version.lstrip("v")), file_path, url_path,
+                    len(image_bytes), stored['sha256']
+                )
             
-            # Save to database
-            self.db.save_file(session_id, f"2d_{version}", file_path, url_path)
-            
-            print(f"Saved file info to database for session: {session_id}, type: 2d_{version}")
+            print(f"Saved file info to database for session: {session_id}, type: 2d_{version}, revision: {revision}")
             return {"file_path": file_path, "url_path": url_path}
         except Exception as e:
             raise ValueError(f"Failed to save 2D silhouette: {str(e)}")
     
+    def register_file(self, session_id: str, file_type: str, file_path: str, url_path: str,
+                      stored: Optional[dict] = None) -> dict:
+        """
+        Record a file that was already written elsewhere (e.g. the 3D result
+        cache). A local backend serves it where it is; a shared one gets a
+        copy, so every replica can serve it. The returned "stored" (None for
+        a local backend) can be passed back for the same file to skip
+        re-hashing and re-uploading it.
+        """
+        if self.storage.is_local:
+            stored = None
+        else:
+            stored = stored or self.storage.put_file(file_path)
+            file_path, url_path = stored['file_path'], stored['url_path']
+        self.db.save_file(session_id, file_type, file_path, url_path)
+        return {"file_path": file_path, "url_path": url_path, "stored": stored}
+
     def save_stl_file(self, session_id: str, stl_bytes: bytes) -> dict:
-        """Save STL file as {session_id}_3d.stl"""
+        """Store an STL file as the session's "stl" """
         try:
-            filename = f"{session_id}_3d.stl"
-            file_path = os.path.join(self.stl_dir, filename)
-            
-            with open(file_path, "wb") as f:
-                f.write(stl_bytes)
+            stored = self.storage.put_bytes(stl_bytes, "stl")
+            file_path, url_path = stored['file_path'], stored['url_path']
             
-            url_path = f"/static/stl/{filename}"
-            
-            # Save to database
             self.db.save_file(session_id, "stl", file_path, url_path)
             
             return {"file_path": file_path, "url_path": url_path}
@@ -86,16 +98,11 @@ class FileManager:
             raise ValueError(f"Failed to save STL: {str(e)}")
     
     def save_3d_render(self, session_id: str, render_b64: str) -> dict:
-        """Save 3D render as {session_id}_render.png"""
+        """Store a 3D render as the session's "render" """
         try:
             image_bytes = base64.b64decode(render_b64)
-            filename = f"{session_id}_render.png"
-            file_path = os.path.join(self.render_dir, filename)
-            
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
-            
-            url_path = f"/static/renders/{filename}"
+            stored = self.storage.put_bytes(image_bytes, "png")
+            file_path, url_path = stored['file_path'], stored['url_path']
             
             # Save to database
             self.db.save_file(session_id, "render", file_path, url_path)
@@ -111,10 +118,23 @@ class FileManager:
             raise FileNotFoundError(f"File not found: {session_id}/{file_type}")
         return file_info["file_path"]
     
+    def get_silhouette(self, session_id: str, version: int = None) -> dict:
+        """Indexed lookup of the latest (or a specific) 2D silhouette version."""
+        if version is None:
+            row = self.db.get_latest_version(session_id, "2d")
+        else:
+            row = self.db.get_version(session_id, "2d", version)
+        if not row:
+            raise FileNotFoundError(f"No 2D silhouette found for session {session_id}" + (f" version {version}" if version is not None else ""))
+        return row
+
+    def read_bytes(self, file_path: str) -> bytes:
+        """Content of a file_path recorded by this class (a storage locator or a legacy local path)."""
+        return self.storage.read_bytes(file_path)
+
     def encode_image_to_base64(self, file_path: str) -> str:
         """Encode image to base64."""
-        with open(file_path, "rb") as f:
-            return base64.b64encode(f.read()).decode('utf-8')
+        return base64.b64encode(self.read_bytes(file_path)).decode('utf-8')
         
 
 FileManager = FileManager()
\ No newline at end of file
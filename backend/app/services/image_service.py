@@ -1,20 +1,83 @@
 import os
 import json
+import mimetypes
+import time
 import base64
+import random
+import asyncio
 import httpx
-from openai import OpenAI
+from typing import Optional
+from openai import OpenAI, AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
 from app.core.prompt import PROMPTS
 from app.core.config import settings
+from app.core.executor import executor
+from app.services.openai_stub import StubOpenAITransport
 
 client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url="https://api.openai.com/v1")
 
+# 429 rate limit, 408 timeout, 5xx upstream failures
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+PROPORTIONS_FUNCTION_SCHEMA = [{
+    'name': 'extract_keychain_proportions',
+    'description': 'Extract dimensional proportions from keychain image',
+    'parameters': {
+        'type': 'object',
+        'properties': {
+            'width': {'type': 'number', 'description': 'Width (baseline 1.0)'},
+            'length': {'type': 'number', 'description': 'Length relative to width'},
+            'thickness': {'type': 'number', 'description': 'Thickness/depth'},
+            'complexity': {
+                'type': 'string',
+                'enum': ['simple', 'moderate', 'complex'],
+                'description': 'Visual complexity'
+            }
+        },
+        'required': ['width', 'length', 'thickness', 'complexity']
+    }
+}]
+
+
+def _proportions_messages(image_b64: str, mime: str = "image/png") -> list:
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "text", "text": PROMPTS.RATIO_ANALYSIS},
+            {
+                "type": "image_url",
+                "image_url": {"url": f"data:{mime};base64,{image_b64}"}
+            }
+        ]
+    }]
+
+
+def _parse_proportions(response) -> dict:
+    if response.choices[0].message.function_call:
+        args = json.loads(response.choices[0].message.function_call.arguments)
+        return {
+            "success": True,
+            "data": args,
+            "ratio_string": f"{args['length']}:{args['width']}:{args['thickness']}"
+        }
+    return {"success": False, "error": "No function call returned"}
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
 
 class ImageService:
     """Handles OpenAI image operations."""
     def __init__(self):
         self.processed_dir = os.path.join("static", "processed")
         os.makedirs(self.processed_dir, exist_ok=True)
-        self
+
+        # Async client and semaphore are bound to the event loop that created them
+        self._async_client = None
+        self._async_semaphore = None
+        self._async_loop = None
+        self.stub_transport = None
 
     def encode_image_to_base64(self, image_path: str) -> str:
         """Encode image to base64 string."""
@@ -23,53 +86,16 @@ class ImageService:
     
     def analyze_proportions(self, image_b64: str, model: str = "gpt-4o") -> dict:
         """Analyze image proportions."""
-        function_schema = [{
-            'name': 'extract_keychain_proportions',
-            'description': 'Extract dimensional proportions from keychain image',
-            'parameters': {
-                'type': 'object',
-                'properties': {
-                    'width': {'type': 'number', 'description': 'Width (baseline 1.0)'},
-                    'length': {'type': 'number', 'description': 'Length relative to width'},
-                    'thickness': {'type': 'number', 'description': 'Thickness/depth'},
-                    'complexity': {
-                        'type': 'string',
-                        'enum': ['simple', 'moderate', 'complex'],
-                        'description': 'Visual complexity'
-                    }
-                },
-                'required': ['width', 'length', 'thickness', 'complexity']
-            }
-        }]
-
         try:
             print("Sending image for proportion analysis...")
             response = client.chat.completions.create(
                 model=model,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": PROMPTS.RATIO_ANALYSIS},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{image_b64}"}
-                        }
-                    ]
-                }],
-                functions=function_schema,
+                messages=_proportions_messages(image_b64),
+                functions=PROPORTIONS_FUNCTION_SCHEMA,
                 function_call={"name": "extract_keychain_proportions"}
             )
             print("Received response from model.")
-
-            if response.choices[0].message.function_call:
-                args = json.loads(response.choices[0].message.function_call.arguments)
-                return {
-                    "success": True,
-                    "data": args,
-                    "ratio_string": f"{args['length']}:{args['width']}:{args['thickness']}"
-                }
-            
-            return {"success": False, "error": "No function call returned"}
+            return _parse_proportions(response)
         except Exception as e:
             return {"success": False, "error": str(e)}
     
@@ -151,6 +177,170 @@ class ImageService:
         # except Exception as e:
         #     raise ValueError(f"Error editing silhouette: {str(e)}")
 
+    # ---------------------------------------------------------------------
+    # Async path: pooled AsyncOpenAI client with deadlines, retries and a
+    # global concurrency cap. Preferred from async code.
+    # ---------------------------------------------------------------------
+
+    async def _get_async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            previous, previous_loop = self._async_client, self._async_loop
+            transport = None
+            if settings.OPENAI_USE_STUB:
+                self.stub_transport = self.stub_transport or StubOpenAITransport()
+                transport = self.stub_transport
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+                    keepalive_expiry=30.0,
+                ),
+                timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+                transport=transport,
+            )
+            # Retries are handled by _call_with_retry, not by the SDK
+            self._async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY or "stub",
+                base_url=settings.OPENAI_BASE_URL,
+                http_client=http_client,
+                max_retries=0,
+            )
+            self._async_semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+            self._async_loop = loop
+            if previous is not None:
+                # Replaced (new event loop or transport): release its connection pool
+                await self._close_client(previous, previous_loop)
+        return self._async_client
+
+    @staticmethod
+    async def _close_client(client: AsyncOpenAI, loop: Optional[asyncio.AbstractEventLoop]):
+        """Close a client on the loop it was made on if that loop still runs, else on this one."""
+        try:
+            if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.close(), loop))
+            else:
+                await client.close()
+        except Exception as e:
+            print(f"Failed to close the previous OpenAI client: {e}")
+
+    def use_stub_transport(self, transport: StubOpenAITransport):
+        """Route the async client through an offline stub transport (the current client is closed on next use)."""
+        self.stub_transport = transport
+        self._async_loop = None
+        settings.OPENAI_USE_STUB = True
+
+    async def aclose(self):
+        """Close the pooled async client."""
+        if self._async_client is not None:
+            client, self._async_client = self._async_client, None
+            await self._close_client(client, self._async_loop)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when given."""
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try:
+                    return min(float(retry_after), settings.OPENAI_BACKOFF_MAX)
+                except ValueError:
+                    pass
+        ceiling = min(settings.OPENAI_BACKOFF_MAX, settings.OPENAI_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code in RETRYABLE_STATUS
+        return isinstance(error, (APIConnectionError, APITimeoutError, asyncio.TimeoutError))
+
+    async def _call_with_retry(self, make_request, deadline: float = None):
+        """
+        Run make_request(client) under the concurrency semaphore, retrying
+        transient failures until OPENAI_MAX_RETRIES or the deadline is hit.
+        The deadline covers the wait for a semaphore slot as well as the calls.
+        """
+        client_async = await self._get_async_client()
+        deadline_at = time.monotonic() + (deadline or settings.OPENAI_DEADLINE)
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("OpenAI call exceeded its deadline")
+            try:
+                # Waiting for a slot counts against the deadline too
+                await asyncio.wait_for(self._async_semaphore.acquire(), timeout=remaining)
+                try:
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("OpenAI call exceeded its deadline")
+                    return await asyncio.wait_for(make_request(client_async), timeout=remaining)
+                finally:
+                    self._async_semaphore.release()
+            except Exception as e:
+                if not self._is_retryable(e) or attempt >= settings.OPENAI_MAX_RETRIES:
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                if time.monotonic() + delay >= deadline_at:
+                    raise
+                print(f"OpenAI call failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def analyze_proportions_async(self, image_b64: str, model: str = "gpt-4o", deadline: float = None,
+                                        mime: str = "image/png") -> dict:
+        """Analyze image proportions with the async client."""
+        try:
+            response = await self._call_with_retry(
+                lambda c: c.chat.completions.create(
+                    model=model,
+                    messages=_proportions_messages(image_b64, mime),
+                    functions=PROPORTIONS_FUNCTION_SCHEMA,
+                    function_call={"name": "extract_keychain_proportions"}
+                ),
+                deadline=deadline,
+            )
+            return _parse_proportions(response)
+        except Exception as e:
+            return {"success": False, "error": str(e) or e.__class__.__name__}
+
+    async def _edit_image_async(self, image_path: str, prompt: str, model: str, deadline: float = None,
+                                image_bytes: bytes = None, mime: str = None) -> str:
+        """image_bytes, if given, are sent instead of re-reading image_path; mime defaults from its extension."""
+        if image_bytes is None:
+            image_bytes = await executor.run_io(_read_bytes, image_path)
+        mime = mime or mimetypes.guess_type(image_path)[0] or "image/png"
+        response = await self._call_with_retry(
+            lambda c: c.images.edit(
+                model=model,
+                image=(os.path.basename(image_path), image_bytes, mime),
+                prompt=prompt,
+                n=1,
+            ),
+            deadline=deadline,
+        )
+        if not response.data or not response.data[0].b64_json:
+            raise ValueError("API response did not contain base64 data")
+        return response.data[0].b64_json
+
+    async def generate_2d_silhouette_async(self, image_path: str, model="gpt-image-1", deadline: float = None,
+                                           image_bytes: bytes = None, mime: str = None) -> str:
+        """Generates a silhouette from the original image with the async client."""
+        try:
+            return await self._edit_image_async(image_path, PROMPTS.SILHOUETTE_EXTRACTION, model, deadline, image_bytes, mime)
+        except Exception as e:
+            print(f"Error generating silhouette: {e}")
+            raise e
+
+    async def edit_silhouette_async(self, image_path: str = "", model="gpt-image-1", instructions: str = "", deadline: float = None) -> str:
+        """Edits a silhouette based on red marks and instructions with the async client."""
+        try:
+            if not os.path.exists(image_path):
+                raise ValueError(f"Image path does not exist: {image_path}")
+            combined_prompt = PROMPTS.SILHOUETTE_EDIT_PROMPT.format(user_instruction=instructions)
+            return await self._edit_image_async(image_path, combined_prompt, model, deadline)
+        except Exception as e:
+            raise ValueError(f"Error editing silhouette: {str(e)}")
+
     def _download_or_save_image(self, image_data, output_path):
         """Helper to handle OpenAI image response (URL or B64)."""
         image_b64 = image_data.b64_json
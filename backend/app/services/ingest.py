@@ -0,0 +1,103 @@
+import io
+import os
+import time
+import hashlib
+from typing import Optional, Union
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+# Re-encode targets: PIL format name, MIME type, file extension
+INGEST_FORMATS = {
+    "png": {"pil": "PNG", "mime": "image/png", "extension": "png"},
+    "jpeg": {"pil": "JPEG", "mime": "image/jpeg", "extension": "jpg"},
+    "webp": {"pil": "WEBP", "mime": "image/webp", "extension": "webp"},
+}
+
+
+def _has_transparency(image: Image.Image) -> bool:
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        alpha = image.convert("RGBA").getchannel("A")
+        return alpha.getextrema()[0] < 255
+    return False
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        image.save(buffer, "PNG", optimize=False, compress_level=6)
+    else:
+        image.save(buffer, INGEST_FORMATS[fmt]["pil"], quality=quality)
+    return buffer.getvalue()
+
+
+def normalize_image(source: Union[bytes, str], max_side: Optional[int] = None, fmt: Optional[str] = None,
+                    quality: Optional[int] = None) -> dict:
+    """
+    Decode an upload (bytes or a file path) once and produce the bytes every
+    downstream call shares.
+
+    EXIF orientation is applied and the metadata dropped, the long side is
+    capped at max_side (INGEST_MAX_SIDE) and the result is re-encoded as fmt
+    (INGEST_FORMAT; "auto" keeps PNG for images with transparency and uses
+    JPEG otherwise). Returns the bytes, their MIME type and extension, a
+    digest of the normalized pixels, sizes and per-step timings (ms).
+    """
+    max_side = max_side or settings.INGEST_MAX_SIDE
+    fmt = fmt or settings.INGEST_FORMAT
+    quality = quality or settings.INGEST_JPEG_QUALITY
+
+    started = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        original_size = image.size
+        # JPEG can decode at 1/2, 1/4, 1/8 scale directly; the exact size comes from resize below
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ValueError(f"Failed to decode image: {str(e)}")
+    transparent = _has_transparency(image)
+    image = image.convert("RGBA" if transparent else "RGB")
+    decode_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    if max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    resize_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    if fmt == "auto":
+        fmt = "png" if transparent else "jpeg"
+    if fmt not in INGEST_FORMATS:
+        raise ValueError(f"Unsupported ingest format: {fmt} (expected auto or one of {', '.join(INGEST_FORMATS)})")
+    if fmt == "jpeg" and transparent:
+        fmt = "png"
+    data = _encode(image, fmt, quality)
+    encode_ms = (time.perf_counter() - started) * 1000
+
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return {
+        "bytes": data,
+        "format": fmt,
+        "mime": INGEST_FORMATS[fmt]["mime"],
+        "extension": INGEST_FORMATS[fmt]["extension"],
+        "digest": digest.hexdigest(),
+        "width": image.width,
+        "height": image.height,
+        "original_width": original_size[0],
+        "original_height": original_size[1],
+        "original_bytes": len(source) if isinstance(source, bytes) else os.path.getsize(source),
+        "normalized_bytes": len(data),
+        "timings": {"decode": round(decode_ms, 1), "resize": round(resize_ms, 1), "encode": round(encode_ms, 1)},
+    }
+
+
+def ingest_summary(image: dict) -> dict:
+    """The JSON-friendly part of normalize_image's result (everything but the bytes)."""
+    summary = {k: v for k, v in image.items() if k != "bytes"}
+    summary["saved_bytes"] = image["original_bytes"] - image["normalized_bytes"]
+    return summary
@@ -0,0 +1,128 @@
+import os
+import uuid
+import asyncio
+import traceback
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import Database
+from app.core.executor import executor
+from app.services.file_manager import FileManager
+from app.services.events import EventBus, event_bus
+
+# handler(job, report) -> JSON-serialisable result; report(stage, data) records progress
+ProgressCallback = Callable[[str, dict], Awaitable[None]]
+JobHandler = Callable[[dict, ProgressCallback], Awaitable[dict]]
+
+
+class JobQueue:
+    """
+    SQLite-backed background job queue with in-process async workers.
+
+    Jobs are rows in the jobs table, so queued work survives a restart;
+    running jobs whose worker stops heartbeating are requeued (up to
+    JOB_MAX_ATTEMPTS). Handlers are registered per job kind. Progress is
+    also published on the event bus for streaming clients.
+    """
+
+    def __init__(self, db: Database, concurrency: int, events: EventBus):
+        self.db = db
+        self.events = events
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def submit(self, kind: str, session_id: str, params: dict) -> str:
+        """Persist a job and wake a worker; returns the job id immediately."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        await executor.run_io(self.db.create_job, job_id, kind, session_id, params)
+        self.events.publish(job_id, "queued", {"job_id": job_id, "session_id": session_id, "progress": 0.0})
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await executor.run_io(self.db.get_job, job_id)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker_loop(n)) for n in range(self.concurrency)]
+        print(f"Job queue started: {self.concurrency} workers ({self.worker_id})")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker_loop(self, number: int):
+        while True:
+            try:
+                await executor.run_io(self.db.requeue_stale_jobs, settings.JOB_STALE_AFTER, settings.JOB_MAX_ATTEMPTS)
+                job = await executor.run_io(self.db.claim_next_job, self.worker_id)
+                if job is None:
+                    # Woken by submit(); the timeout also picks up jobs queued by other processes
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_HEARTBEAT)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"Job worker {number} error:\n{traceback.format_exc()}")
+                await asyncio.sleep(1)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT)
+            await executor.run_io(self.db.heartbeat_job, job_id)
+
+    async def _run_job(self, job: dict):
+        job_id = job["job_id"]
+        handler = self.handlers.get(job["kind"])
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id))
+
+        async def report(stage: str, data: dict):
+            self.events.publish(job_id, stage, {"job_id": job_id, "session_id": job["session_id"], **data})
+            fields = {"stage": stage}
+            if "progress" in data:
+                fields["progress"] = data["progress"]
+            await executor.run_io(self.db.update_job, job_id, **fields)
+
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind: {job['kind']}")
+            print(f"Running job {job_id} ({job['kind']}) for session: {job['session_id']}")
+            self.events.publish(job_id, "started", {"job_id": job_id, "session_id": job["session_id"], "attempt": job["attempts"]})
+            result = await handler(job, report)
+            if result.get("success", True):
+                await executor.run_io(self.db.update_job, job_id, status="succeeded", progress=1.0, stage="done", result=result)
+                self.events.publish(job_id, "completed", {"job_id": job_id, "progress": 1.0, "result": result})
+            else:
+                error = result.get("error") or "Job failed"
+                await executor.run_io(self.db.update_job, job_id, status="failed", stage="done", result=result, error=error)
+                self.events.publish(job_id, "failed", {"job_id": job_id, "error": error})
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so it is requeued once its heartbeat goes stale
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed:\n{traceback.format_exc()}")
+            await executor.run_io(self.db.update_job, job_id, status="failed", error=str(e))
+            self.events.publish(job_id, "failed", {"job_id": job_id, "error": str(e)})
+        finally:
+            heartbeat.cancel()
+
+
+job_queue = JobQueue(db=FileManager.db, concurrency=settings.JOB_WORKERS, events=event_bus)
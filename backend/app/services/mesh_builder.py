@@ -0,0 +1,204 @@
+import io
+import cv2
+import numpy as np
+from stl import mesh
+from typing import Optional, Tuple
+
+from app.services.adaptive_mesh import build_adaptive_relief_vectors
+
+
+def _decode_relief_image(image_bytes: bytes) -> np.ndarray:
+    """Decode a silhouette PNG to a single-channel array, inverted and rotated a quarter turn."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    im = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
+
+    if im is None:
+        raise ValueError("Failed to decode silhouette image")
+
+    im_array = np.array(im)
+    im_array = 255 - im_array
+    im_array = np.rot90(im_array, -1, (0, 1))
+
+    if len(im_array.shape) == 3:
+        # Color image - use first channel
+        im_array = im_array[:, :, 0]
+    return im_array
+
+
+def _scale_heights(im_array: np.ndarray, height: float) -> np.ndarray:
+    mesh_max = np.max(im_array)
+    if mesh_max == 0:
+        raise ValueError("Image contains no depth information (all pixels are black)")
+    return height * im_array / mesh_max
+
+
+def decode_heightmap(image_bytes: bytes, depth_div_width: float) -> np.ndarray:
+    """
+    Decode a silhouette PNG into a scaled heightmap.
+
+    Dark pixels become high, the image is rotated a quarter turn and heights
+    are scaled so that the tallest point is rows * depth_div_width.
+    """
+    im_array = _decode_relief_image(image_bytes)
+    return _scale_heights(im_array, im_array.shape[0] * depth_div_width)
+
+
+def decode_heightmap_downsampled(image_bytes: bytes, depth_div_width: float, max_side: int) -> Tuple[np.ndarray, float]:
+    """
+    decode_heightmap at reduced resolution for preview meshes.
+
+    The image is area-averaged so its longer side is at most max_side and
+    heights are still scaled by the full-resolution row count. Returns
+    (heightmap, xy_scale): grid spacing that makes the preview relief the
+    same size as the full one (1.0 when no downsampling was needed).
+    """
+    im_array = _decode_relief_image(image_bytes)
+    rows, cols = im_array.shape
+    scale = max_side / max(rows, cols)
+    if scale >= 1:
+        return _scale_heights(im_array, rows * depth_div_width), 1.0
+    small_rows, small_cols = max(2, round(rows * scale)), max(2, round(cols * scale))
+    small = cv2.resize(np.ascontiguousarray(im_array), (small_cols, small_rows), interpolation=cv2.INTER_AREA)
+    return _scale_heights(small, rows * depth_div_width), (rows - 1) / (small_rows - 1)
+
+
+def relief_triangle_count(rows: int, cols: int) -> int:
+    """Number of triangles in a dense relief of a rows x cols heightmap."""
+    return (rows - 1) * (cols - 1) * 2
+
+
+def build_relief_vectors(scaled_mesh: np.ndarray, aspect_ratio: float = 1.0, out: np.ndarray = None,
+                         row_offset: int = 0) -> np.ndarray:
+    """
+    Build the (N, 3, 3) triangle array for a heightmap relief.
+
+    Every grid cell (i, j) yields two triangles in the same order and winding
+    as the original per-pixel loop, so triangle 2 * (i * (cols - 1) + j) is
+    the first triangle of that cell. If out is given (e.g. Mesh.vectors) the
+    triangles are written into it in place. row_offset is the index of
+    scaled_mesh's first row when it is a band of a larger heightmap.
+    """
+    rows, cols = scaled_mesh.shape
+    if rows < 2 or cols < 2:
+        raise ValueError(f"Heightmap too small to mesh: {rows}x{cols}")
+
+    x = (np.arange(row_offset, row_offset + rows, dtype=np.float64) * aspect_ratio)[:, None]
+    y = np.arange(cols, dtype=np.float64)[None, :]
+    x0, x1 = x[:-1], x[1:]
+    y0, y1 = y[:, :-1], y[:, 1:]
+
+    z00 = scaled_mesh[:-1, :-1]
+    z01 = scaled_mesh[:-1, 1:]
+    z10 = scaled_mesh[1:, :-1]
+    z11 = scaled_mesh[1:, 1:]
+
+    if out is None:
+        out = np.empty((relief_triangle_count(rows, cols), 3, 3), dtype=np.float32)
+    if out.shape != (relief_triangle_count(rows, cols), 3, 3):
+        raise ValueError(f"Output array has shape {out.shape}, expected {(relief_triangle_count(rows, cols), 3, 3)}")
+    # Splitting the leading axis never copies, so writes land in out
+    vectors = out.view()
+    vectors.shape = (rows - 1, cols - 1, 2, 3, 3)
+
+    # First triangle: (i+1, j), (i, j+1), (i, j)
+    vectors[:, :, 0, 0, 0] = x1
+    vectors[:, :, 0, 0, 1] = y0
+    vectors[:, :, 0, 0, 2] = z10
+    vectors[:, :, 0, 1, 0] = x0
+    vectors[:, :, 0, 1, 1] = y1
+    vectors[:, :, 0, 1, 2] = z01
+    vectors[:, :, 0, 2, 0] = x0
+    vectors[:, :, 0, 2, 1] = y0
+    vectors[:, :, 0, 2, 2] = z00
+
+    # Second triangle: (i+1, j+1), (i, j+1), (i+1, j)
+    vectors[:, :, 1, 0, 0] = x1
+    vectors[:, :, 1, 0, 1] = y1
+    vectors[:, :, 1, 0, 2] = z11
+    vectors[:, :, 1, 1, 0] = x0
+    vectors[:, :, 1, 1, 1] = y1
+    vectors[:, :, 1, 1, 2] = z01
+    vectors[:, :, 1, 2, 0] = x1
+    vectors[:, :, 1, 2, 1] = y0
+    vectors[:, :, 1, 2, 2] = z10
+
+    return out
+
+
+def build_relief_mesh(scaled_mesh: np.ndarray, aspect_ratio: float = 1.0) -> mesh.Mesh:
+    """Build a numpy-stl Mesh for a heightmap relief."""
+    rows, cols = scaled_mesh.shape
+    mesh_shape = mesh.Mesh(np.zeros(relief_triangle_count(rows, cols), dtype=mesh.Mesh.dtype))
+    build_relief_vectors(scaled_mesh, aspect_ratio, out=mesh_shape.vectors)
+    return mesh_shape
+
+
+def mesh_to_stl_bytes(mesh_shape: mesh.Mesh) -> bytes:
+    """Serialize a numpy-stl Mesh to binary STL bytes."""
+    stl_buffer = io.BytesIO()
+    mesh_shape.save('temp', fh=stl_buffer)
+    return stl_buffer.getvalue()
+
+
+def unit_max_error(max_error: Optional[float], depth_div_width: float) -> float:
+    """max_error at depth depth_div_width expressed at depth 1; a flat (depth 0) relief meets any tolerance."""
+    if not max_error:
+        return 0.0
+    if depth_div_width == 0:
+        return float("inf")
+    return max_error / abs(depth_div_width)
+
+
+def mesh_unit_heightmap(unit_heightmap: np.ndarray, depth_div_width: float, aspect_ratio: float = 1.0,
+                        max_error: Optional[float] = None, target_triangles: Optional[int] = None,
+                        xy_scale: float = 1.0) -> np.ndarray:
+    """
+    Triangulate a depth-1 heightmap (decode_heightmap(..., 1.0)) for a relief
+    of the given depth, leaving Z at depth 1; scale_relief_depth finishes it.
+
+    Heights are linear in depth, so a max_error at depth d is max_error / d
+    here. Dense and target_triangles topologies do not depend on depth, nor
+    does max_error=0, so the result can be rescaled to any depth. xy_scale
+    is the grid spacing of a downsampled heightmap.
+    """
+    if max_error is None and target_triangles is None:
+        vectors = build_relief_vectors(unit_heightmap, aspect_ratio)
+    else:
+        vectors = build_adaptive_relief_vectors(unit_heightmap, aspect_ratio, unit_max_error(max_error, depth_div_width), target_triangles)
+    if xy_scale != 1.0:
+        vectors[..., :2] *= np.float32(xy_scale)
+    return vectors
+
+
+def topology_depends_on_depth(max_error: Optional[float], target_triangles: Optional[int]) -> bool:
+    """Whether mesh_unit_heightmap's triangles change with depth_div_width."""
+    return target_triangles is None and bool(max_error)
+
+
+def scale_relief_depth(unit_vectors: np.ndarray, depth_div_width: float) -> np.ndarray:
+    """Copy of a depth-1 relief with Z scaled to depth_div_width."""
+    vectors = unit_vectors.copy()
+    vectors[..., 2] *= np.float32(depth_div_width)
+    return vectors
+
+
+def build_relief_from_image(image_bytes: bytes, depth_div_width: float, aspect_ratio: float = 1.0,
+                            max_error: Optional[float] = None, target_triangles: Optional[int] = None) -> np.ndarray:
+    """
+    Decode a silhouette and return the (N, 3, 3) triangles of its relief.
+
+    With neither max_error nor target_triangles the dense two-triangles-per-pixel
+    relief is built; otherwise flat regions are merged by the adaptive mesher.
+    """
+    unit_heightmap = decode_heightmap(image_bytes, 1.0)
+    unit_vectors = mesh_unit_heightmap(unit_heightmap, depth_div_width, aspect_ratio, max_error, target_triangles)
+    return scale_relief_depth(unit_vectors, depth_div_width)
+
+
+def build_relief_stl(image_bytes: bytes, depth_div_width: float, aspect_ratio: float = 1.0,
+                     max_error: Optional[float] = None, target_triangles: Optional[int] = None) -> bytes:
+    """Decode a silhouette and return the binary STL of its relief."""
+    vectors = build_relief_from_image(image_bytes, depth_div_width, aspect_ratio, max_error, target_triangles)
+    mesh_shape = mesh.Mesh(np.zeros(len(vectors), dtype=mesh.Mesh.dtype))
+    mesh_shape.vectors[:] = vectors
+    return mesh_to_stl_bytes(mesh_shape)
@@ -0,0 +1,162 @@
+import json
+import os
+import struct
+import zipfile
+from typing import Tuple
+
+import numpy as np
+
+from app.services.stl_writer import atomic_output, write_binary_stl
+
+# Output formats: extension and MIME type
+MESH_FORMATS = {
+    "stl": {"extension": "stl", "media_type": "model/stl"},
+    "ply": {"extension": "ply", "media_type": "application/x-ply"},
+    "glb": {"extension": "glb", "media_type": "model/gltf-binary"},
+    "3mf": {"extension": "3mf", "media_type": "model/3mf"},
+}
+
+# Vertices/faces formatted per write when generating 3MF XML
+_XML_CHUNK = 64 * 1024
+
+
+def weld_vertices(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge bit-identical corners of an (N, 3, 3) triangle array into an
+    indexed mesh: (vertices (V, 3) float32, faces (N, 3) uint32). Vertices
+    keep the order in which they first appear.
+    """
+    corners = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, 3)
+    if len(corners) == 0:
+        return np.empty((0, 3), dtype=np.float32), np.empty((0, 3), dtype=np.uint32)
+    # -0.0 and 0.0 are the same point but not the same bytes
+    corners = corners + np.float32(0.0)
+    keys = corners.view(np.dtype((np.void, 12))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # Renumber unique vertices by first appearance so output is stable and cache friendly
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    vertices = corners[first[order]]
+    faces = rank[inverse.ravel()].astype(np.uint32).reshape(-1, 3)
+    return vertices, faces
+
+
+def write_ply(path: str, vertices: np.ndarray, faces: np.ndarray) -> None:
+    """Binary little-endian PLY with float32 positions and uint32 triangle indices."""
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        "comment prompt2CAD\n"
+        f"element vertex {len(vertices)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        f"element face {len(faces)}\n"
+        "property list uchar uint vertex_indices\n"
+        "end_header\n"
+    ).encode("ascii")
+    face_records = np.empty(len(faces), dtype=[("count", "u1"), ("indices", "<u4", (3,))])
+    face_records["count"] = 3
+    face_records["indices"] = faces
+    with atomic_output(path) as f:
+        f.write(header)
+        np.ascontiguousarray(vertices, dtype="<f4").tofile(f)
+        face_records.tofile(f)
+
+
+def _pad4(data: bytes, fill: bytes) -> bytes:
+    return data + fill * (-len(data) % 4)
+
+
+def write_glb(path: str, vertices: np.ndarray, faces: np.ndarray) -> None:
+    """
+    glTF 2.0 binary with one indexed triangle primitive. The model is Z-up,
+    so the node is rotated -90 degrees about X for glTF's Y-up convention.
+    """
+    positions = np.ascontiguousarray(vertices, dtype="<f4").tobytes()
+    indices = np.ascontiguousarray(faces, dtype="<u4").tobytes()
+    index_offset = len(positions)  # float32 data keeps this 4-byte aligned
+    binary = _pad4(positions + indices, b"\x00")
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "prompt2CAD"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "rotation": [-0.7071068, 0.0, 0.0, 0.7071068]}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions), "target": 34962},
+            {"buffer": 0, "byteOffset": index_offset, "byteLength": len(indices), "target": 34963},
+        ],
+        "accessors": [
+            {
+                "bufferView": 0, "componentType": 5126, "count": len(vertices), "type": "VEC3",
+                "min": vertices.min(axis=0).tolist() if len(vertices) else [0, 0, 0],
+                "max": vertices.max(axis=0).tolist() if len(vertices) else [0, 0, 0],
+            },
+            {"bufferView": 1, "componentType": 5125, "count": faces.size, "type": "SCALAR"},
+        ],
+    }
+    json_chunk = _pad4(json.dumps(gltf, separators=(",", ":")).encode("utf-8"), b" ")
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+
+    with atomic_output(path) as f:
+        f.write(struct.pack("<4sII", b"glTF", 2, total))
+        f.write(struct.pack("<I4s", len(json_chunk), b"JSON"))
+        f.write(json_chunk)
+        f.write(struct.pack("<I4s", len(binary), b"BIN\x00"))
+        f.write(binary)
+
+
+_3MF_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>'
+)
+_3MF_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>'
+)
+
+
+def write_3mf(path: str, vertices: np.ndarray, faces: np.ndarray, compresslevel: int = 6) -> None:
+    """3MF core-spec package (deflate-compressed zip) with a single millimetre object."""
+    with atomic_output(path) as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as package:
+        package.writestr("[Content_Types].xml", _3MF_CONTENT_TYPES)
+        package.writestr("_rels/.rels", _3MF_RELS)
+        with package.open("3D/3dmodel.model", "w", force_zip64=True) as model:
+            model.write(
+                b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                b'<model unit="millimeter" xml:lang="en-US" '
+                b'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+                b'<resources><object id="1" type="model"><mesh><vertices>'
+            )
+            for start in range(0, len(vertices), _XML_CHUNK):
+                chunk = vertices[start:start + _XML_CHUNK].tolist()
+                model.write("".join(f'<vertex x="{x:.6g}" y="{y:.6g}" z="{z:.6g}"/>' for x, y, z in chunk).encode())
+            model.write(b"</vertices><triangles>")
+            for start in range(0, len(faces), _XML_CHUNK):
+                chunk = faces[start:start + _XML_CHUNK].tolist()
+                model.write("".join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in chunk).encode())
+            model.write(b'</triangles></mesh></object></resources><build><item objectid="1"/></build></model>')
+
+
+def export_mesh(path: str, vectors: np.ndarray, fmt: str = "stl") -> int:
+    """
+    Write an (N, 3, 3) triangle array to path in one of MESH_FORMATS.
+    Indexed formats weld duplicate vertices first. Returns the file size.
+    """
+    if fmt not in MESH_FORMATS:
+        raise ValueError(f"Unsupported mesh format: {fmt} (expected one of {', '.join(MESH_FORMATS)})")
+    if fmt == "stl":
+        return write_binary_stl(path, vectors)
+
+    vertices, faces = weld_vertices(vectors)
+    writer = {"ply": write_ply, "glb": write_glb, "3mf": write_3mf}[fmt]
+    writer(path, vertices, faces)
+    return os.path.getsize(path)
@@ -1,6 +1,8 @@
 import io
 import base64
 import os
+import time
+from typing import Optional
 
 import numpy as np
 from stl import mesh
@@ -8,6 +10,23 @@ from PIL import Image
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 
+from app.core.config import settings
+from app.services.rasterizer import render_png_b64
+from app.services.mesh_builder import mesh_to_stl_bytes, relief_triangle_count, decode_heightmap, decode_heightmap_downsampled, mesh_unit_heightmap, scale_relief_depth
+from app.services.mesh_export import export_mesh
+from app.services.stl_writer import map_binary_stl
+from app.services.tiled_mesh import tiled_relief_vectors, use_tiled_mesh
+from app.services.extrusion import extrude_silhouette_mesh
+from app.services.silhouette_conditioning import condition_silhouette_mask
+
+# Quality tiers: "preview" meshes a downsampled silhouette and renders small, "final" is full resolution
+QUALITY_TIERS = ("preview", "final")
+
+
+def preview_render_size(quality: str = "final") -> int:
+    return settings.QUALITY_PREVIEW_RENDER_SIZE if quality == "preview" else settings.PREVIEW_SIZE
+
+
 class Model3DService:
     """Handles 3D model generation."""
     def generate_stl_from_2d(self, silhouette_path: str, proportions: dict) -> bytes:
@@ -24,22 +43,20 @@ class Model3DService:
             img_array=np.array(img)
             print("generating STL from silhouette at:",silhouette_path)
 
-            binary_img=(img_array>128).astype(int)
+            # Silhouettes are black shapes on white
+            if settings.SILHOUETTE_CONDITIONING:
+                foreground,_=condition_silhouette_mask(img_array, settings.SILHOUETTE_PAD, settings.SILHOUETTE_DESPECKLE, settings.SILHOUETTE_SMOOTH)
+            else:
+                foreground=img_array<128
             thickness=proportions.get('thickness',0.3)*10
             print("using thickness:",thickness)
 
-            vertices,faces=self._extrude_to_3d(binary_img,thickness)
+            vertices,faces=self._extrude_to_3d(foreground,thickness)
             print("vertices and faces generated:",vertices.shape,faces.shape)
 
             stl_mesh=mesh.Mesh(np.zeros(faces.shape[0],dtype=mesh.Mesh.dtype))
-            for i,face in enumerate(faces):
-                for j in range(3):
-                    stl_mesh.vectors[i][j]=vertices[face[j],:]
-            
-            buffer=io.BytesIO()
-            stl_mesh.save('temp',fh=buffer)
-            buffer.seek(0)
-            stl_bytes=buffer.getvalue()
+            stl_mesh.vectors[:]=vertices[faces]
+            stl_bytes=mesh_to_stl_bytes(stl_mesh)
 
             print("STL generation completed.")
             return stl_bytes
@@ -47,55 +64,10 @@ class Model3DService:
             raise ValueError(f"STL generation failed: {str(e)}")
 
     def _extrude_to_3d(self, binary_image, thickness):
-        height, width = binary_image.shape
-        
-        # 找到所有非零像素的坐标
-        y_coords, x_coords = np.where(binary_image > 0)
-        
-        if len(x_coords) == 0:
+        """Closed solid from the silhouette contours: capped front/back (holes included) plus side walls."""
+        if not np.any(binary_image):
             raise ValueError("No non-zero pixels found in image")
-        
-        # 创建顶点（前表面和后表面）
-        num_points = len(x_coords)
-        print(f"📍 Found {num_points} non-zero pixels")
-        
-        # 采样（如果点太多）
-        if num_points > 5000:
-            step = num_points // 5000
-            x_coords = x_coords[::step]
-            y_coords = y_coords[::step]
-            num_points = len(x_coords)
-            print(f"⚡ Sampled to {num_points} points")
-        
-        # 前表面 (Z = 0)
-        front = np.column_stack([
-            x_coords,
-            y_coords,
-            np.zeros(num_points)
-        ])
-        # 后表面 (Z = thickness)
-        back = np.column_stack([
-            x_coords,
-            y_coords,
-            np.full(num_points, thickness)
-        ])
-        
-        vertices = np.vstack([front, back]).astype(float)
-        
-        # 创建简单的三角形面（使用 Delaunay 三角剖分会更好，这里用简化版）
-        faces = []
-        
-        # 只创建侧面连接（简化版）
-        for i in range(num_points - 1):
-            # 侧面的两个三角形
-            faces.append([i, i+1, i + num_points])
-            faces.append([i+1, i+1 + num_points, i + num_points])
-        
-        # 闭合循环
-        faces.append([num_points-1, 0, num_points-1 + num_points])
-        faces.append([0, num_points, num_points-1 + num_points])
-        
-        return vertices, np.array(faces)
+        return extrude_silhouette_mesh(binary_image, thickness, simplify=settings.EXTRUDE_SIMPLIFY)
    
     def generate_3d_render(self, stl_path: str) -> str:
         """Generate render preview, returns base64."""
@@ -122,16 +94,49 @@ class Model3DService:
         except Exception as e:
             raise ValueError(f"Render generation failed: {str(e)}")
 
-    def render_stl_to_image(self, stl_path: str) -> str:
+    def render_stl_to_image(self, stl_path: str, quality: str = "final") -> str:
         """
         Render STL file to image preview.
         
         Args:
             stl_path: Path to the STL file
+            quality: "preview" renders at QUALITY_PREVIEW_RENDER_SIZE, "final" at PREVIEW_SIZE
             
         Returns:
             Base64 encoded PNG image
         """
+        if settings.PREVIEW_RENDERER == "matplotlib":
+            return self._render_matplotlib(stl_path)
+        try:
+            # Our own binary STLs are mapped, not parsed; anything else goes through numpy-stl
+            try:
+                vectors = map_binary_stl(stl_path)
+            except ValueError:
+                vectors = mesh.Mesh.from_file(stl_path).vectors
+        except Exception as e:
+            raise ValueError(f"Render generation failed: {str(e)}")
+        return self.render_vectors_to_image(vectors, quality)
+
+    def render_vectors_to_image(self, vectors: np.ndarray, quality: str = "final") -> str:
+        """Rasterize an in-memory (N, 3, 3) triangle array to a base64 PNG preview."""
+        size = preview_render_size(quality)
+        try:
+            render_b64 = render_png_b64(
+                vectors,
+                width=size,
+                height=size,
+                elevation=settings.PREVIEW_ELEVATION,
+                azimuth=settings.PREVIEW_AZIMUTH,
+                shading=settings.PREVIEW_SHADING,
+                supersample=settings.PREVIEW_SUPERSAMPLE,
+            )
+            print(f"✅ Rasterized {len(vectors)} triangles, base64 length: {len(render_b64)}")
+            return render_b64
+        except Exception as e:
+            raise ValueError(f"Render generation failed: {str(e)}")
+
+    def _render_matplotlib(self, stl_path: str) -> str:
+        """Legacy Poly3DCollection preview; slow and memory hungry on dense reliefs."""
         try:
             print(f"=" * 80)
             print(f"🖼️ Rendering STL: {stl_path}")
@@ -178,9 +183,97 @@ class Model3DService:
         except Exception as e:
             import traceback
             print(f"=" * 80)
-            print(f"❌ ERROR in render_stl_to_image:")
+            print(f"❌ ERROR in _render_matplotlib:")
             print(traceback.format_exc())
             print(f"=" * 80)
             raise ValueError(f"Render generation failed: {str(e)}")
         
-Model3DService = Model3DService()
\ No newline at end of file
+Model3DService = Model3DService()
+
+
+def render_stl_preview(stl_path: str, quality: str = "final") -> str:
+    """Module-level wrapper so rendering can run on the process pool."""
+    return Model3DService.render_stl_to_image(stl_path, quality)
+
+
+def _render_or_discard(model_path: str, render, *args) -> dict:
+    """render(*args) -> base64 PNG; on failure the model is removed, so no cache entry is left without metadata."""
+    started = time.perf_counter()
+    try:
+        render_b64 = render(*args)
+    except BaseException:
+        if os.path.exists(model_path):
+            os.remove(model_path)
+        raise
+    render_ms = (time.perf_counter() - started) * 1000
+    return {"render_b64": render_b64, "timings": {"render": round(render_ms, 1)}}
+
+
+def write_model(vectors: np.ndarray, model_path: str, fmt: str = "stl", quality: str = "final") -> dict:
+    """
+    Write a triangle array to model_path in fmt. A binary STL is rendered
+    afterwards by render_model straight from its records, so the model can
+    be announced first; other formats are rendered here from the array in
+    memory and come back with render_b64 and a render timing.
+    """
+    started = time.perf_counter()
+    size = export_mesh(model_path, vectors, fmt)
+    write_ms = (time.perf_counter() - started) * 1000
+    result = {"triangles": len(vectors), "size": size, "timings": {"write": round(write_ms, 1)}}
+    if fmt != "stl":
+        rendered = _render_or_discard(model_path, Model3DService.render_vectors_to_image, vectors, quality)
+        result["render_b64"] = rendered["render_b64"]
+        result["timings"].update(rendered["timings"])
+    return result
+
+
+def render_model(model_path: str, quality: str = "final") -> dict:
+    """Render the preview of an STL written by write_model (process-pool entry point)."""
+    return _render_or_discard(model_path, Model3DService.render_stl_to_image, model_path, quality)
+
+
+def build_relief_model(image_bytes: bytes, depth_div_width: float, model_path: str, aspect_ratio: float = 1.0,
+                       max_error: Optional[float] = None, target_triangles: Optional[int] = None, fmt: str = "stl",
+                       return_unit: bool = False, quality: str = "final") -> dict:
+    """
+    Mesh a silhouette and write it to model_path in fmt (see MESH_FORMATS)
+    in one process-pool call, so the full-depth triangle array is built and
+    written here and never serialized back (see write_model for the preview).
+    quality="preview" meshes the silhouette downsampled to
+    QUALITY_PREVIEW_MAX_SIDE pixels.
+    With return_unit the depth-1 heightmap and triangles are returned too,
+    for the per-session relief store, and so are pickled back to the caller
+    (unless a tiled relief is too big for the store).
+    """
+    started = time.perf_counter()
+    if quality == "preview":
+        unit_heightmap, xy_scale = decode_heightmap_downsampled(image_bytes, 1.0, settings.QUALITY_PREVIEW_MAX_SIDE)
+    else:
+        unit_heightmap, xy_scale = decode_heightmap(image_bytes, 1.0), 1.0
+    tiled = use_tiled_mesh(unit_heightmap, max_error, target_triangles)
+    if tiled and return_unit:
+        # Skip copying out depth-1 data the relief store would reject as too large
+        unit_bytes = unit_heightmap.nbytes + relief_triangle_count(*unit_heightmap.shape) * 36
+        return_unit = unit_bytes <= settings.RELIEF_STORE_MAX_BYTES
+    if tiled and not return_unit:
+        # Large dense relief: mesh bands in parallel into shared memory, at full depth directly
+        with tiled_relief_vectors(unit_heightmap, aspect_ratio, depth_div_width, xy_scale) as vectors:
+            mesh_ms = (time.perf_counter() - started) * 1000
+            result = write_model(vectors, model_path, fmt, quality)
+            del vectors
+    else:
+        if tiled:
+            with tiled_relief_vectors(unit_heightmap, aspect_ratio, 1.0, xy_scale) as shared:
+                unit_vectors = shared.copy()
+                del shared
+        else:
+            unit_vectors = mesh_unit_heightmap(unit_heightmap, depth_div_width, aspect_ratio, max_error, target_triangles, xy_scale)
+        vectors = scale_relief_depth(unit_vectors, depth_div_width)
+        mesh_ms = (time.perf_counter() - started) * 1000
+        result = write_model(vectors, model_path, fmt, quality)
+    result["timings"]["mesh"] = round(mesh_ms, 1)
+    if return_unit:
+        result["unit_heightmap"] = unit_heightmap
+        result["unit_vectors"] = unit_vectors
+        result["xy_scale"] = xy_scale
+    return result
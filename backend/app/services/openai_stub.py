@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import io
+import json
+import time
+import uuid
+from typing import Optional
+
+import httpx
+from PIL import Image, ImageDraw
+
+
+class StubOpenAITransport(httpx.AsyncBaseTransport):
+    """
+    Offline stand-in for the OpenAI endpoints ImageService uses.
+
+    Answers /chat/completions with an extract_keychain_proportions function
+    call and /images/edits with a black-disc silhouette PNG. The first
+    fail_first requests return fail_status, and every request waits latency
+    seconds, so retry and concurrency behaviour can be exercised without
+    network access.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_first: int = 0, fail_status: int = 429,
+                 retry_after: Optional[float] = None, proportions: Optional[dict] = None):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.proportions = proportions or {"width": 1.0, "length": 1.5, "thickness": 0.3, "complexity": "moderate"}
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        number = self.requests
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await request.aread()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if number <= self.fail_first:
+                headers = {"retry-after": str(self.retry_after)} if self.retry_after is not None else {}
+                return httpx.Response(
+                    self.fail_status,
+                    headers=headers,
+                    json={"error": {"message": "stub failure", "type": "stub", "code": None}},
+                    request=request,
+                )
+            path = request.url.path
+            if path.endswith("/chat/completions"):
+                return httpx.Response(200, json=self._chat_completion(), request=request)
+            if path.endswith("/images/edits") or path.endswith("/images/generations"):
+                return httpx.Response(200, json=self._image_result(), request=request)
+            return httpx.Response(404, json={"error": {"message": f"stub: no route {path}"}}, request=request)
+        finally:
+            self.in_flight -= 1
+
+    def _chat_completion(self) -> dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "stub",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "function_call",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "function_call": {
+                        "name": "extract_keychain_proportions",
+                        "arguments": json.dumps(self.proportions),
+                    },
+                },
+            }],
+        }
+
+    def _image_result(self) -> dict:
+        return {"created": int(time.time()), "data": [{"b64_json": stub_silhouette_b64()}]}
+
+
+def stub_silhouette_b64(size: int = 256) -> str:
+    """A black disc on white, shaped like the silhouettes gpt-image-1 returns."""
+    img = Image.new("L", (size, size), 255)
+    ImageDraw.Draw(img).ellipse((size // 5, size // 5, size * 4 // 5, size * 4 // 5), fill=0)
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
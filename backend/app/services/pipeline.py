@@ -0,0 +1,64 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+StageFunc = Callable[[Dict[str, object]], Awaitable[object]]
+# on_complete(stage_name, result, elapsed_ms)
+StageHook = Callable[[str, object, float], Awaitable[None]]
+
+
+class StageGraph:
+    """
+    Small async DAG runner for workflow stages.
+
+    Each stage is an async function receiving the results dict of the stages
+    it depends on. Stages whose dependencies are done run concurrently; the
+    first failure cancels the rest and is re-raised. run() returns the
+    results and per-stage wall-clock timings in milliseconds, and awaits
+    on_complete after each stage if given.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Tuple[StageFunc, Tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: StageFunc, deps: Iterable[str] = ()) -> "StageGraph":
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage '{name}'")
+        self.stages[name] = (func, deps)
+        return self
+
+    async def run(self, on_complete: Optional[StageHook] = None) -> Tuple[Dict[str, object], Dict[str, float]]:
+        results: Dict[str, object] = {}
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            func, deps = self.stages[name]
+            if deps:
+                await asyncio.gather(*(tasks[dep] for dep in deps))
+            start = time.perf_counter()
+            result = await func({dep: results[dep] for dep in deps})
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+            results[name] = result
+            if on_complete is not None:
+                await on_complete(name, result, timings[name])
+            return result
+
+        # Stages are added in dependency order, so every dep task exists already
+        for name in self.stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return results, timings
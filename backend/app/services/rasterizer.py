@@ -0,0 +1,147 @@
+import io
+import base64
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+# Candidate pixels evaluated per batch; bounds peak memory (~150 bytes each)
+_BATCH_PIXELS = 1 << 20
+
+
+def _camera_basis(elevation: float, azimuth: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Right, up and towards-camera unit vectors for an orbit camera (matplotlib's elev/azim convention)."""
+    elev, azim = np.radians(elevation), np.radians(azimuth)
+    forward = np.array([np.cos(elev) * np.cos(azim), np.cos(elev) * np.sin(azim), np.sin(elev)])
+    right = np.array([-np.sin(azim), np.cos(azim), 0.0])
+    up = np.cross(forward, right)
+    return right, up, forward
+
+
+def _face_intensity(vectors: np.ndarray, forward: np.ndarray, shading: str, ambient: float) -> np.ndarray:
+    if shading == "flat":
+        return np.ones(len(vectors), dtype=np.float32)
+    if shading != "lambert":
+        raise ValueError(f"Unknown shading mode: {shading}")
+    normals = np.cross(vectors[:, 1] - vectors[:, 0], vectors[:, 2] - vectors[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+    # Headlight slightly above the camera; two-sided so open reliefs light from below too
+    light = forward + np.array([0.0, 0.0, 0.5])
+    light /= np.linalg.norm(light)
+    diffuse = np.abs(normals @ light) / lengths
+    return (ambient + (1.0 - ambient) * diffuse).astype(np.float32)
+
+
+def render_triangles(vectors: np.ndarray, width: int = 800, height: int = 800,
+                     elevation: float = 30.0, azimuth: float = -60.0, shading: str = "lambert",
+                     color: Tuple[int, int, int] = (0, 190, 210), background: Tuple[int, int, int] = (255, 255, 255),
+                     ambient: float = 0.25, margin: float = 0.05, supersample: int = 1) -> np.ndarray:
+    """
+    Rasterize an (N, 3, 3) triangle array into an (height, width, 3) uint8 image.
+
+    Orthographic camera, z-buffered, flat (unlit) or per-face Lambert shading.
+    Triangles are grouped by screen-space bounding-box size and rasterized in
+    batches: each candidate pixel centre is tested with edge functions and
+    the nearest fragment wins through one np.maximum.at over a uint64 buffer
+    that packs quantized depth above the triangle index.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    supersample = max(1, int(supersample))
+    w, h = width * supersample, height * supersample
+    image = np.empty((h, w, 3), dtype=np.uint8)
+    image[:] = background
+    if len(vectors) == 0:
+        return image if supersample == 1 else _downsample(image, supersample)
+
+    right, up, forward = _camera_basis(elevation, azimuth)
+    points = vectors.reshape(-1, 3).astype(np.float64)
+    sx, sy, depth = points @ right, points @ up, points @ forward
+
+    # Fit the projected bounds into the viewport, keeping the aspect ratio
+    min_x, max_x, min_y, max_y = sx.min(), sx.max(), sy.min(), sy.max()
+    span = max(max_x - min_x, (max_y - min_y) * w / h, 1e-9)
+    scale = w * (1.0 - 2.0 * margin) / span
+    px = (sx - (min_x + max_x) / 2) * scale + w / 2
+    py = h / 2 - (sy - (min_y + max_y) / 2) * scale
+    d_min, d_max = depth.min(), depth.max()
+    dz = (depth - d_min) / max(d_max - d_min, 1e-12)
+
+    px, py, dz = px.reshape(-1, 3), py.reshape(-1, 3), dz.reshape(-1, 3)
+
+    area = (px[:, 1] - px[:, 0]) * (py[:, 2] - py[:, 0]) - (px[:, 2] - px[:, 0]) * (py[:, 1] - py[:, 0])
+    x0 = np.clip(np.floor(px.min(axis=1) - 0.5), 0, w - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(px.max(axis=1) - 0.5), 0, w - 1).astype(np.int64)
+    y0 = np.clip(np.floor(py.min(axis=1) - 0.5), 0, h - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(py.max(axis=1) - 0.5), 0, h - 1).astype(np.int64)
+    on_screen = (np.abs(area) > 1e-12) & (px.max(axis=1) >= 0) & (px.min(axis=1) <= w) \
+        & (py.max(axis=1) >= 0) & (py.min(axis=1) <= h)
+
+    # Bucket triangles by bounding box size (powers of two)
+    extent = np.maximum(x1 - x0, y1 - y0) + 1
+    bucket = np.ceil(np.log2(np.maximum(extent, 1))).astype(np.int64)
+
+    # Barycentric weights and depth are affine in screen space: precompute
+    # w_k(x, y) = a_k * x + b_k * y + c_k per triangle (normalised by area)
+    inv = np.zeros_like(area)
+    inv[on_screen] = 1.0 / area[on_screen]
+    coeffs = []
+    for i, j in ((1, 2), (2, 0)):
+        coeffs.append((
+            (py[:, i] - py[:, j]) * inv,
+            (px[:, j] - px[:, i]) * inv,
+            (px[:, i] * py[:, j] - px[:, j] * py[:, i]) * inv,
+        ))
+    (a0, b0, c0), (a1, b1, c1) = coeffs
+    az = a0 * (dz[:, 0] - dz[:, 2]) + a1 * (dz[:, 1] - dz[:, 2])
+    bz = b0 * (dz[:, 0] - dz[:, 2]) + b1 * (dz[:, 1] - dz[:, 2])
+    cz = c0 * (dz[:, 0] - dz[:, 2]) + c1 * (dz[:, 1] - dz[:, 2]) + dz[:, 2]
+
+    zbuffer = np.zeros(h * w, dtype=np.uint64)
+    depth_scale = float(2 ** 31 - 1)
+    for level in np.unique(bucket[on_screen]):
+        size = 1 << int(level)
+        tris = np.nonzero(on_screen & (bucket == level))[0]
+        oy, ox = np.divmod(np.arange(size * size, dtype=np.int64), size)
+        per_batch = max(1, _BATCH_PIXELS // (size * size))
+        for start in range(0, len(tris), per_batch):
+            t = tris[start:start + per_batch]
+            cx = x0[t, None] + ox[None, :]
+            cy = y0[t, None] + oy[None, :]
+            fx, fy = cx + 0.5, cy + 0.5
+
+            w0 = a0[t, None] * fx + b0[t, None] * fy + c0[t, None]
+            w1 = a1[t, None] * fx + b1[t, None] * fy + c1[t, None]
+            inside = (w0 >= -1e-9) & (w1 >= -1e-9) & (w0 + w1 <= 1.0 + 1e-9)
+            if size > 1:
+                inside &= (cx <= x1[t, None]) & (cy <= y1[t, None])
+            rows, cols = np.nonzero(inside)
+            if len(rows) == 0:
+                continue
+
+            tr = t[rows]
+            frag_depth = az[tr] * fx[rows, cols] + bz[tr] * fy[rows, cols] + cz[tr]
+            key = (np.clip(frag_depth, 0.0, 1.0) * depth_scale).astype(np.uint64) << np.uint64(32)
+            key |= (tr + 1).astype(np.uint64)
+            np.maximum.at(zbuffer, cy[rows, cols] * w + cx[rows, cols], key)
+
+    covered = zbuffer != 0
+    winners = (zbuffer[covered] & np.uint64(0xFFFFFFFF)).astype(np.int64) - 1
+    intensity = _face_intensity(vectors[winners], forward, shading, ambient)
+    shaded = np.clip(np.asarray(color, dtype=np.float32)[None, :] * intensity[:, None], 0, 255).astype(np.uint8)
+    image.reshape(-1, 3)[covered] = shaded
+
+    return image if supersample == 1 else _downsample(image, supersample)
+
+
+def _downsample(image: np.ndarray, factor: int) -> np.ndarray:
+    h, w, c = image.shape
+    return image.reshape(h // factor, factor, w // factor, factor, c).mean(axis=(1, 3)).astype(np.uint8)
+
+
+def render_png_b64(vectors: np.ndarray, **kwargs) -> str:
+    """Rasterize triangles and return a base64 PNG."""
+    image = render_triangles(vectors, **kwargs)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG", optimize=False, compress_level=3)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
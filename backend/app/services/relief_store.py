@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class ReliefStore:
+    """
+    Per-session, in-memory store of the last decoded relief.
+
+    Each session keeps its depth-1 heightmap and depth-1 triangle array plus
+    the silhouette hash and mesh parameters they were built from, so a
+    depth-only change is a Z rescale instead of decode + triangulate.
+    Entries are evicted least recently used once max_bytes is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(entry: dict) -> int:
+        return entry["unit_heightmap"].nbytes + entry["unit_vectors"].nbytes
+
+    def put(self, session_id: str, silhouette_sha256: str, unit_heightmap: np.ndarray, unit_vectors: np.ndarray,
+            mesh_params: dict, topology_depth: float, xy_scale: float = 1.0) -> None:
+        """
+        Store a relief; topology_depth is the depth its triangles were chosen
+        for and xy_scale the grid spacing of a downsampled heightmap.
+        """
+        entry = {
+            "silhouette_sha256": silhouette_sha256,
+            "unit_heightmap": unit_heightmap,
+            "unit_vectors": unit_vectors,
+            "mesh_params": dict(mesh_params),
+            "topology_depth": topology_depth,
+            "xy_scale": xy_scale,
+        }
+        size = self._size(entry)
+        with self._lock:
+            self._pop(session_id)
+            if size > self.max_bytes:
+                return
+            self._entries[session_id] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def get(self, session_id: str, silhouette_sha256: str) -> Optional[dict]:
+        """The session's entry if it was built from this exact silhouette, else None."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry["silhouette_sha256"] != silhouette_sha256:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._pop(session_id)
+
+    def _pop(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= self._size(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+relief_store = ReliefStore(max_bytes=settings.RELIEF_STORE_MAX_BYTES)
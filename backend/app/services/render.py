@@ -1,60 +1,91 @@
 import subprocess
 import os
+import base64
+import hashlib
 import shutil
+import tempfile
+import threading
+import time
 from app.core.config import settings
-from app.services.file_manager import FileManager
+from app.services.cache_service import model_cache
+from app.services.model_3d_service import render_stl_preview
 
 
 class RenderService:
+    """
+    OpenSCAD rendering: one openscad run evaluates the CSG and exports the
+    STL, and the preview is rasterized from that STL in-process, so there is
+    no second parse/evaluation and no X server. Results are cached by the
+    hash of the SCAD source (files it include<>s are not part of the key).
+    """
 
-    def render(self,scad_path: str, session_id:str):
-        
-        paths=FileManager.get_generated_file_paths(session_id)
+    def __init__(self, cache=model_cache):
+        self.cache = cache
+        # Bounds concurrent openscad processes; render() is called from worker threads
+        self._slots = threading.BoundedSemaphore(max(1, settings.OPENSCAD_CONCURRENCY))
 
-        abs_scad=os.path.abspath(scad_path)
-        abs_png=paths['png_absolute']
-        abs_stl=paths['stl_absolute']
+    def cache_key(self, scad_source: bytes) -> str:
+        scad_sha256 = hashlib.sha256(scad_source).hexdigest()
+        return self.cache.make_key(scad_sha256, "stl", source="openscad", openscad=settings.OPENSCAD_BIN)
 
-        print(f"Starting OpenSCAD rendering")
+    def _export_stl(self, abs_scad: str, stl_path: str):
+        """Run openscad once to evaluate the model and export it as STL."""
+        cmd_stl = [settings.OPENSCAD_BIN, "-o", stl_path, abs_scad]
+        with self._slots:
+            try:
+                result_stl = subprocess.run(cmd_stl, capture_output=True, text=True, timeout=settings.OPENSCAD_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                raise Exception(f"OpenSCAD timed out after {settings.OPENSCAD_TIMEOUT:g}s")
+        if result_stl.returncode != 0:
+            print(f"OpenSCAD STL rendering error: {result_stl.stderr}")
+            raise Exception("Rendering STL failed")
+        if not os.path.exists(stl_path):
+            raise Exception("Rendered STL file not found")
+
+    def render(self, scad_path: str, session_id: str):
+        abs_scad = os.path.abspath(scad_path)
+        print(f"Starting OpenSCAD rendering for session: {session_id}")
         try:
-            cmd_png = [
-                "xvfb-run",
-                "-a",
-                "openscad", 
-                "-o", abs_png,
-                abs_scad,
-                "--imgsize=800,600"
-            ]
-            result_png=subprocess.run(cmd_png, capture_output=True, text=True)
-            if result_png.returncode !=0:
-                print(f"OpenSCAD PNG rendering error: {result_png.stderr}")
-                raise Exception("Rendering PNG failed")
-            
-            cmd_stl=[
-                "openscad",
-                "-o", abs_stl,
-                abs_scad
-            ]
-            result_stl=subprocess.run(cmd_stl, capture_output=True, text=True)
-            if result_stl.returncode !=0:
-                print(f"OpenSCAD STL rendering error: {result_stl.stderr}")
-                raise Exception("Rendering STL failed")
-            
-            if not os.path.exists(abs_png):
-                print("Rendered PNG file not found")
-            
-            if not os.path.exists(abs_stl):
-                print("Rendered STL file not found")
-            
-            return{
-                "preview_url": paths['png_url'],
-                "stl_url": paths['stl_url']
+            with open(abs_scad, "rb") as f:
+                key = self.cache_key(f.read())
+            model_name = self.cache.model_name("stl")
+
+            meta = self.cache.get(key, "stl")
+            cached = meta is not None
+            if cached:
+                print(f"OpenSCAD render cache hit: {key[:12]}")
+            else:
+                started = time.perf_counter()
+                with tempfile.TemporaryDirectory(prefix="openscad_") as tmp:
+                    tmp_stl = os.path.join(tmp, model_name)
+                    self._export_stl(abs_scad, tmp_stl)
+                    openscad_ms = (time.perf_counter() - started) * 1000
+
+                    started = time.perf_counter()
+                    preview_png = base64.b64decode(render_stl_preview(tmp_stl))
+                    render_ms = (time.perf_counter() - started) * 1000
+
+                    self.cache.prepare(key)
+                    shutil.move(tmp_stl, self.cache.file_info(key, model_name)['file_path'])
+                meta = {
+                    "size": os.path.getsize(self.cache.file_info(key, model_name)['file_path']),
+                    "timings": {"openscad": round(openscad_ms, 1), "render": round(render_ms, 1)},
+                }
+                self.cache.put(key, preview_png, meta)
+
+            return {
+                "preview_url": self.cache.file_info(key, self.cache.PREVIEW)['url_path'],
+                "stl_url": self.cache.file_info(key, model_name)['url_path'],
+                "cached": cached,
+                "timings": meta['timings'],
             }
         except Exception as e:
             print(f"Exception during rendering: {e}")
             return {
                 "preview_url": "",
-                "stl_url": ""
+                "stl_url": "",
+                "error": str(e),
             }
-            
-render_service= RenderService()
\ No newline at end of file
+
+
+render_service = RenderService()
@@ -0,0 +1,70 @@
+import time
+from typing import Tuple
+
+import cv2
+import numpy as np
+
+# Bump when the conditioning steps change so cached results are rebuilt
+CONDITIONING_VERSION = "condition-1"
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    """Single-channel uint8 version of a decoded silhouette, with transparency composited over white."""
+    if image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    if image.ndim == 2:
+        return image
+    gray = cv2.cvtColor(image[:, :, :3], cv2.COLOR_BGR2GRAY)
+    if image.shape[2] == 4:
+        alpha = image[:, :, 3].astype(np.float32) / 255.0
+        gray = (gray * alpha + 255.0 * (1.0 - alpha)).round().astype(np.uint8)
+    return gray
+
+
+def condition_silhouette_mask(gray: np.ndarray, pad: int = 8, despeckle: int = 3,
+                              smooth: float = 0.0) -> Tuple[np.ndarray, dict]:
+    """
+    Clean a dark-on-light silhouette: Otsu binarization, morphological
+    open/close with a despeckle x despeckle ellipse (0 = off), optional
+    Gaussian contour smoothing of sigma smooth pixels, then a crop to the
+    foreground bounding box plus pad pixels of background on every side.
+
+    Returns (foreground mask (bool, cropped), info) where info holds the
+    Otsu threshold, the bbox (x, y, w, h) in the input and both sizes.
+    """
+    threshold, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if despeckle > 1:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (despeckle, despeckle))
+        binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+    if smooth > 0:
+        binary = cv2.GaussianBlur(binary, (0, 0), smooth)
+        binary = np.where(binary >= 128, 255, 0).astype(np.uint8)
+
+    points = cv2.findNonZero(binary)
+    if points is None:
+        raise ValueError("Silhouette has no foreground after conditioning")
+    x, y, w, h = cv2.boundingRect(points)
+    mask = np.zeros((h + 2 * pad, w + 2 * pad), dtype=bool)
+    mask[pad:pad + h, pad:pad + w] = binary[y:y + h, x:x + w] > 0
+    info = {
+        "threshold": float(threshold),
+        "bbox": [int(x), int(y), int(w), int(h)],
+        "original_size": [int(gray.shape[1]), int(gray.shape[0])],
+        "size": [int(mask.shape[1]), int(mask.shape[0])],
+    }
+    return mask, info
+
+
+def condition_silhouette_png(image_bytes: bytes, pad: int, despeckle: int, smooth: float) -> Tuple[bytes, dict]:
+    """condition_silhouette_mask on PNG bytes; the result is a black-on-white single-channel PNG."""
+    started = time.perf_counter()
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError("Failed to decode silhouette image")
+    mask, info = condition_silhouette_mask(_to_gray(image), pad, despeckle, smooth)
+    ok, png = cv2.imencode(".png", np.where(mask, 0, 255).astype(np.uint8))
+    if not ok:
+        raise ValueError("Failed to encode conditioned silhouette")
+    info["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return png.tobytes(), info
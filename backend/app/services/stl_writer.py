@@ -0,0 +1,77 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from stl import mesh
+
+# Triangles serialized per write; one chunk is ~3 MB of records
+CHUNK_TRIANGLES = 64 * 1024
+
+STL_RECORD_BYTES = 50
+
+
+@contextmanager
+def atomic_output(path: str):
+    """Open a temp file beside path for binary writing; rename it over path only on success."""
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stl_header(name: str = "prompt2CAD") -> bytes:
+    """80-byte binary STL header."""
+    return name.encode("ascii", "replace")[:80].ljust(80, b" ")
+
+
+def binary_stl_size(triangles: int) -> int:
+    return 84 + STL_RECORD_BYTES * triangles
+
+
+def write_binary_stl(path: str, vectors: np.ndarray, name: str = "prompt2CAD",
+                     chunk_triangles: int = CHUNK_TRIANGLES) -> int:
+    """
+    Stream an (N, 3, 3) triangle array to a binary STL file.
+
+    Records are packed chunk by chunk straight from the array (normals as
+    numpy-stl computes them: (v1 - v0) x (v2 - v0), unnormalized) into a
+    temporary file next to path, which is renamed over path once complete,
+    so readers never see a partial STL. Returns the file size in bytes.
+    """
+    vectors = np.asarray(vectors)
+    if vectors.ndim != 3 or vectors.shape[1:] != (3, 3):
+        raise ValueError(f"Expected an (N, 3, 3) triangle array, got {vectors.shape}")
+
+    records = np.zeros(min(len(vectors), chunk_triangles), dtype=mesh.Mesh.dtype)
+    with atomic_output(path) as f:
+        f.write(stl_header(name))
+        f.write(np.uint32(len(vectors)).tobytes())
+        for start in range(0, len(vectors), chunk_triangles):
+            chunk = vectors[start:start + chunk_triangles]
+            out = records[:len(chunk)]
+            out["vectors"] = chunk
+            v = out["vectors"]
+            out["normals"] = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+            out.tofile(f)
+    return binary_stl_size(len(vectors))
+
+
+def map_binary_stl(path: str) -> np.ndarray:
+    """
+    (N, 3, 3) triangles of a binary STL written by write_binary_stl, as a
+    read-only memory map of its records (no parsing or copying up front).
+    """
+    with open(path, "rb") as f:
+        f.seek(80)
+        count = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+    if os.path.getsize(path) != binary_stl_size(count):
+        raise ValueError(f"Not a binary STL with {count} triangles: {path}")
+    if count == 0:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    return np.memmap(path, dtype=mesh.Mesh.dtype, mode="r", offset=84, shape=(count,))["vectors"]
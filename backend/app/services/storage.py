@@ -0,0 +1,225 @@
+import io
+import os
+import re
+import hashlib
+import mimetypes
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from app.core.config import settings
+from app.core.hashing import file_sha256
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # optional: only STORAGE_BACKEND=s3 needs it
+    boto3 = None
+
+# Objects are immutable once stored, so their URLs can be cached forever
+OBJECT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+OBJECT_KEY = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def object_key(sha256: str, extension: str) -> str:
+    """Sharded content address: ab/cd/abcd<...sha256>.<extension>"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension.lstrip('.').lower()}"
+
+
+class StorageBackend(ABC):
+    """
+    Content-addressed artifact storage.
+
+    Objects are named by the sha256 of their bytes, so the same content is
+    stored once however many sessions save it, and a stored object never
+    changes. put_* return the object key, its locator (recorded in the
+    database as file_path and accepted by read_bytes) and its url_path.
+    The methods block; callers run them on the IO pool.
+    """
+
+    # True when locators are plain paths on this machine's disk
+    is_local = False
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def locator(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    def download_url(self, key: str) -> str:
+        """URL a client can fetch the object from right now."""
+        return self.url(key)
+
+    @abstractmethod
+    def _write_bytes(self, key: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def _write_file(self, key: str, file_path: str):
+        ...
+
+    @abstractmethod
+    def read_bytes(self, locator: str) -> bytes:
+        ...
+
+    def _stored(self, key: str, sha256: str, size: int, deduplicated: bool) -> dict:
+        return {"key": key, "file_path": self.locator(key), "url_path": self.url(key),
+                "sha256": sha256, "size": size, "deduplicated": deduplicated}
+
+    def put_bytes(self, data: bytes, extension: str) -> dict:
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = object_key(sha256, extension)
+        deduplicated = self.exists(key)
+        if not deduplicated:
+            self._write_bytes(key, data)
+        return self._stored(key, sha256, len(data), deduplicated)
+
+    def put_file(self, file_path: str, extension: Optional[str] = None, sha256: Optional[str] = None) -> dict:
+        """Store a file already on disk (extension defaults to its own); sha256 skips re-hashing it."""
+        sha256 = sha256 or file_sha256(file_path)
+        key = object_key(sha256, extension or os.path.splitext(file_path)[1])
+        deduplicated = self.exists(key)
+        if not deduplicated:
+            self._write_file(key, file_path)
+        return self._stored(key, sha256, os.path.getsize(file_path), deduplicated)
+
+
+class LocalStorage(StorageBackend):
+    """Objects under root/ab/cd/<sha256>.<ext>, served from url_prefix by /static."""
+
+    is_local = True
+
+    def __init__(self, root: str, url_prefix: str):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        os.makedirs(root, exist_ok=True)
+
+    def locator(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.locator(key))
+
+    def _staging_path(self, key: str) -> str:
+        path = self.locator(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{threading.get_ident()}.tmp"
+
+    def _write_bytes(self, key: str, data: bytes):
+        tmp_path = self._staging_path(key)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.locator(key))
+
+    def _write_file(self, key: str, file_path: str):
+        tmp_path = self._staging_path(key)
+        shutil.copyfile(file_path, tmp_path)
+        os.replace(tmp_path, self.locator(key))
+
+    def read_bytes(self, locator: str) -> bytes:
+        with open(locator, "rb") as f:
+            return f.read()
+
+
+class S3Storage(StorageBackend):
+    """
+    Objects in an S3-compatible bucket (AWS, MinIO, moto) under
+    <prefix>ab/cd/<sha256>.<ext>. Credentials come from the usual AWS
+    environment variables / config files. Files above the multipart
+    threshold are uploaded in parallel parts. url() is a stable API path
+    that redirects to a fresh presigned GET URL (download_url).
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, presign_ttl: int = 3600, multipart_threshold: int = 8 * 1024 * 1024,
+                 multipart_chunk: int = 8 * 1024 * 1024, max_concurrency: int = 4, url_prefix: str = "/api/objects"):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.presign_ttl = presign_ttl
+        self.url_prefix = url_prefix.rstrip("/")
+        # MinIO and most stand-ins only understand path-style addressing
+        config = Config(signature_version="s3v4", retries={"max_attempts": 5, "mode": "standard"},
+                        s3={"addressing_style": "path"} if endpoint_url else None,
+                        max_pool_connections=max(10, max_concurrency * 2))
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None, config=config)
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunk,
+                                       max_concurrency=max_concurrency)
+
+    def object_name(self, key: str) -> str:
+        return self.prefix + key
+
+    def locator(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.object_name(key)}"
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+    def download_url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": self.object_name(key)}, ExpiresIn=self.presign_ttl)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_name(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _extra_args(self, key: str) -> dict:
+        return {"ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream",
+                "CacheControl": OBJECT_CACHE_CONTROL}
+
+    def _write_bytes(self, key: str, data: bytes):
+        self.client.upload_fileobj(io.BytesIO(data), self.bucket, self.object_name(key),
+                                   ExtraArgs=self._extra_args(key), Config=self.transfer)
+
+    def _write_file(self, key: str, file_path: str):
+        self.client.upload_file(file_path, self.bucket, self.object_name(key),
+                                ExtraArgs=self._extra_args(key), Config=self.transfer)
+
+    def read_bytes(self, locator: str) -> bytes:
+        if not locator.startswith("s3://"):
+            # Rows written before the bucket was in use still point at local files
+            with open(locator, "rb") as f:
+                return f.read()
+        bucket, _, name = locator[len("s3://"):].partition("/")
+        return self.client.get_object(Bucket=bucket, Key=name)["Body"].read()
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            presign_ttl=settings.S3_PRESIGN_TTL,
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD,
+            multipart_chunk=settings.S3_MULTIPART_CHUNK,
+            max_concurrency=settings.S3_MAX_CONCURRENCY,
+        )
+    if settings.STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND} (expected local or s3)")
+    return LocalStorage(settings.STORAGE_LOCAL_DIR, settings.STORAGE_LOCAL_URL)
+
+
+storage = create_storage()
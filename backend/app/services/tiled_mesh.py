@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.mesh_builder import build_relief_vectors, relief_triangle_count
+
+# Bands per worker, so a slow band does not leave the other workers idle at the end
+_BANDS_PER_WORKER = 2
+
+_pool_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def tile_workers() -> int:
+    """
+    Band processes per meshing process. Every CPU-pool worker may start its
+    own band pool, so by default the cores are split between them
+    (cores // CPU_POOL_SIZE) instead of each taking all of them.
+    """
+    if settings.MESH_TILE_WORKERS:
+        return settings.MESH_TILE_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, settings.CPU_POOL_SIZE))
+
+
+def band_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for mesh bands, created on first use in whichever process
+    meshes (usually a CPU-pool worker) and reused for later reliefs.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the caller may be running threads
+            _pool = ProcessPoolExecutor(max_workers=tile_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def use_tiled_mesh(heightmap: np.ndarray, max_error: Optional[float], target_triangles: Optional[int]) -> bool:
+    """
+    Whether a relief should be meshed in parallel bands: dense (no max_error,
+    so not with MESH_ADAPTIVE, whose lossless max_error=0 merges flat cells
+    across band edges), large enough, and more than one worker.
+    """
+    return (max_error is None and target_triangles is None and tile_workers() > 1
+            and heightmap.size >= settings.MESH_TILE_MIN_PIXELS)
+
+
+def relief_bands(rows: int, bands: int):
+    """Split rows - 1 cell rows into (start, stop) bands; band k meshes heightmap rows start..stop."""
+    bands = max(1, min(bands, rows - 1))
+    edges = np.linspace(0, rows - 1, bands + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def _mesh_band(heightmap_name: str, shape, vectors_name: str, start: int, stop: int,
+               aspect_ratio: float, z_scale: float, xy_scale: float) -> int:
+    """Pool entry point: mesh cell rows [start, stop) straight into the shared triangle buffer."""
+    heightmap_shm = SharedMemory(name=heightmap_name)
+    vectors_shm = SharedMemory(name=vectors_name)
+    try:
+        rows, cols = shape
+        heightmap = np.ndarray(shape, dtype=np.float64, buffer=heightmap_shm.buf)
+        vectors = np.ndarray((relief_triangle_count(rows, cols), 3, 3), dtype=np.float32, buffer=vectors_shm.buf)
+        per_row = 2 * (cols - 1)
+        # Heightmap rows start..stop inclusive: the one-row overlap is the band's bottom edge
+        band = build_relief_vectors(heightmap[start:stop + 1], aspect_ratio,
+                                    out=vectors[start * per_row:stop * per_row], row_offset=start)
+        if xy_scale != 1.0:
+            band[..., :2] *= np.float32(xy_scale)
+        if z_scale != 1.0:
+            band[..., 2] *= np.float32(z_scale)
+        return len(band)
+    finally:
+        # Views must go before the blocks can be closed
+        heightmap = vectors = band = None
+        heightmap_shm.close()
+        vectors_shm.close()
+
+
+@contextmanager
+def tiled_relief_vectors(scaled_mesh: np.ndarray, aspect_ratio: float = 1.0, z_scale: float = 1.0,
+                         xy_scale: float = 1.0, workers: Optional[int] = None, pool: Optional[Executor] = None):
+    """
+    Mesh a dense relief in parallel row bands and yield its (N, 3, 3) triangles.
+
+    The heightmap and the triangle buffer live in shared memory; each band
+    is meshed by a pool worker directly into its slice of the buffer, so
+    nothing is pickled or copied back. The result is byte-identical to
+    build_relief_vectors followed by the xy_scale / z_scale multiplies of
+    mesh_unit_heightmap and scale_relief_depth. The yielded array is only
+    valid inside the with block; copy it to keep it.
+    """
+    rows, cols = scaled_mesh.shape
+    if rows < 2 or cols < 2:
+        raise ValueError(f"Heightmap too small to mesh: {rows}x{cols}")
+    workers = workers or tile_workers()
+    pool = pool or band_pool()
+
+    count = relief_triangle_count(rows, cols)
+    heightmap_shm = SharedMemory(create=True, size=scaled_mesh.size * 8)
+    vectors_shm = SharedMemory(create=True, size=count * 36)
+    try:
+        heightmap = np.ndarray(scaled_mesh.shape, dtype=np.float64, buffer=heightmap_shm.buf)
+        heightmap[:] = scaled_mesh
+        futures = [
+            pool.submit(_mesh_band, heightmap_shm.name, scaled_mesh.shape, vectors_shm.name,
+                        start, stop, aspect_ratio, z_scale, xy_scale)
+            for start, stop in relief_bands(rows, workers * _BANDS_PER_WORKER)
+        ]
+        written = sum(future.result() for future in futures)
+        if written != count:
+            raise RuntimeError(f"Tiled mesh wrote {written} of {count} triangles")
+        vectors = np.ndarray((count, 3, 3), dtype=np.float32, buffer=vectors_shm.buf)
+        yield vectors
+    finally:
+        heightmap = vectors = None
+        _release(heightmap_shm)
+        _release(vectors_shm)
+
+
+def _release(shm: SharedMemory):
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        # A caller still holds a view (e.g. unwinding from an error); the mapping goes with it
+        pass
@@ -0,0 +1,82 @@
+import os
+import uuid
+from typing import Optional
+
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.core.executor import executor
+
+# Leading bytes of the accepted image types: (mime, extension)
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+]
+
+# Enough of the file to recognise every signature above (WEBP needs 12)
+SNIFF_BYTES = 16
+
+
+class UploadError(ValueError):
+    """An upload was rejected; status_code is the HTTP status to answer with (413, 415)."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_image_type(header: bytes) -> Optional[dict]:
+    """MIME type and extension from an image's first bytes, or None if it is not PNG/JPEG/WEBP."""
+    for signature, mime, extension in _SIGNATURES:
+        if header.startswith(signature):
+            return {"mime": mime, "extension": extension}
+    if len(header) >= 12 and header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return {"mime": "image/webp", "extension": "webp"}
+    return None
+
+
+def _too_large(max_bytes: int) -> UploadError:
+    return UploadError(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit.", 413)
+
+
+async def spool_upload(upload: UploadFile, directory: str, stem: str, max_bytes: Optional[int] = None,
+                       chunk_bytes: Optional[int] = None) -> dict:
+    """
+    Stream an upload to directory/stem.<ext> in chunks without holding it in memory.
+
+    The whole request body is already capped by main.LimitRequestSize while
+    it streams in; here the file itself is held to max_bytes as it is
+    copied, and the first bytes are sniffed so anything that is not a PNG,
+    JPEG or WEBP is rejected before it is decoded or fully read. Writes run
+    on the IO pool. The file only appears under its final name once complete.
+    Returns file_path, size, mime and extension; raises UploadError.
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    chunk_bytes = chunk_bytes or settings.UPLOAD_CHUNK_BYTES
+
+    header = await upload.read(SNIFF_BYTES)
+    kind = sniff_image_type(header)
+    if kind is None:
+        raise UploadError("Unsupported image: only png, jpg, jpeg and webp files are accepted.", 415)
+
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f"{stem}.{kind['extension']}")
+    part_path = f"{file_path}.{uuid.uuid4().hex[:8]}.part"
+    f = await executor.run_io(open, part_path, "wb")
+    try:
+        size = len(header)
+        chunk = header
+        while chunk:
+            await executor.run_io(f.write, chunk)
+            chunk = await upload.read(chunk_bytes)
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+        await executor.run_io(f.close)
+        await executor.run_io(os.replace, part_path, file_path)
+    except BaseException:
+        await executor.run_io(f.close)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return {"file_path": file_path, "size": size, **kind}
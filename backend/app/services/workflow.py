@@ -1,89 +1,138 @@
-import io
 import uuid
+import base64
+import hashlib
 import time
-import threading
+from typing import Optional
+from urllib.parse import urlencode
 from fastapi import UploadFile
-import glob
-import cv2
-import numpy as np
+from fastapi.encoders import jsonable_encoder
 import os
-from stl import mesh
 from app.models.schema import AppResponse, Aritifacts, Edit2DResponse, Generate3DResponse
 
 from app.services.file_manager import FileManager
 from app.services.render import render_service
 from app.services.image_service import ImageService
-from app.services.model_3d_service import Model3DService
+from app.services.cache_service import image_cache, model_cache, silhouette_conditioner
+from app.services.pipeline import StageGraph
+from app.services.job_queue import job_queue
+from app.services.model_3d_service import Model3DService, QUALITY_TIERS, build_relief_model, render_model, write_model
+from app.services.mesh_builder import mesh_unit_heightmap, scale_relief_depth, topology_depends_on_depth
+from app.services.relief_store import relief_store
+from app.services.ingest import normalize_image, ingest_summary
+from app.services.uploads import spool_upload
+from app.services.mesh_export import MESH_FORMATS
+from app.services.artifacts import artifact_index
 
 from app.core.config import settings
+from app.core.executor import executor
+from app.core.locks import KeyedAsyncLock
 
 class WorkflowService:
 
     def __init__(self):
-        self.processing_locks = {}
-        self.lock_manager=threading.Lock()
+        self.session_locks = KeyedAsyncLock()
 
         self.file_manager = FileManager
         self.image_service = ImageService
+        self.image_cache = image_cache
         self.model_3d_service = Model3DService
     
-    def _acquire_lock(self, session_id: str):
-        with self.lock_manager:
-            if session_id not in self.processing_locks:
-                self.processing_locks[session_id] = threading.Lock()
-        self.processing_locks[session_id].acquire()
+    async def _acquire_lock(self, session_id: str):
+        waited = await self.session_locks.acquire(session_id, reject_if_busy=settings.REJECT_BUSY_SESSIONS)
+        if waited > 0.01:
+            print(f"Waited {waited:.2f}s for session lock: {session_id}")
     
     def _release_lock(self, session_id: str):
-        if session_id in self.processing_locks:
-            self.processing_locks[session_id].release()
+        self.session_locks.release(session_id)
     
     
-    async def generate_2d_from_upload(self, image_file: UploadFile,session_id_in: str=None) -> AppResponse:
+    async def _emit(self, progress, stage: str, fraction: float, **data):
+        """Report a pipeline stage to an optional progress callback (job queue, event stream)."""
+        if progress is None:
+            return
+        try:
+            await progress(stage, {"progress": fraction, **data})
+        except Exception as e:
+            print(f"Progress callback failed at {stage}: {e}")
+
+    async def generate_2d_from_upload(self, image_file: UploadFile,session_id_in: str=None, progress=None) -> AppResponse:
+        """Spool the upload to disk (size-limited, type-sniffed; raises UploadError) and run the pipeline on the file."""
         session_id=session_id_in or str(uuid.uuid4())
-        self._acquire_lock(session_id)
+        upload=await spool_upload(image_file, self.file_manager.upload_dir, f"{session_id}_upload_{uuid.uuid4().hex[:8]}")
+        try:
+            return await self.generate_2d_from_file(upload_path=upload['file_path'], session_id_in=session_id, progress=progress)
+        finally:
+            await executor.run_io(os.remove, upload['file_path'])
+
+    async def generate_2d_from_file(self, upload_path: str, session_id_in: str=None, progress=None) -> AppResponse:
+        session_id=session_id_in or str(uuid.uuid4())
+        await self._acquire_lock(session_id)
         try:
             print(f"Processing image for session: {session_id}")
 
-            #1.save upload pic
-            content=await image_file.read()
-            upload_info=self.file_manager.save_uploaded_image(session_id=session_id,file_content=content)
-            
-            print(f"Uploaded image saved at: {upload_info['file_path']}")
-
-            #2.analyze proportions
-            image_b64=self.image_service.encode_image_to_base64(upload_info['file_path'])
-            print(f"Image encoded to base64 for session: {session_id}")
-            anlaysis=self.image_service.analyze_proportions(image_b64=image_b64)
-
-            print(f"Image analysis result: {anlaysis}")
-            if not anlaysis['success']:
-                return AppResponse(
-                    success=False,
-                    session_id=session_id,
-                    error=anlaysis.get('error','Failed to analyze image proportions.')
-                )
-            
-            self.file_manager.db.save_analysis(
-                session_id=session_id,
-                analysis_data=anlaysis['data']
-            )
-            print(f"Analysis data saved for session: {session_id}") 
-            #3.generate 2d silhouette
-            silhouette_b64=self.image_service.generate_2d_silhouette(image_path=upload_info['file_path'])
-            silhouette_info=self.file_manager.save_2d_silhouette(
-                session_id=session_id,
-                image_b64=silhouette_b64,
-                version="v1"
-            )
-            print(f"2D silhouette saved for session: {session_id}")
+            # decode once: orientation, size cap and re-encode; both OpenAI calls share the bytes
+            async def ingest(_):
+                return await executor.run_cpu(normalize_image, upload_path)
+
+            async def save_upload(deps):
+                image=deps["ingest"]
+                return await executor.run_io(self.file_manager.save_uploaded_image, session_id=session_id, file_content=image['bytes'], extension=image['extension'])
+
+            # analysis and silhouette only need the ingested bytes, so they run concurrently with each other
+            # and with storing the upload; the path is only the file name sent along with the image
+            def image_label(image):
+                return f"{os.path.splitext(upload_path)[0]}.{image['extension']}"
+
+            async def analyze(deps):
+                image=deps["ingest"]
+                return await self.image_cache.analyze_proportions(image_digest=image['digest'], image_path=image_label(image), image=image)
+
+            async def silhouette(deps):
+                image=deps["ingest"]
+                return await self.image_cache.generate_2d_silhouette(image_digest=image['digest'], image_path=image_label(image), image=image)
+
+            async def check_analysis(deps):
+                anlaysis=deps["analysis"]
+                print(f"Image analysis result: {anlaysis}")
+                if not anlaysis['success']:
+                    # fails the graph, which cancels a still-running silhouette edit
+                    raise ValueError(anlaysis.get('error','Failed to analyze image proportions.'))
+                return anlaysis['data']
+
+            async def save(deps):
+                return await executor.run_io(self._persist_2d, session_id, deps["check_analysis"], deps["silhouette"])
+
+            graph = (StageGraph()
+                     .add("ingest", ingest)
+                     .add("upload", save_upload, deps=["ingest"])
+                     .add("analysis", analyze, deps=["ingest"])
+                     .add("silhouette", silhouette, deps=["ingest"])
+                     .add("check_analysis", check_analysis, deps=["analysis"])
+                     # the silhouette is only kept once the analysis succeeded
+                     .add("save", save, deps=["check_analysis", "silhouette"]))
+
+            async def on_complete(name, result, elapsed_ms):
+                if name == "ingest":
+                    await self._emit(progress, "upload_normalized", 0.05, elapsed_ms=elapsed_ms, **ingest_summary(result))
+                elif name == "upload":
+                    await self._emit(progress, "upload_saved", 0.1, elapsed_ms=elapsed_ms, url=result['url_path'])
+                elif name == "check_analysis":
+                    await self._emit(progress, "analysis_done", 0.5, elapsed_ms=elapsed_ms, analysis=result)
+                elif name == "save":
+                    await self._emit(progress, "silhouette_saved", 1.0, elapsed_ms=elapsed_ms, url=result['url_path'])
+
+            results, timings = await graph.run(on_complete=on_complete)
+            print(f"2D silhouette saved for session: {session_id}, timings(ms): {timings}")
 
             return AppResponse(
                 success=True,
                 session_id=session_id,
                 data={
-                    "original": upload_info['url_path'],
-                    "analysis": anlaysis,
-                    "silhouette_2d": silhouette_info
+                    "original": results["upload"]['url_path'],
+                    "analysis": results["analysis"],
+                    "silhouette_2d": results["save"],
+                    "ingest": ingest_summary(results["ingest"]),
+                    "timings": timings
                 },
                 message="2D silhouette generated successfully."
             )
@@ -100,19 +149,33 @@ class WorkflowService:
 
         pass
 
+    def _persist_2d(self, session_id: str, analysis_data: dict, silhouette_b64: str) -> dict:
+        """Write the silhouette and record its file row and the analysis in one transaction."""
+        with self.file_manager.db.transaction() as batch:
+            batch.save_analysis(session_id=session_id, analysis_data=analysis_data)
+            silhouette_info=self.file_manager.save_2d_silhouette(
+                session_id=session_id,
+                image_b64=silhouette_b64,
+                version="v1",
+                db=batch
+            )
+        print(f"Analysis and silhouette saved for session: {session_id}")
+        return silhouette_info
+
     async def edit_silhouette(self, session_id: str, prompt: str, image_path: str,version: int=2) -> Edit2DResponse:
-        self._acquire_lock(session_id)
+        await self._acquire_lock(session_id)
         try:
             print(f"Editing silhouette for session: {session_id}")
             print(f"User image path: {image_path}")  
             print(f"User prompt: {prompt}")  
 
-            edited_b64 = self.image_service.edit_silhouette(
+            edited_b64 = await self.image_service.edit_silhouette_async(
             image_path=image_path,      # ← 使用用户上传的图片（含红色标记）
             instructions=prompt          # user requirements 
             )
             new_version = f"v{version}"
-            edited_info = self.file_manager.save_2d_silhouette(
+            edited_info = await executor.run_io(
+                self.file_manager.save_2d_silhouette,
                 session_id=session_id,
                 image_b64=edited_b64,
                 version=new_version
@@ -138,76 +201,140 @@ class WorkflowService:
         finally:
             self._release_lock(session_id)
 
-    async def generate_3d_model(self, session_id: str,depth_div_width: float, aspect_ratio: float) -> Generate3DResponse:
-        self._acquire_lock(session_id)
+    def _read_latest_silhouette(self, session_id: str) -> bytes:
+        latest_silhouette=self.file_manager.get_silhouette(session_id)
+        return self.file_manager.read_bytes(latest_silhouette['file_path'])
+
+    async def generate_3d_model(self, session_id: str,depth_div_width: float, aspect_ratio: float, progress=None,
+                                max_error: Optional[float]=None, target_triangles: Optional[int]=None, fmt: str="stl",
+                                adjust_depth: bool=False, quality: str="final", prefetch_final: bool=False) -> Generate3DResponse:
+        """
+        prefetch_final: with quality="preview", also queue the final model as a background job
+        (other parameters: see _generate_3d_model)
+        """
+        result=await self._generate_3d_model(session_id, depth_div_width, aspect_ratio, progress, max_error, target_triangles, fmt, adjust_depth, quality)
+        final=result.data.get('final') if result.success else None
+        if prefetch_final and final:
+            # Queued only once the session lock is released, so a worker that claims it at once never finds the session busy
+            final['job_id']=await job_queue.submit("generate3d", session_id, {"depth_div_width": depth_div_width, "aspect_ratio": aspect_ratio, "max_error": max_error,
+                                                                             "target_triangles": target_triangles, "format": fmt, "quality": "final"})
+        return result
+
+    async def _generate_3d_model(self, session_id: str,depth_div_width: float, aspect_ratio: float, progress=None,
+                                 max_error: Optional[float]=None, target_triangles: Optional[int]=None, fmt: str="stl",
+                                 adjust_depth: bool=False, quality: str="final") -> Generate3DResponse:
+        await self._acquire_lock(session_id)
         """
         session_id: find 2d silhouette and analysis data by session_id
+        max_error / target_triangles: adaptive mesher tolerance or triangle budget (defaults from settings)
+        fmt: output mesh format, one of MESH_FORMATS (stl, ply, glb, 3mf)
+        adjust_depth: rescale the session's stored relief even if max_error makes the topology depth dependent
+        quality: "preview" meshes a downsampled silhouette for a fast first look, "final" is full resolution
         """
         try:
-            files=glob.glob(f"static/processed/{session_id}_2d_*.png")
-            latest_silhouette_path=max(files, key=os.path.getctime)
-            with open(latest_silhouette_path, "rb") as f:
-                image_path=f.read()
+            if quality not in QUALITY_TIERS:
+                raise ValueError(f"Unsupported quality: {quality} (expected one of {', '.join(QUALITY_TIERS)})")
+            preview=quality == "preview"
+            silhouette_bytes=await executor.run_io(self._read_latest_silhouette, session_id)
+            silhouette_sha256=hashlib.sha256(silhouette_bytes).hexdigest()
+            conditioning=None
+            if settings.SILHOUETTE_CONDITIONING:
+                # Binarized, despeckled and cropped once per saved version; everything below keys on the result
+                silhouette_bytes, conditioning=await silhouette_conditioner.condition(silhouette_sha256, silhouette_bytes)
+                silhouette_sha256=hashlib.sha256(silhouette_bytes).hexdigest()
             aspect_ratio=1.0
-            nparr = np.frombuffer(image_path, np.uint8)
-            im = cv2.imdecode(nparr, cv2.IMREAD_UNCHANGED)
-        
-            if im is None:
-                raise ValueError(f"Failed to read image from {image_path}")
-            
-            # Process image array
-            im_array = np.array(im)
-            im_array = 255 - im_array
-            im_array = np.rot90(im_array, -1, (0, 1))
-            
-            mesh_size = [im_array.shape[0], im_array.shape[1]]
-            mesh_max = np.max(im_array)
-            
-            if mesh_max == 0:
-                raise ValueError("Image contains no depth information (all pixels are black)")
-            
-            # Scale mesh based on depth information
-            if len(im_array.shape) == 3:
-                # Color image - use first channel
-                scaled_mesh = mesh_size[0] * depth_div_width * im_array[:, :, 0] / mesh_max
+            if max_error is None and target_triangles is None and settings.MESH_ADAPTIVE:
+                max_error=settings.MESH_MAX_ERROR
+            mesh_params={"aspect_ratio": aspect_ratio, "max_error": max_error, "target_triangles": target_triangles}
+            # Preview reliefs are kept apart so they never replace the session's full-resolution one
+            store_key=f"{session_id}:preview" if preview else session_id
+
+            # A stored depth-1 relief can be rescaled when that gives the same triangles as a rebuild,
+            # or when the caller explicitly asks to keep the current topology (adjust_depth)
+            depth_dependent=topology_depends_on_depth(max_error, target_triangles)
+            entry=relief_store.get(store_key, silhouette_sha256) if (adjust_depth or not depth_dependent) else None
+            topology_depth=None
+            if entry is not None and entry['mesh_params'] == mesh_params and depth_dependent and entry['topology_depth'] != depth_div_width:
+                topology_depth=entry['topology_depth']
+
+            # Same silhouette pixels + parameters -> same artifacts, served from a content-addressed path
+            key_params=dict(mesh_params, depth_div_width=depth_div_width)
+            if topology_depth is not None:
+                key_params['topology_depth']=topology_depth
+            if preview:
+                key_params.update(quality=quality, max_side=settings.QUALITY_PREVIEW_MAX_SIDE, render_size=settings.QUALITY_PREVIEW_RENDER_SIZE)
+            key=model_cache.make_key(silhouette_sha256, fmt, **key_params)
+            model_name=model_cache.model_name(MESH_FORMATS[fmt]['extension'])
+            meta=await executor.run_io(model_cache.get, key, MESH_FORMATS[fmt]['extension'])
+            cached=meta is not None
+            if cached:
+                print(f"3D result cache hit: {key[:12]}")
             else:
-                # Grayscale image
-                scaled_mesh = mesh_size[0] * depth_div_width * im_array / mesh_max
-            
-            # Create mesh
-            mesh_shape = mesh.Mesh(
-                np.zeros((mesh_size[0] - 1) * (mesh_size[1] - 1) * 2, dtype=mesh.Mesh.dtype)
-            )
-            
-            # Generate triangles for the mesh
-            for i in range(0, mesh_size[0] - 1):
-                for j in range(0, mesh_size[1] - 1):
-                    mesh_num = i * (mesh_size[1] - 1) + j
-                    
-                    # Apply aspect ratio to i coordinate (height)
-                    i_scaled = i * aspect_ratio
-                    i1_scaled = (i + 1) * aspect_ratio
-                    
-                    # First triangle
-                    mesh_shape.vectors[2 * mesh_num][2] = [i_scaled, j, scaled_mesh[i, j]]
-                    mesh_shape.vectors[2 * mesh_num][1] = [i_scaled, j + 1, scaled_mesh[i, j + 1]]
-                    mesh_shape.vectors[2 * mesh_num][0] = [i1_scaled, j, scaled_mesh[i + 1, j]]
-                    
-                    # Second triangle
-                    mesh_shape.vectors[2 * mesh_num + 1][0] = [i1_scaled, j + 1, scaled_mesh[i + 1, j + 1]]
-                    mesh_shape.vectors[2 * mesh_num + 1][1] = [i_scaled, j + 1, scaled_mesh[i, j + 1]]
-                    mesh_shape.vectors[2 * mesh_num + 1][2] = [i1_scaled, j, scaled_mesh[i + 1, j]]
-            
-            # Generate output filename
-            stl_buffer = io.BytesIO()
-            mesh_shape.save('temp', fh=stl_buffer)  # 保存到内存
-            stl_bytes = stl_buffer.getvalue()
-
-            stl_info = self.file_manager.save_stl_file(session_id, stl_bytes)
-            render_b64=self.model_3d_service.render_stl_to_image(stl_info['file_path'])
-            print(f"Render b64 length: {len(render_b64)}")
-            render_info=self.file_manager.save_3d_render(session_id=session_id,render_b64=render_b64)
+                await executor.run_io(model_cache.prepare, key)
+                model_path=model_cache.file_info(key, model_name)['file_path']
+                if entry is not None:
+                    # Skip decoding; re-triangulate only if the mesh parameters changed, then rescale Z
+                    started=time.perf_counter()
+                    if entry['mesh_params'] != mesh_params:
+                        unit_vectors=await executor.run_cpu(mesh_unit_heightmap, entry['unit_heightmap'], depth_div_width, aspect_ratio, max_error, target_triangles, entry['xy_scale'])
+                        relief_store.put(store_key, silhouette_sha256, entry['unit_heightmap'], unit_vectors, mesh_params, depth_div_width, entry['xy_scale'])
+                    else:
+                        unit_vectors=entry['unit_vectors']
+                    vectors=await executor.run_io(scale_relief_depth, unit_vectors, depth_div_width)
+                    mesh_ms=round((time.perf_counter() - started) * 1000, 1)
+                    # The rescaled array is already here: write it on the IO pool rather than pickle all of it to a CPU worker
+                    model=await executor.run_io(write_model, vectors, model_path, fmt, quality)
+                    model['timings']['mesh']=mesh_ms
+                else:
+                    # Decode, mesh and write the model file in a single CPU-pool call
+                    keep_unit=relief_store.max_bytes > 0
+                    model=await executor.run_cpu(build_relief_model, silhouette_bytes, depth_div_width, model_path, aspect_ratio, max_error, target_triangles, fmt, keep_unit, quality)
+                    if 'unit_vectors' in model:
+                        relief_store.put(store_key, silhouette_sha256, model.pop('unit_heightmap'), model.pop('unit_vectors'), mesh_params, depth_div_width, model.pop('xy_scale'))
+                # Formats other than STL were rendered with the write, from the array already in memory
+                render_b64=model.pop('render_b64', None)
+                meta={"triangles": model['triangles'], "size": model['size'], "timings": model['timings'], "rescaled": entry is not None}
+            triangles=meta['triangles']
+            timings=dict(meta['timings']) if not cached else {"mesh": 0.0, "write": 0.0, "render": 0.0}
+            await self._emit(progress, "mesh_built", 0.5, elapsed_ms=timings['mesh'], triangles=triangles, cached=cached, rescaled=meta.get('rescaled', False))
+
+            # Preview artifacts get their own file types so they never shadow the final model
+            suffix="_preview" if preview else ""
+            # Objects already copied to shared storage for this entry, so hits skip hashing and uploading them again
+            stored=dict(meta.get('stored') or {})
+            model_info=model_cache.file_info(key, model_name)
+            model_info=await executor.run_io(self.file_manager.register_file, session_id, fmt + suffix, model_info['file_path'], model_info['url_path'], stored.get('model'))
+            stored['model']=model_info.pop('stored')
+            model_info={**model_info, "format": fmt, "size": meta['size']}
+            # Stage name predates other formats; clients key on it, the format is in the payload
+            await self._emit(progress, "stl_written", 0.6, elapsed_ms=timings['write'], url=model_info['url_path'], format=fmt, size=meta['size'])
+
+            if not cached:
+                if render_b64 is None:
+                    # The STL is announced above; the preview renders from its mapped records in a second CPU-pool call
+                    rendered=await executor.run_cpu(render_model, model_path, quality)
+                    render_b64=rendered['render_b64']
+                    timings['render']=meta['timings']['render']=rendered['timings']['render']
+                await executor.run_io(model_cache.put, key, base64.b64decode(render_b64), meta)
+                if not preview:
+                    # gzip/zstd variants for /static, built off the request path
+                    artifact_index.precompress_later(model_path)
+
+            render_info=model_cache.file_info(key, model_cache.PREVIEW)
+            render_info=await executor.run_io(self.file_manager.register_file, session_id, "render" + suffix, render_info['file_path'], render_info['url_path'], stored.get('render'))
+            stored['render']=render_info.pop('stored')
+            stored={k: v for k, v in stored.items() if v}
+            if stored!=meta.get('stored', {}):
+                meta['stored']=stored
+                await executor.run_io(model_cache.put_meta, key, meta)
+            await self._emit(progress, "render_done", 1.0, elapsed_ms=timings['render'], url=render_info['url_path'])
             print(f"Render info: {render_info}")
+
+            final=None
+            if preview:
+                final_params={"depth_div_width": depth_div_width, "aspect_ratio": aspect_ratio, "max_error": max_error,
+                              "target_triangles": target_triangles, "format": fmt}
+                final={"download_url": "/api/download3D?" + urlencode({"session_id": session_id, **{k: v for k, v in final_params.items() if v is not None}})}
             
             # base_name = os.path.splitext(os.path.basename(image_path))[0]
             # output_filename = f"{base_name}_3d.stl"
@@ -219,8 +346,15 @@ class WorkflowService:
                 success=True,
                 session_id=session_id,
                 data={
-                    "stl_file": stl_info,
+                    "model_file": model_info,
+                    "stl_file": model_info if fmt == "stl" else None,
                     "render_image": render_info,
+                    "mesh": {"triangles": triangles, "max_error": max_error, "target_triangles": target_triangles},
+                    "cached": cached,
+                    "rescaled": meta.get('rescaled', False),
+                    "conditioning": conditioning,
+                    "quality": quality,
+                    "final": final,
                 },
                 message="3D model generated successfully."
             )
@@ -274,6 +408,35 @@ class WorkflowService:
 
 
     
+    async def run_generate_2d_job(self, job: dict, report) -> dict:
+        """Job handler: the upload was spooled to disk at submit time."""
+        upload_path=job['params']['upload_path']
+        try:
+            result=await self.generate_2d_from_file(upload_path=upload_path, session_id_in=job['session_id'], progress=report)
+        except Exception:
+            os.remove(upload_path)
+            raise
+        # kept until the job finishes so a requeued job can still read it
+        os.remove(upload_path)
+        return jsonable_encoder(result)
+
+    async def run_generate_3d_job(self, job: dict, report) -> dict:
+        params=job['params']
+        result=await self.generate_3d_model(
+            session_id=job['session_id'],
+            depth_div_width=params['depth_div_width'],
+            aspect_ratio=params.get('aspect_ratio', 1.0),
+            progress=report,
+            max_error=params.get('max_error'),
+            target_triangles=params.get('target_triangles'),
+            fmt=params.get('format', 'stl'),
+            adjust_depth=params.get('adjust_depth', False),
+            quality=params.get('quality', 'final'),
+            prefetch_final=params.get('prefetch_final', False)
+        )
+        return jsonable_encoder(result)
+
+
     # async def handle_chat(self, request: ChatRequest) -> ChatResponse:
 
     #     # session ID
@@ -352,4 +515,6 @@ class WorkflowService:
 
 
 
-workflow = WorkflowService()
\ No newline at end of file
+workflow = WorkflowService()
+job_queue.register("generate2d", workflow.run_generate_2d_job)
+job_queue.register("generate3d", workflow.run_generate_3d_job)
@@ -0,0 +1,50 @@
+"""
+Benchmark: adaptive quadtree relief vs. the dense two-triangles-per-pixel relief.
+
+Run from the backend directory:
+    python benchmarks/bench_adaptive_mesh.py
+    python benchmarks/bench_adaptive_mesh.py --sizes 512 1024 --errors 0 1 5 --target 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.adaptive_mesh import build_adaptive_relief_vectors  # noqa: E402
+from app.services.mesh_builder import build_relief_vectors  # noqa: E402
+from bench_mesh_builder import synthetic_heightmap  # noqa: E402
+
+STL_TRIANGLE_BYTES = 50
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--errors", type=float, nargs="+", default=[0.0, 1.0])
+    parser.add_argument("--target", type=int, default=20000, help="also mesh to this triangle budget")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'mode':>14} {'triangles':>11} {'STL MB':>8} {'mesh s':>8} {'reduction':>10}")
+    for size in args.sizes:
+        scaled_mesh = synthetic_heightmap(size)
+        dense, dense_s = timed(build_relief_vectors, scaled_mesh)
+        print(f"{size:>6} {'dense':>14} {len(dense):>11} {len(dense) * STL_TRIANGLE_BYTES / 1e6:8.1f} {dense_s:8.3f} {'1.0x':>10}")
+
+        runs = [(f"max_error={e:g}", {"max_error": e}) for e in args.errors]
+        runs.append((f"target={args.target}", {"target_triangles": args.target}))
+        for label, kwargs in runs:
+            vectors, seconds = timed(build_adaptive_relief_vectors, scaled_mesh, **kwargs)
+            reduction = f"{len(dense) / max(len(vectors), 1):9.1f}x"
+            print(f"{size:>6} {label:>14} {len(vectors):>11} {len(vectors) * STL_TRIANGLE_BYTES / 1e6:8.1f} {seconds:8.3f} {reduction}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Concurrency benchmark: pooled WAL Database vs. the original
+connect-per-call rollback-journal access pattern.
+
+Each thread simulates workflow steps that record a file row and an
+analysis row, interleaved with reads. Run from the backend directory:
+    python benchmarks/bench_database.py --threads 16 --steps 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import Database  # noqa: E402
+
+
+class LegacyDatabase:
+    """The pre-pooling access pattern: new connection and commit per call."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Database(db_path).close()  # same schema, then revert to the default journal
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+    def save_file(self, session_id, file_type, file_path, url_path):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT OR REPLACE INTO files (session_id, file_type, file_path, url_path) VALUES (?, ?, ?, ?)",
+                         (session_id, file_type, file_path, url_path))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_analysis(self, session_id, data):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT OR REPLACE INTO analysis (session_id, width, length, thickness, complexity, ratio_string) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (session_id, data["width"], data["length"], data["thickness"], data["complexity"], None))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_file(self, session_id, file_type):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT * FROM files WHERE session_id = ? AND file_type = ?",
+                                (session_id, file_type)).fetchone()
+        finally:
+            conn.close()
+
+
+ANALYSIS = {"width": 1.0, "length": 1.5, "thickness": 0.3, "complexity": "moderate"}
+
+
+def legacy_step(db, session_id):
+    db.save_file(session_id, "2d_v1", f"static/processed/{session_id}_2d_v1.png", f"/static/processed/{session_id}_2d_v1.png")
+    db.save_analysis(session_id, ANALYSIS)
+    db.get_file(session_id, "2d_v1")
+
+
+def pooled_step(db, session_id):
+    with db.transaction() as batch:
+        batch.save_file(session_id, "2d_v1", f"static/processed/{session_id}_2d_v1.png", f"/static/processed/{session_id}_2d_v1.png")
+        batch.save_analysis(session_id, ANALYSIS)
+    db.get_file(session_id, "2d_v1")
+
+
+def run(label, db, step, threads, steps):
+    errors = []
+
+    def worker(t):
+        for n in range(steps):
+            try:
+                step(db, f"t{t}-s{n}")
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    total = threads * steps
+    locked = sum(1 for e in errors if "locked" in e)
+    print(f"{label:>8}: {total} steps in {elapsed:6.2f}s  {total / elapsed:8.0f} steps/s  "
+          f"errors={len(errors)} (locked={locked})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run("legacy", LegacyDatabase(os.path.join(tmp, "legacy.db")), legacy_step, args.threads, args.steps)
+        run("pooled", Database(os.path.join(tmp, "pooled.db")), pooled_step, args.threads, args.steps)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: contour extrusion engine vs. the original sampled-pixel "walls".
+
+Run from the backend directory:
+    python benchmarks/bench_extrusion.py
+    python benchmarks/bench_extrusion.py --size 1024 --simplify 0.5
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from stl import mesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.extrusion import extrude_silhouette_mesh, is_closed_manifold  # noqa: E402
+
+
+def legacy_extrude(binary_image: np.ndarray, thickness: float):
+    """The original Model3DService._extrude_to_3d plus its per-face copy loop."""
+    y_coords, x_coords = np.where(binary_image > 0)
+    num_points = len(x_coords)
+    if num_points > 5000:
+        step = num_points // 5000
+        x_coords = x_coords[::step]
+        y_coords = y_coords[::step]
+        num_points = len(x_coords)
+    front = np.column_stack([x_coords, y_coords, np.zeros(num_points)])
+    back = np.column_stack([x_coords, y_coords, np.full(num_points, thickness)])
+    vertices = np.vstack([front, back]).astype(float)
+    faces = []
+    for i in range(num_points - 1):
+        faces.append([i, i + 1, i + num_points])
+        faces.append([i + 1, i + 1 + num_points, i + num_points])
+    faces.append([num_points - 1, 0, num_points - 1 + num_points])
+    faces.append([0, num_points, num_points - 1 + num_points])
+    faces = np.array(faces)
+
+    stl_mesh = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
+    for i, face in enumerate(faces):
+        for j in range(3):
+            stl_mesh.vectors[i][j] = vertices[face[j], :]
+    return stl_mesh, faces
+
+
+def silhouettes(size: int):
+    """Simple (disc), moderate (ring with text cut-outs) and complex (noisy blobs with many holes)."""
+    yy, xx = np.mgrid[0:size, 0:size]
+    r = np.hypot(xx - size / 2, yy - size / 2)
+    yield "simple", r < size * 0.4
+
+    moderate = ((r < size * 0.45) & (r > size * 0.1)).astype(np.uint8)
+    cv2.putText(moderate, "CAD", (int(size * 0.2), int(size * 0.62)), cv2.FONT_HERSHEY_SIMPLEX,
+                size / 160, 0, max(1, size // 60))
+    yield "moderate", moderate > 0
+
+    noise = cv2.GaussianBlur(np.random.default_rng(0).random((size, size)), (0, 0), size / 80)
+    yield "complex", noise > np.median(noise)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=512, help="silhouette width/height in pixels")
+    parser.add_argument("--thickness", type=float, default=3.0)
+    parser.add_argument("--simplify", type=float, default=1.0, help="contour tolerance in pixels")
+    args = parser.parse_args()
+
+    print(f"{'shape':>9} {'legacy s':>9} {'legacy tris':>12} {'closed':>7} {'contour s':>10} {'tris':>8} {'closed':>7}")
+    for name, mask in silhouettes(args.size):
+        (legacy, legacy_faces), legacy_s = timed(legacy_extrude, mask, args.thickness)
+        (vertices, faces), fast_s = timed(extrude_silhouette_mesh, mask, args.thickness, args.simplify)
+        print(f"{name:>9} {legacy_s:9.3f} {len(legacy.vectors):>12} {str(is_closed_manifold(legacy_faces)):>7} "
+              f"{fast_s:10.3f} {len(faces):>8} {str(is_closed_manifold(faces)):>7}")
+
+
+if __name__ == "__main__":
+    main()
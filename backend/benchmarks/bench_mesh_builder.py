@@ -0,0 +1,79 @@
+"""
+Benchmark: vectorized relief mesh builder vs. the original per-pixel loop.
+
+Run from the backend directory:
+    python benchmarks/bench_mesh_builder.py
+    python benchmarks/bench_mesh_builder.py --sizes 256 512 --loop-max 512
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from stl import mesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.mesh_builder import build_relief_mesh  # noqa: E402
+
+
+def loop_relief_mesh(scaled_mesh: np.ndarray, aspect_ratio: float = 1.0) -> mesh.Mesh:
+    """The original nested loop from WorkflowService.generate_3d_model."""
+    mesh_size = scaled_mesh.shape
+    mesh_shape = mesh.Mesh(
+        np.zeros((mesh_size[0] - 1) * (mesh_size[1] - 1) * 2, dtype=mesh.Mesh.dtype)
+    )
+    for i in range(0, mesh_size[0] - 1):
+        for j in range(0, mesh_size[1] - 1):
+            mesh_num = i * (mesh_size[1] - 1) + j
+            i_scaled = i * aspect_ratio
+            i1_scaled = (i + 1) * aspect_ratio
+            mesh_shape.vectors[2 * mesh_num][2] = [i_scaled, j, scaled_mesh[i, j]]
+            mesh_shape.vectors[2 * mesh_num][1] = [i_scaled, j + 1, scaled_mesh[i, j + 1]]
+            mesh_shape.vectors[2 * mesh_num][0] = [i1_scaled, j, scaled_mesh[i + 1, j]]
+            mesh_shape.vectors[2 * mesh_num + 1][0] = [i1_scaled, j + 1, scaled_mesh[i + 1, j + 1]]
+            mesh_shape.vectors[2 * mesh_num + 1][1] = [i_scaled, j + 1, scaled_mesh[i, j + 1]]
+            mesh_shape.vectors[2 * mesh_num + 1][2] = [i1_scaled, j, scaled_mesh[i + 1, j]]
+    return mesh_shape
+
+
+def synthetic_heightmap(size: int, depth_div_width: float = 0.1) -> np.ndarray:
+    """A filled disc with a hole, scaled like decode_heightmap does."""
+    yy, xx = np.mgrid[0:size, 0:size]
+    r = np.hypot(xx - size / 2, yy - size / 2)
+    im = np.where((r < size * 0.4) & (r > size * 0.1), 255, 0).astype(np.uint8)
+    return size * depth_div_width * im / 255
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--loop-max", type=int, default=2048, help="skip the slow loop above this size")
+    parser.add_argument("--aspect-ratio", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'triangles':>11} {'loop s':>9} {'vector s':>9} {'speedup':>8} {'identical':>9}")
+    for size in args.sizes:
+        scaled_mesh = synthetic_heightmap(size)
+        fast, fast_s = timed(build_relief_mesh, scaled_mesh, args.aspect_ratio)
+
+        if size <= args.loop_max:
+            slow, slow_s = timed(loop_relief_mesh, scaled_mesh, args.aspect_ratio)
+            identical = np.array_equal(slow.vectors, fast.vectors)
+            loop_col, speedup_col = f"{slow_s:9.3f}", f"{slow_s / fast_s:7.1f}x"
+        else:
+            identical = "-"
+            loop_col, speedup_col = f"{'skipped':>9}", f"{'-':>8}"
+
+        print(f"{size:>6} {len(fast.vectors):>11} {loop_col} {fast_s:9.3f} {speedup_col} {str(identical):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: file size and encode time of indexed PLY / GLB / 3MF vs. binary STL.
+
+Run from the backend directory:
+    python benchmarks/bench_mesh_export.py
+    python benchmarks/bench_mesh_export.py --sizes 512 1024 --dense
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.adaptive_mesh import build_adaptive_relief_vectors  # noqa: E402
+from app.services.mesh_builder import build_relief_vectors  # noqa: E402
+from app.services.mesh_export import MESH_FORMATS, export_mesh, weld_vertices  # noqa: E402
+from bench_mesh_builder import synthetic_heightmap  # noqa: E402
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--dense", action="store_true", help="use the dense relief instead of the adaptive one")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'triangles':>10} {'vertices':>9} {'weld s':>7} {'format':>6} {'MB':>8} {'vs STL':>7} {'encode s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            heightmap = synthetic_heightmap(size)
+            vectors = build_relief_vectors(heightmap) if args.dense else build_adaptive_relief_vectors(heightmap)
+            (vertices, _), weld_s = timed(weld_vertices, vectors)
+
+            stl_bytes = None
+            for fmt, spec in MESH_FORMATS.items():
+                path = os.path.join(tmp, f"relief_{size}.{spec['extension']}")
+                file_size, encode_s = timed(export_mesh, path, vectors, fmt)
+                stl_bytes = stl_bytes or file_size
+                print(f"{size:>6} {len(vectors):>10} {len(vertices):>9} {weld_s:7.3f} {fmt:>6} "
+                      f"{file_size / 1e6:8.2f} {file_size / stl_bytes:6.2f}x {encode_s:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Offline check of the async OpenAI path: concurrency cap, retry/backoff and
+deadlines, driven through StubOpenAITransport (no network, no API key).
+
+Run from the backend directory:
+    python benchmarks/bench_openai_client.py --requests 50 --latency 0.2 --fail-first 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.image_service import ImageService  # noqa: E402
+from app.services.openai_stub import StubOpenAITransport, stub_silhouette_b64  # noqa: E402
+
+
+async def run(args):
+    stub = StubOpenAITransport(latency=args.latency, fail_first=args.fail_first, fail_status=args.fail_status)
+    ImageService.use_stub_transport(stub)
+    settings.OPENAI_MAX_CONCURRENCY = args.concurrency
+    settings.OPENAI_BACKOFF_BASE = args.backoff_base
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        ImageService.analyze_proportions_async(image_b64=stub_silhouette_b64(32))
+        for _ in range(args.requests)
+    ])
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if r["success"])
+
+    print(f"requests:          {args.requests}")
+    print(f"succeeded:         {ok}")
+    print(f"http attempts:     {stub.requests} ({stub.requests - args.requests} retries)")
+    print(f"max in flight:     {stub.max_in_flight} (cap {args.concurrency})")
+    print(f"wall time:         {elapsed:.2f}s")
+    if ok < args.requests:
+        print(f"first failure:     {next(r['error'] for r in results if not r['success'])}")
+
+    # Deadline: a stub slower than the deadline must fail fast, not hang
+    slow = StubOpenAITransport(latency=5.0)
+    ImageService.use_stub_transport(slow)
+    start = time.perf_counter()
+    result = await ImageService.analyze_proportions_async(image_b64="", deadline=0.5)
+    print(f"deadline 0.5s:     success={result['success']} after {time.perf_counter() - start:.2f}s")
+    await ImageService.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-first", type=int, default=10)
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
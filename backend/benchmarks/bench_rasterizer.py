@@ -0,0 +1,78 @@
+"""
+Benchmark: NumPy z-buffer preview rasterizer vs. the matplotlib Poly3DCollection path.
+
+Run from the backend directory:
+    python benchmarks/bench_rasterizer.py
+    python benchmarks/bench_rasterizer.py --sizes 128 256 512 1024 --mpl-max 256 --out /tmp/previews
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.mesh_builder import build_relief_mesh  # noqa: E402
+from app.services.model_3d_service import Model3DService  # noqa: E402
+from app.services.rasterizer import render_png_b64  # noqa: E402
+from bench_mesh_builder import synthetic_heightmap  # noqa: E402
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn, returning (result, seconds, peak traced MB)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 256, 512, 1024])
+    parser.add_argument("--mpl-max", type=int, default=256, help="skip matplotlib above this heightmap size")
+    parser.add_argument("--resolution", type=int, default=800, help="raster preview width/height in pixels")
+    parser.add_argument("--shading", choices=["flat", "lambert"], default="lambert")
+    parser.add_argument("--out", help="directory to write the preview PNGs for eyeballing")
+    args = parser.parse_args()
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    print(f"{'size':>6} {'triangles':>11} {'mpl s':>8} {'mpl MB':>8} {'raster s':>9} {'raster MB':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            relief = build_relief_mesh(synthetic_heightmap(size))
+            stl_path = os.path.join(tmp, f"relief_{size}.stl")
+            relief.save(stl_path)
+
+            fast, fast_s, fast_mb = timed(
+                render_png_b64, relief.vectors, width=args.resolution, height=args.resolution, shading=args.shading
+            )
+            outputs = {"raster": fast}
+
+            if size <= args.mpl_max:
+                slow, slow_s, slow_mb = timed(Model3DService._render_matplotlib, stl_path)
+                outputs["mpl"] = slow
+                mpl_cols, speedup_col = f"{slow_s:8.2f} {slow_mb:8.0f}", f"{slow_s / fast_s:7.1f}x"
+            else:
+                mpl_cols, speedup_col = f"{'skipped':>8} {'-':>8}", f"{'-':>8}"
+
+            print(f"{size:>6} {len(relief.vectors):>11} {mpl_cols} {fast_s:9.2f} {fast_mb:10.0f} {speedup_col}")
+
+            if args.out:
+                for name, b64 in outputs.items():
+                    with open(os.path.join(args.out, f"relief_{size}_{name}.png"), "wb") as f:
+                        f.write(base64.b64decode(b64))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Check of the OpenSCAD render path against benchmarks/fake_openscad.py:
+one openscad run per cold render, cache hits by SCAD hash, the concurrency
+cap and the per-process timeout. Cache files go to a temporary directory.
+
+Run from the backend directory:
+    python benchmarks/bench_render_service.py --renders 8 --delay 0.5 --concurrency 2
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=8, help="distinct SCAD files rendered concurrently")
+    parser.add_argument("--delay", type=float, default=0.5, help="fake CSG evaluation time per openscad run (s)")
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_render_")
+    log_path = os.path.join(tmp, "openscad.log")
+    os.environ.update({
+        "OPENSCAD_BIN": os.path.join(HERE, "fake_openscad.py"),
+        "OPENSCAD_CONCURRENCY": str(args.concurrency),
+        "FAKE_OPENSCAD_DELAY": str(args.delay),
+        "FAKE_OPENSCAD_LOG": log_path,
+        "MODEL_CACHE_DIR": os.path.join(tmp, "models"),
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "stub"),
+    })
+    from app.core.config import settings
+    from app.services.render import render_service
+
+    def invocations() -> int:
+        return sum(1 for _ in open(log_path)) if os.path.exists(log_path) else 0
+
+    scad_paths = []
+    for i in range(args.renders):
+        path = os.path.join(tmp, f"part_{i}.scad")
+        with open(path, "w") as f:
+            f.write(f"cube({i + 1});\n" + " " * i)
+        scad_paths.append(path)
+
+    def render_all():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.renders) as pool:
+            results = list(pool.map(lambda p: render_service.render(p, "bench"), scad_paths))
+        return results, time.perf_counter() - start
+
+    results, cold_s = render_all()
+    cold_runs = invocations()
+    print(f"cold:    {args.renders} renders in {cold_s:.2f}s, {cold_runs} openscad runs "
+          f"(cap {settings.OPENSCAD_CONCURRENCY}, floor {args.delay * -(-args.renders // args.concurrency):.2f}s)")
+    print(f"         ok={sum(1 for r in results if r['stl_url'])} cached={sum(1 for r in results if r.get('cached'))}")
+
+    results, warm_s = render_all()
+    print(f"cached:  {args.renders} renders in {warm_s:.3f}s, {invocations() - cold_runs} openscad runs, "
+          f"cached={sum(1 for r in results if r.get('cached'))}")
+
+    settings.OPENSCAD_TIMEOUT = args.delay / 2
+    with open(scad_paths[0], "a") as f:
+        f.write("// edited\n")
+    start = time.perf_counter()
+    result = render_service.render(scad_paths[0], "bench")
+    print(f"timeout: {time.perf_counter() - start:.2f}s, error={result.get('error')!r}")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
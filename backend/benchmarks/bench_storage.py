@@ -0,0 +1,115 @@
+"""
+Check and benchmark of the artifact storage backends: content-addressed
+keys, deduplication, read-back, multipart uploads and presigned URLs.
+
+The local backend writes to a temporary directory. The S3 backend runs
+against --endpoint-url (e.g. a local MinIO, with AWS_ACCESS_KEY_ID /
+AWS_SECRET_ACCESS_KEY set) or, without it, against moto's in-process mock
+(pip install boto3 moto).
+
+Run from the backend directory:
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --endpoint-url http://localhost:9000 --bucket prompt2cad
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+from app.services.storage import OBJECT_KEY, LocalStorage, S3Storage  # noqa: E402
+
+
+def payloads(count, size):
+    return [os.urandom(size) for _ in range(count)]
+
+
+def run(name, backend, small, large_path, large_size):
+    started = time.perf_counter()
+    stored = [backend.put_bytes(data, "png") for data in small]
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    again = [backend.put_bytes(data, "png") for data in small]
+    warm = time.perf_counter() - started
+
+    assert all(OBJECT_KEY.match(s['key']) for s in stored)
+    assert not any(s['deduplicated'] for s in stored) and all(s['deduplicated'] for s in again)
+    assert [s['key'] for s in stored] == [s['key'] for s in again]
+    assert all(backend.read_bytes(s['file_path']) == data for s, data in zip(stored, small))
+
+    started = time.perf_counter()
+    big = backend.put_file(large_path)
+    upload = time.perf_counter() - started
+    with open(large_path, "rb") as f:
+        assert backend.read_bytes(big['file_path']) == f.read()
+
+    print(f"{name:>6} {len(small)} x {len(small[0]) // 1024} KB: put {cold * 1000:7.1f} ms, "
+          f"deduplicated re-put {warm * 1000:7.1f} ms")
+    print(f"{name:>6} {large_size // (1024 * 1024)} MB file: {upload:6.2f} s "
+          f"({large_size / (1024 * 1024) / upload:6.1f} MB/s)  {big['file_path']}")
+    return big
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=50)
+    parser.add_argument("--object-kb", type=int, default=256)
+    parser.add_argument("--large-mb", type=int, default=40)
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--bucket", default="bench-storage")
+    parser.add_argument("--part-mb", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_storage_")
+    small = payloads(args.objects, args.object_kb * 1024)
+    large_path = os.path.join(tmp, "large.stl")
+    large_size = args.large_mb * 1024 * 1024
+    with open(large_path, "wb") as f:
+        f.write(os.urandom(large_size))
+
+    try:
+        run("local", LocalStorage(os.path.join(tmp, "objects"), "/static/objects"), small, large_path, large_size)
+
+        if args.endpoint_url:
+            mock = contextlib.nullcontext()
+        else:
+            try:
+                from moto import mock_aws
+            except ImportError:
+                print("s3: skipped (pass --endpoint-url or pip install moto)")
+                return
+            os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+            os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+            mock = mock_aws()
+        with mock:
+            s3 = S3Storage(args.bucket, prefix="bench", endpoint_url=args.endpoint_url, region="us-east-1",
+                           multipart_threshold=args.part_mb * 1024 * 1024, multipart_chunk=args.part_mb * 1024 * 1024,
+                           max_concurrency=args.concurrency)
+            with contextlib.suppress(s3.client.exceptions.BucketAlreadyOwnedByYou):
+                s3.client.create_bucket(Bucket=args.bucket)
+            big = run("s3", s3, small, large_path, large_size)
+
+            head = s3.client.head_object(Bucket=args.bucket, Key=s3.object_name(big['key']))
+            parts = head['ETag'].strip('"').partition("-")[2] or "1"
+            print(f"{'s3':>6} large file stored in {parts} part(s), "
+                  f"Content-Type {head['ContentType']}, Cache-Control {head.get('CacheControl')}")
+
+            url = s3.download_url(big['key'])
+            response = requests.get(url, headers={"Range": "bytes=0-1023"})
+            with open(large_path, "rb") as f:
+                assert response.status_code == 206 and response.content == f.read(1024), response.status_code
+            print(f"{'s3':>6} presigned URL ok: {url.split('?')[0]}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: dense relief meshing in parallel row bands (shared memory) vs. serial.
+
+Serial is build_relief_vectors + scale_relief_depth, as build_relief_model
+does for small reliefs; tiled is tiled_relief_vectors with 1..N workers.
+Every tiled result is checked to be byte-identical to the serial one.
+
+Run from the backend directory:
+    python benchmarks/bench_tiled_mesh.py
+    python benchmarks/bench_tiled_mesh.py --sizes 4096 --workers 1 2 4 8 16
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.mesh_builder import build_relief_vectors, scale_relief_depth  # noqa: E402
+from app.services.tiled_mesh import tiled_relief_vectors  # noqa: E402
+from bench_mesh_builder import synthetic_heightmap  # noqa: E402
+
+DEPTH = 0.1
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = [w for w in (1, 2, 4, 8, 16) if w <= cores] or [1]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2048, 4096])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{cores} cores")
+    print(f"{'size':>6} {'triangles':>10} {'workers':>7} {'seconds':>8} {'speedup':>8} {'efficiency':>10} {'identical':>9}")
+    for size in args.sizes:
+        heightmap = synthetic_heightmap(size)
+        serial, serial_s = best_of(args.repeat, lambda: scale_relief_depth(build_relief_vectors(heightmap), DEPTH))
+        print(f"{size:>6} {len(serial):>10} {'serial':>7} {serial_s:8.3f} {1.0:7.2f}x {'':>10} {'':>9}")
+
+        for workers in args.workers:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                # Warm up: spawn the workers and import numpy there before timing
+                with tiled_relief_vectors(heightmap[:64, :64], 1.0, DEPTH, workers=workers, pool=pool) as vectors:
+                    del vectors
+
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    with tiled_relief_vectors(heightmap, 1.0, DEPTH, workers=workers, pool=pool) as vectors:
+                        best = min(best, time.perf_counter() - start)
+                        identical = vectors.tobytes() == serial.tobytes()
+                        del vectors
+            speedup = serial_s / best
+            print(f"{size:>6} {len(serial):>10} {workers:>7} {best:8.3f} {speedup:7.2f}x "
+                  f"{speedup / workers:9.0%} {str(identical):>9}")
+        del serial
+
+
+if __name__ == "__main__":
+    main()
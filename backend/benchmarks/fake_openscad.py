@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the openscad binary: `fake_openscad.py -o out.stl model.scad`.
+
+Sleeps FAKE_OPENSCAD_DELAY seconds (CSG evaluation), appends one line to
+FAKE_OPENSCAD_LOG if set (so callers can count invocations), and writes an
+ASCII STL cube whose size is the number of bytes in the SCAD file. Only STL
+output is supported; anything else exits 1 like a failed export.
+"""
+import os
+import sys
+import time
+
+CUBE_FACES = [
+    ((0, 0, 0), (0, 1, 0), (1, 1, 0)), ((0, 0, 0), (1, 1, 0), (1, 0, 0)),
+    ((0, 0, 1), (1, 0, 1), (1, 1, 1)), ((0, 0, 1), (1, 1, 1), (0, 1, 1)),
+    ((0, 0, 0), (1, 0, 0), (1, 0, 1)), ((0, 0, 0), (1, 0, 1), (0, 0, 1)),
+    ((0, 1, 0), (0, 1, 1), (1, 1, 1)), ((0, 1, 0), (1, 1, 1), (1, 1, 0)),
+    ((0, 0, 0), (0, 0, 1), (0, 1, 1)), ((0, 0, 0), (0, 1, 1), (0, 1, 0)),
+    ((1, 0, 0), (1, 1, 0), (1, 1, 1)), ((1, 0, 0), (1, 1, 1), (1, 0, 1)),
+]
+
+
+def main(argv):
+    if "-o" not in argv or argv.index("-o") + 1 >= len(argv):
+        print("usage: fake_openscad.py -o OUT.stl FILE.scad", file=sys.stderr)
+        return 1
+    out = argv[argv.index("-o") + 1]
+    scad = [a for a in argv if a.endswith(".scad")]
+    if not out.endswith(".stl") or not scad:
+        print(f"fake openscad: cannot export {out}", file=sys.stderr)
+        return 1
+
+    time.sleep(float(os.getenv("FAKE_OPENSCAD_DELAY", "0.5")))
+    if os.getenv("FAKE_OPENSCAD_LOG"):
+        with open(os.environ["FAKE_OPENSCAD_LOG"], "a") as log:
+            log.write(f"{os.getpid()} {scad[0]}\n")
+
+    size = os.path.getsize(scad[0])
+    with open(out, "w") as f:
+        f.write("solid fake\n")
+        for face in CUBE_FACES:
+            f.write("facet normal 0 0 0\nouter loop\n")
+            for x, y, z in face:
+                f.write(f"vertex {x * size} {y * size} {z * size}\n")
+            f.write("endloop\nendfacet\n")
+        f.write("endsolid fake\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
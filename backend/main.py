@@ -1,14 +1,77 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.requests import ClientDisconnect
 from app.api.routes import router
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+from app.core.executor import executor
+from app.services.image_service import ImageService
+from app.services.job_queue import job_queue
+from app.core.config import settings
+from app.services.artifacts import ArtifactFiles, artifact_index
 app = FastAPI()
 
+# Room for multipart boundaries and the other form fields around one file
+UPLOAD_FORM_SLACK = 1024 * 1024
+
+
+class LimitRequestSize:
+    """
+    Refuse request bodies over max_bytes with 413, before the multipart parser
+    spools them. The declared Content-Length is checked up front and the raw
+    body counted as it arrives, so chunked uploads are cut off at the limit too.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def too_large(self) -> JSONResponse:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds the {settings.UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit."})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return await self.too_large()(scope, receive, send)
+
+        received = 0
+        started = rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    if not started:
+                        await self.too_large()(scope, receive, send)
+                    # The app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except ClientDisconnect:
+            if not rejected:
+                raise
+
 
 app.include_router(router, prefix="/api")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Model cache entries and stored objects are content-addressed, so their URLs never change content
+app.mount("/static", ArtifactFiles(directory="static", index=artifact_index, immutable=(settings.MODEL_CACHE_URL[len("/static"):], settings.STORAGE_LOCAL_URL[len("/static"):])), name="static")
 
+app.add_middleware(LimitRequestSize, max_bytes=settings.UPLOAD_MAX_BYTES + UPLOAD_FORM_SLACK)
 app.add_middleware(
     CORSMiddleware,
     # allow portals for frontend development and production
@@ -18,6 +81,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    await job_queue.stop()
+    await ImageService.aclose()
+    executor.shutdown()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000,reload=True)
\ No newline at end of file
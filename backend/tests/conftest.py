@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Run from the backend directory: python -m pytest tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "stub")
@@ -0,0 +1,80 @@
+"""
+Retry/backoff, Retry-After and deadline handling of the async OpenAI path,
+driven offline through StubOpenAITransport.
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.image_service import ImageService
+from app.services.openai_stub import StubOpenAITransport
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(settings, "OPENAI_BACKOFF_MAX", 5.0)
+    monkeypatch.setattr(settings, "OPENAI_MAX_RETRIES", 4)
+    monkeypatch.setattr(settings, "OPENAI_DEADLINE", 10.0)
+
+
+def analyze(stub: StubOpenAITransport, deadline: float = None):
+    """One proportions call through stub; returns (result, seconds taken)."""
+    async def run():
+        ImageService.use_stub_transport(stub)
+        started = time.monotonic()
+        try:
+            result = await ImageService.analyze_proportions_async(image_b64="", deadline=deadline)
+        finally:
+            await ImageService.aclose()
+        return result, time.monotonic() - started
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503])
+def test_transient_failures_are_retried(status):
+    stub = StubOpenAITransport(fail_first=2, fail_status=status)
+    result, _ = analyze(stub)
+    assert result["success"]
+    assert stub.requests == 3
+
+
+def test_client_errors_are_not_retried():
+    stub = StubOpenAITransport(fail_first=1, fail_status=400)
+    result, _ = analyze(stub)
+    assert not result["success"]
+    assert stub.requests == 1
+
+
+def test_retries_stop_after_max_retries():
+    stub = StubOpenAITransport(fail_first=100, fail_status=503)
+    result, _ = analyze(stub)
+    assert not result["success"]
+    assert stub.requests == settings.OPENAI_MAX_RETRIES + 1
+
+
+def test_retry_after_is_honoured():
+    stub = StubOpenAITransport(fail_first=1, fail_status=429, retry_after=0.3)
+    result, elapsed = analyze(stub)
+    assert result["success"]
+    assert stub.requests == 2
+    # Jittered backoff alone would wait at most OPENAI_BACKOFF_BASE
+    assert elapsed >= 0.3
+
+
+def test_deadline_stops_retries():
+    # The server asks for a longer wait than the deadline leaves: give up now rather than sleep past it
+    stub = StubOpenAITransport(fail_first=100, fail_status=429, retry_after=2.0)
+    result, elapsed = analyze(stub, deadline=0.5)
+    assert not result["success"]
+    assert stub.requests == 1
+    assert elapsed < 0.5
+
+
+def test_deadline_cuts_off_a_slow_call():
+    stub = StubOpenAITransport(latency=5.0)
+    result, elapsed = analyze(stub, deadline=0.3)
+    assert not result["success"]
+    assert elapsed < 1.0